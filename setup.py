@@ -61,14 +61,21 @@ setup(
     ],
     python_requires=">=3.6",
     install_requires=[
-        "azure-batch>=8.0.0",
+        # task slots (task_slots_per_node and required_slots) were added in 10.0.0;
+        # older releases silently drop them
+        "azure-batch>=10.0.0",
         "azure-storage-blob>=12.2.0",
         "jsonschema>=3.2.0",
     ],
     extras_require={
-        # eg:
-        #   'rst': ['docutils>=0.11'],
-        #   ':python_version=="2.6"': ['argparse'],
+        # optional codecs for super_batch.serializers
+        "zstd": ["zstandard"],
+        "lz4": ["lz4"],
+        "joblib": ["joblib"],
+        "numpy": ["numpy"],
+        "arrow": ["pyarrow"],
+        # super_batch.AsyncClient
+        "aio": ["aiohttp"],
     },
     setup_requires=["pytest-runner"],
     entry_points={},  # { 'console_scripts': [ 'nameless = nameless.cli:main', w] },
@@ -1,6 +1,6 @@
 import os
-from typing import NamedTuple, Optional
-from jsonschema import validate
+from typing import Any, Dict, List, NamedTuple, Optional
+from .pool import _validate_task_slots
 
 # ------------------------------
 # Fail Faster
@@ -24,6 +24,7 @@ _CONFIG_SCHEMA = {
         "POOL_VM_SIZE": {"type": "string"},
         "JOB_ID": {"type": "string"},
         "DELETE_POOL_WHEN_DONE": {"type": "boolean"},
+        "RECREATE_POOL": {"type": "boolean"},
         "DELETE_JOB_WHEN_DONE": {"type": "boolean"},
         "DELETE_CONTAINER_WHEN_DONE": {"type": "boolean"},
         "BLOB_CONTAINER_NAME": {
@@ -35,6 +36,19 @@ _CONFIG_SCHEMA = {
         "BATCH_DIRECTORY": {"type": "string"},
         "DOCKER_IMAGE": {"type": "string"},
         "SUBNET_ID": {"type":"string"},
+        "MAX_CONCURRENCY": {"type": "integer", "minimum": 1},
+        "CACHE_RESOURCES": {"type": "boolean"},
+        "TASK_PACK_SIZE": {"type": "integer", "minimum": 1},
+        "MAX_TASK_RETRIES": {"type": "integer", "minimum": 0},
+        "RETRY_EXIT_CODES": {"type": ["array", "null"], "items": {"type": "integer"}},
+        "RETRY_BACKOFF_SECONDS": {"type": "number", "minimum": 0},
+        "POOL_AUTOSCALE": {"type": "boolean"},
+        "POOL_MIN_NODE_COUNT": {"type": "integer", "minimum": 0},
+        "POOL_AUTOSCALE_INTERVAL_MINUTES": {"type": "number", "minimum": 5, "maximum": 168 * 60},
+        "TASK_SLOTS_PER_NODE": {"type": "integer", "minimum": 1, "maximum": 256},
+        "POOL_NODE_FILL_TYPE": {"type": "string", "enum": ["pack", "spread"]},
+        "UPLOAD_BLOCK_SIZE_MB": {"type": "number", "exclusiveMinimum": 0, "maximum": 4000},
+        "UPLOAD_BLOCK_CONCURRENCY": {"type": "integer", "minimum": 1},
     },
     "required": [
         "POOL_ID",
@@ -73,6 +87,7 @@ class _BatchConfig(NamedTuple):
     POOL_NODE_COUNT: Optional[int] = 0
     POOL_LOW_PRIORITY_NODE_COUNT: Optional[int] = 0
     DELETE_POOL_WHEN_DONE: bool = False
+    RECREATE_POOL: bool = False
     DELETE_JOB_WHEN_DONE: bool = False
     DELETE_CONTAINER_WHEN_DONE: bool = False
     BATCH_ACCOUNT_NAME: Optional[str] = None
@@ -86,6 +101,19 @@ class _BatchConfig(NamedTuple):
     REGISTRY_PASSWORD: Optional[str] = None
     SUBNET_ID: Optional[str] = None
     COMMAND_LINE: Optional[str] = None
+    MAX_CONCURRENCY: int = 8
+    CACHE_RESOURCES: bool = True
+    TASK_PACK_SIZE: int = 1
+    MAX_TASK_RETRIES: int = 0
+    RETRY_EXIT_CODES: Optional[List[int]] = None
+    RETRY_BACKOFF_SECONDS: float = 0
+    POOL_AUTOSCALE: bool = False
+    POOL_MIN_NODE_COUNT: int = 0
+    POOL_AUTOSCALE_INTERVAL_MINUTES: float = 5
+    TASK_SLOTS_PER_NODE: int = 1
+    POOL_NODE_FILL_TYPE: str = "spread"
+    UPLOAD_BLOCK_SIZE_MB: float = 8
+    UPLOAD_BLOCK_CONCURRENCY: int = 8
 
     @property
     def clean(self):
@@ -118,6 +146,7 @@ _clean_keys = (
     "POOL_NODE_COUNT",
     "POOL_LOW_PRIORITY_NODE_COUNT",
     "DELETE_POOL_WHEN_DONE",
+    "RECREATE_POOL",
     "DELETE_JOB_WHEN_DONE",
     "DELETE_CONTAINER_WHEN_DONE",
     "BATCH_ACCOUNT_NAME",
@@ -127,6 +156,19 @@ _clean_keys = (
     "REGISTRY_SERVER",
     "SUBNET_ID",
     "COMMAND_LINE",
+    "MAX_CONCURRENCY",
+    "CACHE_RESOURCES",
+    "TASK_PACK_SIZE",
+    "MAX_TASK_RETRIES",
+    "RETRY_EXIT_CODES",
+    "RETRY_BACKOFF_SECONDS",
+    "POOL_AUTOSCALE",
+    "POOL_MIN_NODE_COUNT",
+    "POOL_AUTOSCALE_INTERVAL_MINUTES",
+    "TASK_SLOTS_PER_NODE",
+    "POOL_NODE_FILL_TYPE",
+    "UPLOAD_BLOCK_SIZE_MB",
+    "UPLOAD_BLOCK_CONCURRENCY",
 )
 
 
@@ -146,22 +188,38 @@ def BatchConfig(**kwargs):
         STORAGE_ACCESS_DURATION_HRS (int): Time in hours that the generated the storage access token will be valid for
         BLOB_CONTAINER_NAME (string): Name for the blob storage container
         POOL_ID (string): Pool Id
-        POOL_NODE_COUNT (int): Count for normal priority nodes in the batch pool. Only used when createing a pool.  **Ignored if the pool already exists**
-        POOL_LOW_PRIORITY_NODE_COUNT (int): Count for low priority nodes in the batch pool.    **Ignored if the pool already exists**
-        POOL_VM_SIZE (string): VM name (See the FAQ for details)
+        POOL_NODE_COUNT (int): Count for normal priority nodes in the batch pool. An existing pool is resized to this count
+        POOL_LOW_PRIORITY_NODE_COUNT (int): Count for low priority nodes in the batch pool. An existing pool is resized to this count
+        POOL_VM_SIZE (string): VM name (See the FAQ for details). When set (along with a node count), an existing pool whose VM size, image, container image, subnet or task slots differ from the configuration is an error, unless `RECREATE_POOL` is set
         DOCKER_IMAGE (string): name of the docker image
         REGISTRY_SERVER (string, optional): Used when the docker image is hosted on a private repository. Taken from the environment when not provided
         REGISTRY_USERNAME (string, optional): Used when the docker image is hosted on a private repository. Taken from the environment when not provided
         REGISTRY_PASSWORD (string, optional): Used when the docker image is hosted on a private repository. Taken from the environment when not provided
         DELETE_POOL_WHEN_DONE (boolean): Should the batch pool be deleted when the job has been completed? Default `False`
+        RECREATE_POOL (boolean): Should an existing pool whose configuration differs be deleted and created again? Default `False`
         SUBNET_ID (string): Name of the subnet under which the batch pool should be created
         DELETE_JOB_WHEN_DONE (boolean): Should the batch job be deleted when the job has been completed? Default `False`
         DELETE_CONTAINER_WHEN_DONE (boolean): should the blob storage container be deleted when the job has been completed? Default `False`
+        MAX_CONCURRENCY (int): Maximum number of concurrent requests made to the storage and batch services. Default `8`
+        CACHE_RESOURCES (boolean): Should resource files be stored under a content hash so that unchanged files are never re-uploaded? Default `True`
+        TASK_PACK_SIZE (int): Number of tasks to run in each Azure Batch task. The worker image must provide a `python` interpreter when greater than 1. Default `1`
+        MAX_TASK_RETRIES (int): Number of times a task which exits with a non-zero exit code is retried before the job fails. Default `0`
+        RETRY_EXIT_CODES (list of int, optional): Exit codes for which tasks are retried. Defaults to any non-zero exit code
+        RETRY_BACKOFF_SECONDS (number): Delay before the first retry of a task, doubling with each further retry. Default `0`. When neither `RETRY_EXIT_CODES` nor `RETRY_BACKOFF_SECONDS` is set, retries are performed by the Batch service; otherwise failed tasks are reactivated by the client
+        POOL_AUTOSCALE (boolean): Should the pool be sized to the number of pending tasks? `POOL_NODE_COUNT` and `POOL_LOW_PRIORITY_NODE_COUNT` are then the maximum numbers of dedicated and low priority nodes, which are mixed in proportion to these maxima. Also applied to an existing pool. Default `False`
+        POOL_MIN_NODE_COUNT (int): Number of dedicated nodes kept in an autoscaling pool when there are no pending tasks. Default `0`
+        POOL_AUTOSCALE_INTERVAL_MINUTES (number): Time between evaluations of the autoscale formula (at least 5 minutes). Default `5`
+        TASK_SLOTS_PER_NODE (int): Number of task slots on each node of a new pool, i.e. the number of single slot tasks which run at once. At most 256, and at most 4 times the number of cores of `POOL_VM_SIZE`. Default `1`
+        POOL_NODE_FILL_TYPE (string): How tasks are assigned to the nodes of a new pool: `"pack"` fills each node's slots before using the next node, `"spread"` spreads the tasks evenly across the nodes. Default `"spread"`
+        UPLOAD_BLOCK_SIZE_MB (number): Resource files larger than this are read from a memory map and uploaded in blocks of this many MiB. Default `8`
+        UPLOAD_BLOCK_CONCURRENCY (int): Number of blocks of each large resource file which are uploaded at once. Default `8`
     """
-    return _validate(_BatchConfig(**kwargs))
+    config = _validate(_BatchConfig(**kwargs))
+    _validate_task_slots(config.POOL_VM_SIZE, config.TASK_SLOTS_PER_NODE)
+    return config
 
 
-def _validate(x):
+def _validate(x, schema=None):
     """
     validate the batch configuration object
     """
@@ -169,12 +227,64 @@ def _validate(x):
     for _key in SERVICE_KEYS:
         if not _config[_key]:
             del _config[_key]
-    __env_config = _ENV_CONFIG.copy()
+    __env_config = _env_config()
     __env_config.update(_config)
-    validate(__env_config, _CONFIG_SCHEMA)
+    _check(_set_values(__env_config), _CONFIG_SCHEMA if schema is None else schema)
     return _BatchConfig(**__env_config)
 
 
+def _set_values(config: dict) -> dict:
+    """
+    Returns the configuration values which are set.  Optional values which
+    are not set default to None in `_BatchConfig`, which is not an instance
+    of their schema's type (e.g. an unset `SUBNET_ID` is not a string), so
+    they are left out of the validation rather than rejected.  Required
+    values which are not set are still reported as missing.
+    """
+    return {key: value for key, value in config.items() if value is not None}
+
+
+# a validator for each schema, keyed by the schema's id: the schemas are
+# module constants, and each validator keeps its schema alive, so ids are not
+# reused.  jsonschema is slow to import, so it is imported when the first
+# configuration is validated
+_VALIDATORS: Dict[int, Any] = {}
+
+
+def _check(instance, schema):
+    """
+    Validates the instance against the schema (using JSON Schema draft 7,
+    which enforces `dependencies`), raising the same error as
+    `jsonschema.validate`
+    """
+    key = id(schema)
+    validator = _VALIDATORS.get(key)
+    if validator is None:
+        from jsonschema import Draft7Validator
+
+        Draft7Validator.check_schema(schema)
+        validator = _VALIDATORS[key] = Draft7Validator(schema)
+
+    from jsonschema.exceptions import best_match
+
+    error = best_match(validator.iter_errors(instance))
+    if error is not None:
+        raise error
+
+
+def _env_config() -> Dict[str, str]:
+    """
+    Returns the service keys which are set in the environment.  The
+    environment is read when each configuration is created, not on import.
+    """
+    out = {}
+    for key in SERVICE_KEYS:
+        val = os.getenv(key, None)
+        if val:
+            out[key] = val.strip('"')
+    return out
+
+
 SERVICE_KEYS = (
     "BATCH_ACCOUNT_NAME",
     "BATCH_ACCOUNT_KEY",
@@ -185,9 +295,3 @@ SERVICE_KEYS = (
     "REGISTRY_USERNAME",
     "REGISTRY_PASSWORD",
 )
-
-_ENV_CONFIG = {}
-for key in SERVICE_KEYS:
-    val = os.getenv(key, None)
-    if val:
-        _ENV_CONFIG[key] = val.strip('"')
@@ -1,2 +1,36 @@
-from .client import Client
+"""
+The clients are imported on first use, so that importing the package (e.g.
+in a worker, for `super_batch.serializers`) or creating a configuration
+does not import the Azure SDKs.
+"""
+import importlib
+
+# imported eagerly (it is cheap) so that the function, rather than the
+# module of the same name, is the package's `BatchConfig` attribute
 from .BatchConfig import BatchConfig
+
+# the module which defines each client
+_EXPORTS = {
+    "Client": ".client",
+    "AsyncClient": ".aio",
+    "LocalClient": ".local",
+    "ShardedClient": ".sharding",
+}
+
+__all__ = list(_EXPORTS) + ["BatchConfig"]
+
+
+def __getattr__(name):
+    try:
+        module_name = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name)
+        ) from None
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
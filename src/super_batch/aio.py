@@ -0,0 +1,571 @@
+"""
+asyncio SuperBatch client
+
+usage requires the aiohttp module
+"""
+# pylint: disable=bad-continuation, invalid-name, protected-access, line-too-long, invalid-overridden-method
+
+import asyncio
+import datetime
+import functools
+import os
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from azure.batch import BatchServiceClient
+from azure.batch.batch_auth import SharedKeyCredentials
+import azure.batch.models as models
+
+from . import serializers
+from .client import Client
+from .packing import RUNNER_PATH, RUNNER_FILE
+from .jobprep import _use_global_resources
+from .logs import STDOUT_FILE, TaskLog, _OutputFollower
+from .mapper import GLOBAL_PARAMS_FILE
+from .mapreduce import MAPPER_PATH, MAPPER_FILE
+from .results import Results
+from .upload import _upload_blocks_async, MIB
+from .utils import (
+    _print_batch_exception,
+    _wait_for_tasks_to_complete,
+    _poll_completed_tasks,
+    _add_task_collection,
+    _check_exit_codes,
+)
+
+
+async def _gather_concurrently(coroutines, keys, verb, noun, max_concurrency=None):
+    """
+    Awaits the coroutines, with at most `max_concurrency` of them running at
+    once (when given), returning their results in order.
+
+    :raises RuntimeError: If any of the coroutines raised, listing each failed item and its error.
+    """
+    if max_concurrency is not None:
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def bounded(coroutine):
+            async with semaphore:
+                return await coroutine
+
+        coroutines = [bounded(coroutine) for coroutine in coroutines]
+    results = await asyncio.gather(*coroutines, return_exceptions=True)
+
+    errors = [
+        "   {}: {!r}".format(key, result)
+        for key, result in zip(keys, results)
+        if isinstance(result, BaseException)
+    ]
+    if errors:
+        raise RuntimeError(
+            "\nFailed to {} {} of {} {}:\n".format(verb, len(errors), len(results), noun)
+            + "\n".join(errors)
+        )
+    return results
+
+
+class AsyncClient(Client):
+    """ asyncio SuperBatch Client
+
+    Provides the same interface as :class:`super_batch.Client`, with the
+    methods which call the storage and batch services implemented as
+    coroutines.  Blob storage is accessed using the async storage SDK, and
+    batch service calls are run in a pool of `MAX_CONCURRENCY` threads, so a
+    single event loop can drive several jobs at once while no client has
+    more than `MAX_CONCURRENCY` storage and batch requests in flight.
+
+    Usage::
+
+        async with AsyncClient(**config) as batch_client:
+            resources = await batch_client.build_resource_files(paths)
+            ...
+            await batch_client.run()
+    """
+
+    @classmethod
+    async def from_journal(cls, batch_directory: str, job_id: str, **kwargs):
+        """ Restore a client, including its tasks and the state of each
+        task, from the journal written to the batch directory by `run()`.
+
+        See :meth:`super_batch.Client.from_journal`
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(super().from_journal, batch_directory, job_id, **kwargs)
+        )
+
+    def _create_clients(self):
+        """
+        Creates the storage and batch service clients.  The container is
+        created when entering the client's context.
+        """
+        from azure.storage.blob.aio import BlobServiceClient
+
+        self.blob_client = BlobServiceClient.from_connection_string(
+            self.config.STORAGE_ACCOUNT_CONNECTION_STRING
+        )
+        self.container_client = self.blob_client.get_container_client(
+            self.config.BLOB_CONTAINER_NAME
+        )
+        self.batch_client = BatchServiceClient(
+            SharedKeyCredentials(
+                self.config.BATCH_ACCOUNT_NAME, self.config.BATCH_ACCOUNT_KEY
+            ),
+            batch_url=self.config.BATCH_ACCOUNT_URL,
+        )
+        self._executor = ThreadPoolExecutor(max_workers=self.config.MAX_CONCURRENCY)
+        self._semaphore = None
+
+    async def __aenter__(self):
+        from azure.core.exceptions import ResourceExistsError
+
+        try:
+            await self.container_client.create_container()
+        except ResourceExistsError:
+            pass
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        """ Closes the storage client and the batch request threads
+        """
+        await self.blob_client.close()
+        self._executor.shutdown(wait=False)
+
+    @property
+    def _limit(self) -> asyncio.Semaphore:
+        """ Limits the number of storage requests in flight
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.config.MAX_CONCURRENCY)
+        return self._semaphore
+
+    async def _call(self, func: Callable, *args, **kwargs) -> Any:
+        """ Runs a blocking call (e.g. to the batch service) in the client's thread pool
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    # --------------------------------------------------
+    # RESOURCES
+    # --------------------------------------------------
+
+    async def build_resource_file(
+        self, file_path: str, container_path: str, duration_hours: int = 24
+    ) -> models.ResourceFile:
+        """
+        Uploads a local file to an Azure Blob storage container.
+
+        See :meth:`super_batch.Client.build_resource_file`
+        """
+        try:
+            with self.metrics.phase("upload"):
+                return await self._build_resource_file(
+                    file_path, container_path, duration_hours
+                )
+        finally:
+            if self.config.CACHE_RESOURCES:
+                self.manifest.save()
+
+    async def _build_resource_file(
+        self, file_path: str, container_path: str, duration_hours: int
+    ) -> models.ResourceFile:
+        """
+        Implements `build_resource_file` without saving the manifest
+        """
+        local_path = os.path.join(self.config.BATCH_DIRECTORY, file_path)
+
+        blob_name, digest, upload = await self._call(self._resource_blob, local_path)
+        if upload:
+            await self._upload_blob(local_path, blob_name)
+            if digest is not None:
+                self.manifest.add_blob(self.container_client.url, digest, blob_name)
+
+        return self._resource_file(blob_name, container_path, duration_hours)
+
+    async def _upload_blob(self, local_path: str, blob_name: str) -> None:
+        """
+        Uploads a local file to the blob storage container, in parallel
+        blocks when it is larger than `UPLOAD_BLOCK_SIZE_MB`
+        """
+        blob_client = self.container_client.get_blob_client(blob_name)
+        block_size = int(self.config.UPLOAD_BLOCK_SIZE_MB * MIB)
+        async with self._limit:
+            if os.path.getsize(local_path) > block_size:
+                await _upload_blocks_async(
+                    blob_client, local_path, block_size, self.config.UPLOAD_BLOCK_CONCURRENCY
+                )
+                return
+            with open(local_path, "rb") as data:
+                await blob_client.upload_blob(data, blob_type="BlockBlob", overwrite=True)
+
+    async def build_resource_files(
+        self,
+        paths: Iterable[Tuple[str, str]],
+        duration_hours: int = 24,
+        max_concurrency: Optional[int] = None,
+    ) -> List[models.ResourceFile]:
+        """
+        Uploads a collection of local files to an Azure Blob storage container.
+        The client never has more than `MAX_CONCURRENCY` uploads in flight,
+        and `max_concurrency` limits the uploads of this call further.
+
+        See :meth:`super_batch.Client.build_resource_files`
+        """
+        paths = list(paths)
+        try:
+            with self.metrics.phase("upload"):
+                return await _gather_concurrently(
+                    [
+                        self._build_resource_file(file_path, container_path, duration_hours)
+                        for file_path, container_path in paths
+                    ],
+                    [file_path for file_path, _ in paths],
+                    "upload",
+                    "resource files",
+                    max_concurrency,
+                )
+        finally:
+            if self.config.CACHE_RESOURCES:
+                self.manifest.save()
+
+    async def build_resource_object(
+        self,
+        obj: Any,
+        file_path: str,
+        container_path: str,
+        codec: Optional[str] = None,
+        duration_hours: int = 24,
+    ) -> models.ResourceFile:
+        """
+        Serializes an object to a file in the batch directory and uploads it
+        to an Azure Blob storage container.
+
+        See :meth:`super_batch.Client.build_resource_object`
+        """
+        local_path = os.path.join(self.config.BATCH_DIRECTORY, file_path)
+        pathlib.Path(local_path).parent.mkdir(parents=True, exist_ok=True)
+        await self._call(serializers.dump, obj, local_path, codec)
+        return await self.build_resource_file(file_path, container_path, duration_hours)
+
+    async def map(
+        self,
+        func_name: str,
+        iterable: Iterable[Any],
+        global_params: Optional[Dict[str, Any]] = None,
+        reduce: Optional[str] = None,
+        fan_in: int = 8,
+        prefix: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Adds a task for each item which calls `func(item, **global_params)`,
+        and optionally reduces the results.
+
+        See :meth:`super_batch.Client.map`
+        """
+        prefix, paths, global_path = await self._call(
+            self._write_map_inputs, iterable, global_params, fan_in, prefix
+        )
+        shared = [await self.build_resource_file(MAPPER_PATH, MAPPER_FILE)]
+        if global_path:
+            shared.append(await self.build_resource_file(global_path, GLOBAL_PARAMS_FILE))
+        return self._add_map_tasks(
+            func_name, shared, await self.build_resource_files(paths), reduce, fan_in, prefix
+        )
+
+    # --------------------------------------------------
+    # OUTPUTS
+    # --------------------------------------------------
+
+    async def _download_files(self):
+        """
+        Downloads the output files to the batch directory
+        """
+        pathlib.Path(self.config.BATCH_DIRECTORY).mkdir(parents=True, exist_ok=True)
+        pending = [
+            blob_name for blob_name in self.output_files if not self._is_downloaded(blob_name)
+        ]
+        if not pending:
+            return
+        blob_names = {b.name async for b in self.container_client.list_blobs()}
+
+        for blob_name in pending:
+            if not blob_name in blob_names:
+                raise RuntimeError(
+                    "incomplete blob set: missing blob {}".format(blob_name)
+                )
+
+        try:
+            with self.metrics.phase("download"):
+                await _gather_concurrently(
+                    [self._download_file(blob_name) for blob_name in pending],
+                    pending,
+                    "download",
+                    "output files",
+                )
+        finally:
+            self._record_downloaded({self._output_tasks.get(b) for b in pending} - {None})
+
+    async def _download_file(self, blob_name: str) -> str:
+        """
+        Streams a blob to the batch directory in chunks
+
+        Returns:
+            The local path of the downloaded file
+        """
+        download_file_path = os.path.join(self.config.BATCH_DIRECTORY, blob_name)
+        if self._is_downloaded(blob_name):
+            return download_file_path
+
+        blob_client = self.container_client.get_blob_client(blob_name)
+        pathlib.Path(download_file_path).parent.mkdir(parents=True, exist_ok=True)
+
+        partial_file_path = download_file_path + ".part"
+        async with self._limit:
+            with open(partial_file_path, "wb") as download_file:
+                downloader = await blob_client.download_blob()
+                await downloader.readinto(download_file)
+        os.replace(partial_file_path, download_file_path)
+        return download_file_path
+
+    async def iter_results(
+        self, loader: Optional[Callable[[str], Any]] = None,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Downloads the outputs of each task as soon as it completes.
+
+        See :meth:`super_batch.Client.iter_results`
+        """
+
+        async def fetch(blob_name):
+            local_path = await self._download_file(blob_name)
+            return local_path if loader is None else await self._call(loader, local_path)
+
+        pending = {}
+        remaining = {}
+
+        def harvest(future):
+            item_id = pending.pop(future)
+            remaining[item_id] -= 1
+            if not remaining[item_id]:
+                self._record_downloaded([item_id])
+            return item_id, future.result()
+
+        polls = _poll_completed_tasks(
+            self.batch_client,
+            self.config.JOB_ID,
+            datetime.timedelta(hours=self.config.STORAGE_ACCESS_DURATION_HRS),
+            self._task_count,
+            retrier=self._retrier,
+        )
+        while True:
+            # the poller sleeps between polls, so advance it in a thread
+            poll = await self._call(next, polls, None)
+            if poll is None:
+                break
+            self._record_completed(poll[1])
+            _check_exit_codes(poll[1], self._retrier.retries)
+            for task in poll[1]:
+                for item_id in self.packs.get(task.id, [task.id]):
+                    remaining[item_id] = len(self.task_outputs.get(item_id, []))
+                    for blob_name in self.task_outputs.get(item_id, []):
+                        pending[asyncio.ensure_future(fetch(blob_name))] = item_id
+            for future in [f for f in pending if f.done()]:
+                yield harvest(future)
+
+        while pending:
+            done, _ = await asyncio.wait(
+                list(pending), return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                yield harvest(future)
+
+    # --------------------------------------------------
+    # JOBS
+    # --------------------------------------------------
+
+    async def _build_packed_tasks(
+        self, tasks: List[models.TaskAddParameter], pack_size: int
+    ) -> List[models.TaskAddParameter]:
+        """
+        Groups the tasks into packs of `pack_size` tasks.
+
+        See :meth:`super_batch.Client._build_packed_tasks`
+        """
+        runner = await self.build_resource_file(RUNNER_PATH, RUNNER_FILE)
+        return self._pack(tasks, pack_size, runner)
+
+    async def suggest_pack_size(self, target_seconds: float = 600, job_id: str = None) -> int:
+        """
+        Suggests a `TASK_PACK_SIZE` based on the run times of a job's tasks.
+
+        See :meth:`super_batch.Client.suggest_pack_size`
+        """
+        return await self._call(super().suggest_pack_size, target_seconds, job_id)
+
+    async def collect_task_stats(self, job_id: Optional[str] = None) -> None:
+        """ Adds the resource usage statistics of the completed tasks to `metrics`.
+
+        See :meth:`super_batch.Client.collect_task_stats`
+        """
+        await self._call(super().collect_task_stats, job_id)
+
+    async def run(
+        self, wait: bool = True, pack_size: Optional[int] = None, **kwargs
+    ) -> Optional[Results]:
+        """ Run the Batch Job
+
+        See :meth:`super_batch.Client.run`
+        """
+        if not hasattr(self, "tasks"):
+            raise ValueError("Client restored from data cannot be used to run the job")
+
+        try:
+            with self.metrics.phase("submit"):
+                await self._call(self._ensure_pool)
+                job_exists = await self._call(self._add_job)
+                tasks = _use_global_resources(
+                    await self._call(self._tasks_to_submit, job_exists),
+                    self.global_resources,
+                )
+
+                if pack_size is None:
+                    pack_size = self.config.TASK_PACK_SIZE
+                if pack_size > 1:
+                    tasks = await self._build_packed_tasks(tasks, pack_size)
+                self._record_submission(tasks)
+
+                rate = await self._call(
+                    _add_task_collection,
+                    self.batch_client,
+                    self.config.JOB_ID,
+                    tasks,
+                    self.config.MAX_CONCURRENCY,
+                )
+                print("Submitted {} tasks ({:.1f} tasks/sec)".format(len(tasks), rate))
+
+            if wait:
+                return await self.load_results(**kwargs)
+            return None
+
+        except models.BatchErrorException as err:
+            _print_batch_exception(err)
+            raise err
+
+        finally:
+            if wait:
+                await self._cleanup_batch_resources()
+
+    async def load_results(
+        self,
+        quiet=False,
+        loader: Optional[Callable[[str], Any]] = None,
+        codec: Optional[str] = None,
+        mmap: bool = True,
+    ) -> Results:
+        """
+        Waits for the tasks to complete and downloads the output files.
+
+        See :meth:`super_batch.Client.load_results`
+        """
+        start_time = datetime.datetime.now().replace(microsecond=0)
+        if not quiet:
+            print("Job: {}\nStart time: {}".format(self.config.JOB_ID, start_time))
+
+        try:
+            with self.metrics.phase("wait"):
+                await self._call(
+                    _wait_for_tasks_to_complete,
+                    self.batch_client,
+                    self.config.JOB_ID,
+                    datetime.timedelta(hours=self.config.STORAGE_ACCESS_DURATION_HRS),
+                    self._task_count,
+                    self._record_completed,
+                    self._retrier,
+                )
+            await self._download_files()
+        except models.BatchErrorException as err:
+            _print_batch_exception(err)
+            raise err
+        finally:
+            if not quiet:
+                self._print_retries()
+                self._print_metrics()
+                end_time = datetime.datetime.now().replace(microsecond=0)
+                print("End time: {}".format(end_time))
+        return self.results(loader, codec, mmap)
+
+    async def _cleanup_batch_resources(self):
+        """
+        Clean up Batch resources (if the user so chooses).
+        """
+        if self.config.DELETE_POOL_WHEN_DONE:
+            await self._call(self.batch_client.pool.delete, self.config.POOL_ID)
+        if self.config.DELETE_JOB_WHEN_DONE:
+            await self._call(self.batch_client.job.delete, self.config.JOB_ID)
+        if self.config.DELETE_CONTAINER_WHEN_DONE:
+            await self.container_client.delete_container()
+            self.manifest.forget_container(self.container_client.url)
+            self.manifest.save()
+
+    async def task_logs(
+        self,
+        failed_only: bool = False,
+        tail_bytes: Optional[int] = None,
+        encoding: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> AsyncIterator[TaskLog]:
+        """
+        Yields the standard output and error of the tasks in the job as
+        their files are read, rather than once all of them have been read.
+
+        See :meth:`super_batch.Client.task_logs`
+        """
+        logs = self._iter_task_logs(failed_only, tail_bytes, encoding, max_concurrency)
+        try:
+            while True:
+                log = await self._call(next, logs, None)
+                if log is None:
+                    return
+                yield log
+        finally:
+            await self._call(logs.close)
+
+    async def follow_task_output(
+        self,
+        task_id: str,
+        file_name: str = STDOUT_FILE,
+        interval: float = 5,
+        encoding: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Yields the output a task writes to `file_name` as it is written,
+        until the task completes.
+
+        See :meth:`super_batch.Client.follow_task_output`
+        """
+        follower = _OutputFollower(
+            self.batch_client, self.config.JOB_ID, task_id, file_name, encoding
+        )
+        while True:
+            text, done = await self._call(follower.read)
+            if text:
+                yield text
+            if done:
+                return
+            await asyncio.sleep(interval)
+
+    async def print_task_output(
+        self,
+        encoding=None,
+        failed_only: bool = False,
+        tail_bytes: Optional[int] = None,
+    ):
+        """ Utilty method: Prints the stdout.txt and stderr.txt files for each task in the job.
+
+        See :meth:`super_batch.Client.print_task_output`
+        """
+        await self._call(super().print_task_output, encoding, failed_only, tail_bytes)
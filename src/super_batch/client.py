@@ -4,29 +4,70 @@ usage requires these additional modules
 # pylint: disable=bad-continuation, invalid-name, protected-access, line-too-long, fixme
 
 from __future__ import print_function, annotations
-from typing import Tuple, List
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import datetime
+import math
 import os
 import pathlib
+import statistics
+import time
 
-from azure.storage.blob import (
-    BlobServiceClient,
-    ContainerClient,
-    ContainerSasPermissions,
-    BlobSasPermissions,
-    generate_container_sas,
-    generate_blob_sas,
-)
-from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
 from azure.batch import BatchServiceClient
 from azure.batch.batch_auth import SharedKeyCredentials
 import azure.batch.models as models
 
 from .BatchConfig import _BatchConfig, BatchConfig
+from . import serializers
+from .manifest import _ResourceManifest
+from .journal import (
+    _JobJournal,
+    JOURNAL_PATTERN,
+    SUBMITTED,
+    SUCCEEDED,
+    FAILED,
+    DOWNLOADED,
+    FINISHED_STATES,
+)
+from .packing import _pack_tasks, RUNNER_PATH, RUNNER_FILE
+from .pool import _autoscale_formula, _pool_differences, _pool_fingerprint
+from .logs import (
+    TaskLog,
+    STDOUT_FILE,
+    LOG_TASK_SELECT,
+    _OutputFollower,
+    _failed,
+    _map_ordered,
+    _task_log,
+)
+from .jobprep import _global_resource_key, _job_preparation_task, _use_global_resources
+from .upload import _upload_blocks, MIB
+from .mapper import GLOBAL_PARAMS_FILE, ITEM_FILE, OUTPUT_FILE
+from .mapreduce import (
+    MAPPER_PATH,
+    MAPPER_FILE,
+    SATISFY_DEPENDENCIES,
+    _command_line,
+    _dump,
+    _fan_in,
+    _input_file,
+)
+from .dependencies import Dependency, _dependency_ids, _task_id
+from .results import Results
+from .retry import _TaskRetrier
+from .metrics import JobMetrics
+# the storage SDK is slow to import, and is imported when the client
+# connects rather than with the package
+if TYPE_CHECKING:
+    from azure.storage.blob import BlobServiceClient, ContainerClient
+
 from .utils import (
     _print_batch_exception,
     _wait_for_tasks_to_complete,
-    _read_stream_as_string,
+    _map_concurrently,
+    _poll_completed_tasks,
+    _add_task_collection,
+    _check_exit_codes,
 )
 
 
@@ -54,25 +95,170 @@ class Client:
     batch_client: BatchServiceClient
     container_client: ContainerClient
     output_files: List[Tuple[str]]
+    task_outputs: Dict[str, List[str]]
+    packs: Dict[str, List[str]]
     tasks: List[models.TaskAddParameter]
+    global_resources: List[models.ResourceFile]
     image: models.ImageReference
+    manifest: _ResourceManifest
+    journal: _JobJournal
+    metrics: JobMetrics
 
     @property
     def data(self):
         """ Generate data for persisting the configuration
         """
-        return {"config": self.config.clean, "output_files": self.output_files}
-
-    @staticmethod
-    def from_data(data):
+        return {
+            "config": self.config.clean,
+            "output_files": self.output_files,
+            "task_outputs": self.task_outputs,
+            "packs": self.packs,
+        }
+
+    @classmethod
+    def from_data(cls, data):
         """ Restore configuration from data
         """
-        out = Client(**data["config"])
+        out = cls(**data["config"])
         out.output_files = data["output_files"]
+        out.task_outputs = data.get("task_outputs", {})
+        out.packs = data.get("packs", {})
+        out._index_outputs()
         del out.image
         del out.tasks
         return out
 
+    @classmethod
+    def from_journal(cls, batch_directory: str, job_id: str, **kwargs):
+        """ Restore a client, including its tasks and the state of each
+        task, from the journal written to the batch directory by `run()`.
+
+        Calling `run()` on the restored client submits only the tasks which
+        have not yet succeeded: failed tasks are reactivated and tasks which
+        never reached the service are added when the job still exists, and
+        the unfinished tasks are added to a new job when a new `JOB_ID` is
+        provided.  Outputs which have already been downloaded are not
+        downloaded again.  Note that the SAS URLs in the task definitions
+        must not have expired.
+
+        Args:
+            batch_directory: The `BATCH_DIRECTORY` of the original client
+            job_id: The `JOB_ID` of the original client
+            **kwargs: Configuration values which override those of the
+                original client (e.g. `JOB_ID` to resume into a new job)
+        """
+        data, states = _JobJournal.read(
+            os.path.join(batch_directory, JOURNAL_PATTERN.format(job_id))
+        )
+        out = cls(
+            image=models.ImageReference.deserialize(data["image"]),
+            **dict(data["config"], **kwargs)
+        )
+        out.output_files = data["output_files"]
+        out.task_outputs = data["task_outputs"]
+        out.packs = data["packs"]
+        out.tasks = [models.TaskAddParameter.deserialize(task) for task in data["tasks"]]
+        out.global_resources = [
+            models.ResourceFile.deserialize(resource_file)
+            for resource_file in data.get("global_resources", [])
+        ]
+        out._index_outputs()
+        out.journal.states.update(states)
+        out._resumed = True
+        return out
+
+    @property
+    def task_states(self) -> Dict[str, str]:
+        """ The state of each task, as recorded in the job journal: one of
+        `submitted`, `succeeded`, `failed` or `downloaded`
+        """
+        return dict(self.journal.states)
+
+    @property
+    def _task_count(self) -> Optional[int]:
+        """ The number of tasks in the job, or None if restored from data
+        """
+        return self._submitted_count
+
+    @property
+    def _service_retries(self) -> bool:
+        """ Whether failed tasks are retried by the Batch service rather than
+        reactivated by the client
+        """
+        return self.config.RETRY_EXIT_CODES is None and not self.config.RETRY_BACKOFF_SECONDS
+
+    @property
+    def task_retries(self) -> Dict[str, int]:
+        """ The number of times each completed task was retried, for the
+        tasks which were retried at least once
+        """
+        return {
+            item_id: count
+            for task_id, count in self._retrier.retries.items()
+            if count
+            for item_id in self.packs.get(task_id, [task_id])
+        }
+
+    def _print_metrics(self) -> None:
+        """ Prints the time spent in each phase and the queued and running
+        times of the tasks
+        """
+        summary = self.metrics.summary()
+        if summary["phases"]:
+            print(
+                "Phases: "
+                + ", ".join(
+                    "{} {:.1f}s".format(name, seconds)
+                    for name, seconds in summary["phases"].items()
+                )
+            )
+        for name in ("queued_seconds", "running_seconds"):
+            if summary[name]:
+                print(
+                    "Task {} time: median {:.1f}s, max {:.1f}s".format(
+                        name.split("_")[0], summary[name]["median"], summary[name]["max"]
+                    )
+                )
+
+    def collect_task_stats(self, job_id: Optional[str] = None) -> None:
+        """ Adds the resource usage statistics (CPU, wall clock, wait time
+        and IO) of the completed tasks to `metrics`.  Note that the Batch
+        service only updates task statistics periodically.
+
+        Args:
+            job_id: The job whose tasks' statistics are collected. Defaults to `JOB_ID`
+        """
+        self.metrics.record_stats(
+            self.batch_client.task.list(
+                job_id or self.config.JOB_ID,
+                task_list_options=models.TaskListOptions(
+                    filter="state eq 'completed'", select="id,stats", expand="stats"
+                ),
+            )
+        )
+
+    def _print_retries(self) -> None:
+        """ Prints the number of times each retried task was retried
+        """
+        retries = self.task_retries
+        if retries:
+            print(
+                "Retried tasks:\n"
+                + "\n".join(
+                    "   Task {}: {} retries".format(task_id, count)
+                    for task_id, count in sorted(retries.items())
+                )
+            )
+
+    def _index_outputs(self):
+        """ Maps each output blob to the task which produces it
+        """
+        self._output_tasks = {
+            blob_name: task_id
+            for task_id, blob_names in self.task_outputs.items()
+            for blob_name in blob_names
+        }
+
     def __init__(self, image=None, **kwargs):
         """
         Args:
@@ -89,16 +275,47 @@ class Client:
             **kwargs: Additinal arguments passed to :class:`super_barch.BatchConfig`
         """
         self.image = image if image is not None else _IMAGE_REF
-        self.config = BatchConfig(**kwargs)
+        self.config = self._build_config(**kwargs)
         self.output_files = []
+        self.task_outputs = {}
+        self.packs = {}
         self.tasks = []
+        self.global_resources = []
+        self.manifest = _ResourceManifest(self.config.BATCH_DIRECTORY)
+        self.journal = _JobJournal(self.config.BATCH_DIRECTORY, self.config.JOB_ID)
+        self.metrics = JobMetrics()
+        self._output_tasks = {}
+        self._intermediate_files = set()
+        self._submitted_count = None
+        self._resumed = False
+        self._create_clients()
+        self._retrier = _TaskRetrier(
+            self.batch_client,
+            self.config.JOB_ID,
+            0 if self._service_retries else self.config.MAX_TASK_RETRIES,
+            self.config.RETRY_EXIT_CODES,
+            self.config.RETRY_BACKOFF_SECONDS,
+        )
+
+    def _build_config(self, **kwargs) -> _BatchConfig:
+        """
+        Validates the configuration
+        """
+        return BatchConfig(**kwargs)
 
+    def _create_clients(self):
+        """
+        Creates the storage and batch service clients
+        """
         # --------------------------------------------------
         # BLOB STORAGE CONFIGURATION:
         # --------------------------------------------------
 
         # Create the blob client, for use in obtaining references to
         # blob storage containers and uploading files to containers.
+        from azure.storage.blob import BlobServiceClient
+        from azure.core.exceptions import ResourceExistsError
+
         self.blob_client = BlobServiceClient.from_connection_string(
             self.config.STORAGE_ACCOUNT_CONNECTION_STRING
         )
@@ -133,23 +350,63 @@ class Client:
         """
         Uploads a local file to an Azure Blob storage container.
 
+        When `CACHE_RESOURCES` is set, the blob is named for the SHA-256
+        digest of the file contents and files which have already been
+        uploaded to the container are not uploaded again.
+
         Args:
             file_path: The local path to the file.
             container_path: The path where the file should be placed in the container before executing the task
         Returns:
              A ResourceFile initialized with a SAS URL appropriate for Batch tasks.
         """
-        blob_name = os.path.basename(file_path)
-        blob_client = self.container_client.get_blob_client(blob_name)
-
         try:
-            blob_client.delete_blob()
-        except ResourceNotFoundError:
-            pass
+            with self.metrics.phase("upload"):
+                return self._build_resource_file(file_path, container_path, duration_hours)
+        finally:
+            if self.config.CACHE_RESOURCES:
+                self.manifest.save()
+
+    def _build_resource_file(
+        self, file_path: str, container_path: str, duration_hours: int
+    ) -> azure.batch.models.ResourceFile:
+        """
+        Implements `build_resource_file` without saving the manifest
+        """
+        local_path = os.path.join(self.config.BATCH_DIRECTORY, file_path)
 
-        with open(os.path.join(self.config.BATCH_DIRECTORY, file_path), "rb") as data:
-            blob_client.upload_blob(data, blob_type="BlockBlob")
+        blob_name, digest, upload = self._resource_blob(local_path)
+        if upload:
+            self._upload_blob(local_path, blob_name)
+            if digest is not None:
+                self.manifest.add_blob(self.container_client.url, digest, blob_name)
 
+        return self._resource_file(blob_name, container_path, duration_hours)
+
+    def _resource_blob(self, local_path: str) -> Tuple[str, Optional[str], bool]:
+        """
+        Returns the name of the blob for a resource file, the digest of its
+        contents (when `CACHE_RESOURCES` is set) and whether the file needs
+        to be uploaded.
+        """
+        if not self.config.CACHE_RESOURCES:
+            return os.path.basename(local_path), None, True
+
+        digest = self.manifest.digest(local_path)
+        blob_name = self.manifest.get_blob(self.container_client.url, digest)
+        if blob_name is not None:
+            return blob_name, digest, False
+        return "resources/{}/{}".format(digest, os.path.basename(local_path)), digest, True
+
+    def _resource_file(
+        self, blob_name: str, container_path: str, duration_hours: int
+    ) -> azure.batch.models.ResourceFile:
+        """
+        Returns a ResourceFile with a read-only SAS URL for the blob
+        """
+        from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+
+        blob_client = self.container_client.get_blob_client(blob_name)
         sas_token = generate_blob_sas(
             blob_client.account_name,
             blob_client.container_name,
@@ -164,8 +421,111 @@ class Client:
             http_url=blob_client.url + "?" + sas_token, file_path=container_path
         )
 
+    def _upload_blob(self, local_path: str, blob_name: str) -> None:
+        """
+        Uploads a local file to the blob storage container, in parallel
+        blocks when it is larger than `UPLOAD_BLOCK_SIZE_MB`
+        """
+        blob_client = self.container_client.get_blob_client(blob_name)
+
+        block_size = int(self.config.UPLOAD_BLOCK_SIZE_MB * MIB)
+        if os.path.getsize(local_path) > block_size:
+            _upload_blocks(
+                blob_client, local_path, block_size, self.config.UPLOAD_BLOCK_CONCURRENCY
+            )
+            return
+
+        # overwrite in place rather than paying for a delete_blob round-trip
+        with open(local_path, "rb") as data:
+            blob_client.upload_blob(data, blob_type="BlockBlob", overwrite=True)
+
+    def build_resource_files(
+        self,
+        paths: Iterable[Tuple[str, str]],
+        duration_hours: int = 24,
+        max_concurrency: Optional[int] = None,
+    ) -> List[azure.batch.models.ResourceFile]:
+        """
+        Uploads a collection of local files to an Azure Blob storage container
+        using a bounded pool of worker threads.
+
+        Args:
+            paths: An iterable of `(file_path, container_path)` pairs, as
+                would be passed to :meth:`build_resource_file`
+            duration_hours: Time in hours that the generated SAS URLs will be valid for
+            max_concurrency: Maximum number of concurrent uploads. Defaults
+                to the `MAX_CONCURRENCY` configuration value
+
+        Returns:
+            A list of ResourceFiles in the same order as `paths`.
+
+        Raises:
+            RuntimeError: If any of the uploads failed.  The message lists
+                each file which could not be uploaded along with its error.
+        """
+        paths = list(paths)
+        if max_concurrency is None:
+            max_concurrency = self.config.MAX_CONCURRENCY
+
+        try:
+            with self.metrics.phase("upload"):
+                return _map_concurrently(
+                    lambda path: self._build_resource_file(path[0], path[1], duration_hours),
+                    paths,
+                    max_concurrency,
+                    "upload",
+                    "resource files",
+                    keys=[file_path for file_path, _ in paths],
+                )
+        finally:
+            if self.config.CACHE_RESOURCES:
+                self.manifest.save()
+
+    def build_resource_object(
+        self,
+        obj: Any,
+        file_path: str,
+        container_path: str,
+        codec: Optional[str] = None,
+        duration_hours: int = 24,
+    ) -> azure.batch.models.ResourceFile:
+        """
+        Serializes an object to a file in the batch directory and uploads it
+        to an Azure Blob storage container.  Workers can read the file with
+        :func:`super_batch.serializers.load`.
+
+        Args:
+            obj: The object to serialize
+            file_path: The path of the file, relative to the batch directory.
+                The extension selects the codec (see :mod:`super_batch.serializers`)
+            container_path: The path where the file should be placed in the container before executing the task
+            codec: The name of the codec to use in place of the one selected by the extension
+        Returns:
+             A ResourceFile initialized with a SAS URL appropriate for Batch tasks.
+        """
+        local_path = os.path.join(self.config.BATCH_DIRECTORY, file_path)
+        pathlib.Path(local_path).parent.mkdir(parents=True, exist_ok=True)
+        serializers.dump(obj, local_path, codec)
+        return self.build_resource_file(file_path, container_path, duration_hours)
+
+    def load_output(
+        self, output_file: str, codec: Optional[str] = None, mmap: bool = False
+    ) -> Any:
+        """
+        Loads a downloaded output file written by a worker with
+        :func:`super_batch.serializers.dump`.
+
+        Args:
+            output_file: The name of the output file (as passed to `build_output_file`)
+            codec: The name of the codec to use in place of the one selected by the extension
+            mmap: Memory-map the file rather than reading it into memory, when the format allows it
+        """
+        return serializers.load(
+            os.path.join(self.config.BATCH_DIRECTORY, output_file), codec, mmap
+        )
+
     def build_output_file(
-        self, output_file, container_path
+        self, output_file, container_path, download: bool = True
     ) -> azure.batch.models.ResourceFile:
         """
         Uploads a local file to an Azure Blob storage container.
@@ -173,30 +533,81 @@ class Client:
         Args:
             output_file: the name of the file produced as the output by the task
             container_path: the name of the file in the container
+            download: Should the file be downloaded to the batch directory
+                when the job completes?  Intermediate files, which are only
+                read by other tasks (see :meth:`build_intermediate_file`),
+                stay in the container.  Default `True`
 
         Returns: 
             A ResourceFile initialized with a SAS URL appropriate for Batch tasks.
         """
+        out = self._output_file(output_file, container_path)
+        if download:
+            self.output_files.append(container_path)
+        else:
+            self._intermediate_files.add(container_path)
 
-        # where to store the outputs
-        container_sas_url = (
-            self.container_client.url
-            + "?"
-            + generate_container_sas(
-                self.container_client.account_name,
-                self.container_client.container_name,
-                permission=ContainerSasPermissions(
-                    read=True, write=True, delete=True, list=True
-                ),
-                expiry=datetime.datetime.utcnow()
-                + datetime.timedelta(hours=self.config.STORAGE_ACCESS_DURATION_HRS),
-                account_key=self.config.STORAGE_ACCOUNT_KEY,
-            )
-        )
+        return out
+
+    def build_intermediate_file(
+        self, output_path: str, container_path: str, duration_hours: Optional[int] = None
+    ) -> azure.batch.models.ResourceFile:
+        """
+        Describes an output file of an upstream task as a resource file of a
+        downstream task, so that it is passed from blob to blob without
+        passing through the controller.  The downstream task must depend on
+        the upstream task (see `depends_on` in :meth:`add_task`), since the
+        blob only exists once the upstream task has succeeded.
+
+        Args:
+            output_path: The name of the upstream task's output in the
+                container, as passed to :meth:`build_output_file`
+            container_path: The path where the file should be placed in the
+                container before executing the downstream task
+            duration_hours: Time in hours that the generated SAS URL will be
+                valid for. Defaults to `STORAGE_ACCESS_DURATION_HRS`
+
+        Returns:
+            A ResourceFile initialized with a SAS URL appropriate for Batch tasks.
+        """
+        if duration_hours is None:
+            duration_hours = self.config.STORAGE_ACCESS_DURATION_HRS
+        return self._resource_file(output_path, container_path, duration_hours)
+
+    def add_global_resource(self, resource_file: models.ResourceFile) -> models.ResourceFile:
+        """
+        Marks a resource file (e.g. the global parameters) as used by every
+        task in the job.  It is downloaded once to each node by the job
+        preparation task and linked into each task's working directory at
+        its `file_path` before the task's command line is run (using
+        `/bin/sh`, which the worker image must provide).  Tasks need not
+        list the file among their resource files: if they do, it is not
+        downloaded again.
+
+        Args:
+            resource_file: A resource file returned by :meth:`build_resource_file`
+                or :meth:`build_resource_object`
 
+        Returns:
+            The resource file
+        """
+        if not resource_file.file_path:
+            raise ValueError("Global resource files must have a file_path")
+        if _global_resource_key(resource_file) not in {
+            _global_resource_key(r) for r in self.global_resources
+        }:
+            self.global_resources.append(resource_file)
+        return resource_file
+
+    def _output_file(self, output_file, container_path) -> models.OutputFile:
+        """
+        Describes an output file which is uploaded to the container when the
+        task succeeds, without downloading it when the job completes
+        """
+        # where to store the outputs
         destination = models.OutputFileDestination(
             container=models.OutputFileBlobContainerDestination(
-                container_url=container_sas_url, path=container_path
+                container_url=self._container_url(), path=container_path
             )
         )
 
@@ -206,62 +617,248 @@ class Client:
         )
 
         # https://docs.microsoft.com/en-us/azure/batch/batch-task-output-files#specify-output-files-for-task-output
-        out = models.OutputFile(
+        return models.OutputFile(
             file_pattern=output_file,
             destination=destination,
             upload_options=upload_options,
         )
-        self.output_files.append(container_path)
-
-        return out
 
-    def _create_pool(self):
+    def _container_url(self) -> str:
         """
-        Creates a pool of compute nodes with the specified OS settings.
+        Returns the URL of the container with a SAS token which allows tasks to write to it
+        """
+        from azure.storage.blob import ContainerSasPermissions, generate_container_sas
+
+        return (
+            self.container_client.url
+            + "?"
+            + generate_container_sas(
+                self.container_client.account_name,
+                self.container_client.container_name,
+                permission=ContainerSasPermissions(
+                    read=True, write=True, delete=True, list=True
+                ),
+                expiry=datetime.datetime.utcnow()
+                + datetime.timedelta(hours=self.config.STORAGE_ACCESS_DURATION_HRS),
+                account_key=self.config.STORAGE_ACCOUNT_KEY,
+            )
+        )
 
-        :param batch_service_client: A Batch service client.
-        :type batch_service_client: `azure.batch.BatchServiceClient`
-        :param str pool_id: An ID for the new pool.
-        :param str publisher: Marketplace image publisher
-        :param str offer: Marketplace image offer
-        :param str sku: Marketplace image sku
+    def _pool_description(self) -> models.PoolAddParameter:
+        """
+        Describes a pool of compute nodes with the specified OS settings.
         """
         if self.config.REGISTRY_SERVER:
-            print("Using a private registry")
             registry = models.ContainerRegistry(
                 user_name=self.config.REGISTRY_USERNAME,
                 password=self.config.REGISTRY_PASSWORD,
                 registry_server=self.config.REGISTRY_SERVER,
             )
             container_conf = models.ContainerConfiguration(
+                type="dockerCompatible",
                 container_image_names=[self.config.DOCKER_IMAGE],
                 container_registries=[registry],
             )
         else:
             container_conf = models.ContainerConfiguration(
-                container_image_names=[self.config.DOCKER_IMAGE]
+                type="dockerCompatible",
+                container_image_names=[self.config.DOCKER_IMAGE],
             )
         
         network_configuration = None
         if self.config.SUBNET_ID:
             network_configuration = models.NetworkConfiguration(subnet_id=self.config.SUBNET_ID)
 
-        # Create the pool
-        new_pool = models.PoolAddParameter(
+        if self.config.POOL_AUTOSCALE:
+            size = dict(
+                enable_auto_scale=True,
+                auto_scale_formula=self.autoscale_formula(),
+                auto_scale_evaluation_interval=self._autoscale_interval,
+            )
+        else:
+            size = dict(
+                target_dedicated_nodes=self.config.POOL_NODE_COUNT,
+                target_low_priority_nodes=self.config.POOL_LOW_PRIORITY_NODE_COUNT,
+            )
+
+        return models.PoolAddParameter(
             id=self.config.POOL_ID,
             virtual_machine_configuration=models.VirtualMachineConfiguration(
                 image_reference=self.image,
                 container_configuration=container_conf,
                 node_agent_sku_id=f"batch.node.ubuntu {self.image.sku.removesuffix('-lts').replace('-','.')}",
-                network_configuration=network_configuration
             ),
+            network_configuration=network_configuration,
             vm_size=self.config.POOL_VM_SIZE,
-            target_dedicated_nodes=self.config.POOL_NODE_COUNT,
-            target_low_priority_nodes=self.config.POOL_LOW_PRIORITY_NODE_COUNT,
+            task_slots_per_node=self.config.TASK_SLOTS_PER_NODE,
+            task_scheduling_policy=models.TaskSchedulingPolicy(
+                node_fill_type=self.config.POOL_NODE_FILL_TYPE
+            ),
+            **size,
+        )
+
+    def _create_pool(self):
+        """
+        Creates a pool of compute nodes with the specified OS settings.
+        """
+        if self.config.REGISTRY_SERVER:
+            print("Using a private registry")
+        self.batch_client.pool.add(self._pool_description())
+
+    def _ensure_pool(self):
+        """
+        Creates the pool when the configuration describes one.  An existing
+        pool is reused (and resized to the configured node counts) when its
+        VM size, image, container images, subnet and task slots match the
+        configuration.  Otherwise it is deleted and created again when
+        `RECREATE_POOL` is set.
+
+        Raises:
+            ValueError: If the existing pool's configuration differs and
+                `RECREATE_POOL` is not set
+        """
+        if not (
+            self.config.POOL_VM_SIZE
+            and (self.config.POOL_NODE_COUNT or self.config.POOL_LOW_PRIORITY_NODE_COUNT)
+        ):
+            print("Using existing pool: ", self.config.POOL_ID)
+            return
+
+        pool = self._get_pool()
+        if pool is not None and pool.state == models.PoolState.deleting:
+            self._wait_for_pool_deletion()
+            pool = None
+        description = self._pool_description()
+        if pool is not None and _pool_fingerprint(pool) != _pool_fingerprint(description):
+            differences = "\n    ".join(_pool_differences(pool, description))
+            if not self.config.RECREATE_POOL:
+                raise ValueError(
+                    "The configuration of pool {} differs from the existing pool "
+                    "(set RECREATE_POOL=True to delete and create it again):\n    {}".format(
+                        self.config.POOL_ID, differences
+                    )
+                )
+            print(
+                "Recreating pool {}: its configuration has changed:\n    {}".format(
+                    self.config.POOL_ID, differences
+                )
+            )
+            self.batch_client.pool.delete(self.config.POOL_ID)
+            self._wait_for_pool_deletion()
+            pool = None
+
+        if pool is None:
+            self._create_pool()
+            print("Created pool: ", self.config.POOL_ID)
+        elif self.config.POOL_AUTOSCALE:
+            print("Reusing pool: ", self.config.POOL_ID)
+            self._enable_autoscale()
+        else:
+            print("Reusing pool: ", self.config.POOL_ID)
+            self._resize_pool(pool)
+
+    def _get_pool(self) -> Optional[models.CloudPool]:
+        """
+        Returns the pool, or None if it does not exist
+        """
+        try:
+            return self.batch_client.pool.get(self.config.POOL_ID)
+        except models.BatchErrorException as err:
+            if err.error and err.error.code == "PoolNotFound":
+                return None
+            raise
+
+    def _wait_for_pool_deletion(self, interval: float = 10) -> None:
+        """
+        Waits until the pool has been deleted, so that its id can be used again
+        """
+        print("Waiting for pool {} to be deleted...".format(self.config.POOL_ID))
+        while self.batch_client.pool.exists(self.config.POOL_ID):
+            time.sleep(interval)
+
+    def _resize_pool(self, pool: models.CloudPool) -> None:
+        """
+        Resizes a reused pool to the configured node counts
+        """
+        try:
+            if pool.enable_auto_scale:
+                self.batch_client.pool.disable_auto_scale(self.config.POOL_ID)
+            elif (pool.target_dedicated_nodes, pool.target_low_priority_nodes) == (
+                self.config.POOL_NODE_COUNT,
+                self.config.POOL_LOW_PRIORITY_NODE_COUNT,
+            ):
+                return
+            self.batch_client.pool.resize(
+                self.config.POOL_ID,
+                models.PoolResizeParameter(
+                    target_dedicated_nodes=self.config.POOL_NODE_COUNT,
+                    target_low_priority_nodes=self.config.POOL_LOW_PRIORITY_NODE_COUNT,
+                    node_deallocation_option=models.ComputeNodeDeallocationOption.task_completion,
+                ),
+            )
+            print(
+                "Resizing pool {} to {} dedicated and {} low priority nodes".format(
+                    self.config.POOL_ID,
+                    self.config.POOL_NODE_COUNT,
+                    self.config.POOL_LOW_PRIORITY_NODE_COUNT,
+                )
+            )
+        except models.BatchErrorException as err:
+            # e.g. the pool is already being resized
+            print("Could not resize pool {}: {}".format(self.config.POOL_ID, err))
+
+    def autoscale_formula(self) -> str:
+        """
+        Returns the formula which sizes an autoscaling pool to the pending
+        tasks, taking the slots required by the client's tasks into account
+        """
+        queued = [
+            task
+            for task in getattr(self, "tasks", [])
+            if self.journal.get(task.id) not in FINISHED_STATES
+        ]
+        return _autoscale_formula(
+            min_dedicated=self.config.POOL_MIN_NODE_COUNT,
+            max_dedicated=self.config.POOL_NODE_COUNT or 0,
+            max_low_priority=self.config.POOL_LOW_PRIORITY_NODE_COUNT or 0,
+            task_slots_per_node=self.config.TASK_SLOTS_PER_NODE,
+            slots_per_task=sum(task.required_slots or 1 for task in queued) / len(queued)
+            if queued
+            else 1,
+            queued_tasks=math.ceil(len(queued) / self.config.TASK_PACK_SIZE),
         )
 
-        # Create the pool
-        self.batch_client.pool.add(new_pool)
+    @property
+    def _autoscale_interval(self) -> datetime.timedelta:
+        return datetime.timedelta(minutes=self.config.POOL_AUTOSCALE_INTERVAL_MINUTES)
+
+    def _enable_autoscale(self):
+        """
+        Applies the autoscale formula to an existing pool
+        """
+        try:
+            self.batch_client.pool.enable_auto_scale(
+                self.config.POOL_ID,
+                auto_scale_formula=self.autoscale_formula(),
+                auto_scale_evaluation_interval=self._autoscale_interval,
+            )
+            print("Autoscaling pool: ", self.config.POOL_ID)
+        except models.BatchErrorException as err:
+            # e.g. the pool is being resized
+            print("Could not autoscale pool {}: {}".format(self.config.POOL_ID, err))
+
+    def _job_description(self) -> models.JobAddParameter:
+        """
+        Describes the job that will run the tasks
+        """
+        return models.JobAddParameter(
+            id=self.config.JOB_ID,
+            pool_info=models.PoolInformation(pool_id=self.config.POOL_ID),
+            uses_task_dependencies=any(task.depends_on for task in self.tasks),
+            job_preparation_task=_job_preparation_task(self.global_resources)
+            if self.global_resources
+            else None,
+        )
 
     def _create_job(self):
         """
@@ -274,7 +871,9 @@ class Client:
         resource_files: List[models.ResourceFile],
         output_files: List[models.OutputFile],
         command_line=None,
-    ):
+        required_slots: int = 1,
+        depends_on: Optional[Iterable[Dependency]] = None,
+    ) -> str:
         """
         Adds a task for each input file in the collection to the specified job.
 
@@ -284,10 +883,41 @@ class Client:
             command_line: The command used to for the task.  Optional;
                 if missing, defaults to the command_line parameter provided when
                 instantiating this object
+            required_slots: The number of the node's task slots (e.g. cores)
+                the task occupies. At most `TASK_SLOTS_PER_NODE`
+            depends_on: The tasks which must complete successfully before
+                this task is run: task ids (as returned by this method),
+                `range`s of task indices (e.g. `range(10)` for `Task_0` to
+                `Task_9`) or `TaskIdRange`s, whose ends are inclusive.  Only
+                tasks which have already been added can be depended on, so
+                that the tasks form a DAG.  Outputs are passed to dependent
+                tasks with :meth:`build_intermediate_file`
+
+        Returns:
+            The id of the task
+
+        Raises:
+            ValueError: If `required_slots` is out of range, or a dependency
+                is not a task which has already been added
         """
+        if not 1 <= required_slots <= self.config.TASK_SLOTS_PER_NODE:
+            raise ValueError(
+                "required_slots ({}) must be between 1 and TASK_SLOTS_PER_NODE ({})".format(
+                    required_slots, self.config.TASK_SLOTS_PER_NODE
+                )
+            )
+        depends_on = _dependency_ids(depends_on or [], len(self.tasks))
+        task_id = _task_id(len(self.tasks))
+        self.task_outputs[task_id] = [
+            output_file.destination.container.path
+            for output_file in output_files
+            if output_file.destination.container.path not in self._intermediate_files
+        ]
+        for blob_name in self.task_outputs[task_id]:
+            self._output_tasks[blob_name] = task_id
         self.tasks.append(
             models.TaskAddParameter(
-                id="Task_{}".format(len(self.tasks)),
+                id=task_id,
                 command_line=self.config.COMMAND_LINE
                 if command_line is None
                 else command_line,
@@ -296,34 +926,512 @@ class Client:
                 container_settings=models.TaskContainerSettings(
                     image_name=self.config.DOCKER_IMAGE
                 ),
+                constraints=models.TaskConstraints(
+                    max_task_retry_count=self.config.MAX_TASK_RETRIES
+                )
+                if self._service_retries and self.config.MAX_TASK_RETRIES
+                else None,
+                required_slots=required_slots,
+                depends_on=models.TaskDependencies(task_ids=depends_on)
+                if depends_on
+                else None,
             )
         )
+        return task_id
+
+    def map(
+        self,
+        func_name: str,
+        iterable: Iterable[Any],
+        global_params: Optional[Dict[str, Any]] = None,
+        reduce: Optional[str] = None,
+        fan_in: int = 8,
+        prefix: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Adds a task for each item which calls `func(item, **global_params)`,
+        and optionally reduces the results with tasks which run on the pool
+        in a tree, so that only the final value is downloaded.
+
+        The functions are named as `module:attribute` (e.g.
+        `"worker:simulate"` or `"operator:add"`) and must be importable
+        by the `python` interpreter in the worker image.  Items, global
+        parameters and results are passed as pickle files.
+
+        Args:
+            func_name: The function applied to each item
+            iterable: The items
+            global_params: Keyword arguments passed to each call of the function
+            reduce: The function used to combine pairs of results (as in
+                `functools.reduce`).  When omitted, every result is downloaded
+            fan_in: The number of results combined by each reduce task
+            prefix: The directory (in the batch directory and the
+                container) for the items and results.  Defaults to
+                `<JOB_ID>/map_<n>`
+
+        Returns:
+            The names of the output files, which can be read with
+            :meth:`load_output` once the job has completed: one per item,
+            or the single reduced value
 
-    def _download_files(self):
+        Raises:
+            ValueError: If the iterable is empty or `fan_in` is less than 2
         """
-            def _download_files(config, blob_client, out_path, count):
+        prefix, paths, global_path = self._write_map_inputs(
+            iterable, global_params, fan_in, prefix
+        )
+        shared = [self.build_resource_file(MAPPER_PATH, MAPPER_FILE)]
+        if global_path:
+            shared.append(self.build_resource_file(global_path, GLOBAL_PARAMS_FILE))
+        return self._add_map_tasks(
+            func_name, shared, self.build_resource_files(paths), reduce, fan_in, prefix
+        )
+
+    def _write_map_inputs(
+        self,
+        iterable: Iterable[Any],
+        global_params: Optional[Dict[str, Any]],
+        fan_in: int,
+        prefix: Optional[str],
+    ) -> Tuple[str, List[Tuple[str, str]], Optional[str]]:
         """
+        Writes the items and global parameters of `map` to the batch directory
 
-        pathlib.Path(self.config.BATCH_DIRECTORY).mkdir(parents=True, exist_ok=True)
-        blob_names = [b.name for b in self.container_client.list_blobs()]
+        Returns:
+            The prefix, the (file path, container path) of each item and the
+            file path of the global parameters, if any
+        """
+        if fan_in < 2:
+            raise ValueError("fan_in must be at least 2")
+        if prefix is None:
+            prefix = "{}/map_{}".format(self.config.JOB_ID, len(self.tasks))
+        pathlib.Path(self.config.BATCH_DIRECTORY, prefix).mkdir(parents=True, exist_ok=True)
+
+        paths = []
+        for index, item in enumerate(iterable):
+            file_path = "{}/item_{}.pickle".format(prefix, index)
+            _dump(item, os.path.join(self.config.BATCH_DIRECTORY, file_path))
+            paths.append((file_path, ITEM_FILE))
+        if not paths:
+            raise ValueError("Cannot map over an empty iterable")
+
+        global_path = None
+        if global_params:
+            global_path = "{}/global.pickle".format(prefix)
+            _dump(global_params, os.path.join(self.config.BATCH_DIRECTORY, global_path))
+        return prefix, paths, global_path
+
+    def _add_map_tasks(
+        self,
+        func_name: str,
+        shared: List[models.ResourceFile],
+        item_files: List[models.ResourceFile],
+        reduce: Optional[str],
+        fan_in: int,
+        prefix: str,
+    ) -> List[str]:
+        """
+        Adds the map tasks for the uploaded items, and the tree of reduce
+        tasks.  The first of the `shared` resource files is the mapper.
+        """
+        mapper = shared[0]
+        # each level of the tree is a list of (task id, result blob) pairs
+        level = [
+            (
+                self._add_mapreduce_task(
+                    shared + [item_file],
+                    _command_line("map", func_name),
+                    "{}/result_{}.pickle".format(prefix, index),
+                    download=reduce is None or len(item_files) == 1,
+                    reduce=reduce is not None,
+                ),
+                "{}/result_{}.pickle".format(prefix, index),
+            )
+            for index, item_file in enumerate(item_files)
+        ]
+
+        depth = 0
+        while reduce is not None and len(level) > 1:
+            depth += 1
+            groups = _fan_in(level, fan_in)
+            next_level = []
+            for index, group in enumerate(groups):
+                if len(group) == 1:
+                    next_level.extend(group)
+                    continue
+                blob_name = "{}/reduce_{}_{}.pickle".format(prefix, depth, index)
+                inputs = [
+                    self.build_intermediate_file(child_blob, _input_file(j))
+                    for j, (_, child_blob) in enumerate(group)
+                ]
+                task_id = self._add_mapreduce_task(
+                    [mapper] + inputs,
+                    _command_line("reduce", reduce),
+                    blob_name,
+                    download=len(groups) == 1,
+                    reduce=True,
+                    depends_on=[child_id for child_id, _ in group],
+                )
+                next_level.append((task_id, blob_name))
+            level = next_level
+
+        return [blob_name for _, blob_name in level]
+
+    def _add_mapreduce_task(
+        self,
+        resource_files: List[models.ResourceFile],
+        command_line: str,
+        blob_name: str,
+        download: bool,
+        reduce: bool,
+        depends_on: Optional[List[str]] = None,
+    ) -> str:
+        """
+        Adds a map or reduce task whose output is only downloaded when `download` is set
+        """
+        # intermediate results stay in the container
+        output_file = self.build_output_file(OUTPUT_FILE, blob_name, download=download)
+        task_id = self.add_task(
+            resource_files, [output_file], command_line, depends_on=depends_on
+        )
+        if reduce:
+            self.tasks[-1].exit_conditions = SATISFY_DEPENDENCIES
+        return task_id
+
+    def _download_files(self, max_concurrency: Optional[int] = None):
+        """
+        Downloads the output files to the batch directory, streaming each
+        blob to disk using a pool of worker threads.
+
+        Args:
+            max_concurrency: Maximum number of concurrent downloads. Defaults
+                to the `MAX_CONCURRENCY` configuration value
+        """
 
-        for blob_name in self.output_files:
+        pathlib.Path(self.config.BATCH_DIRECTORY).mkdir(parents=True, exist_ok=True)
+        pending = [
+            blob_name for blob_name in self.output_files if not self._is_downloaded(blob_name)
+        ]
+        if not pending:
+            return
+        blob_names = {b.name for b in self.container_client.list_blobs()}
+
+        for blob_name in pending:
             if not blob_name in blob_names:
                 raise RuntimeError(
                     "incomplete blob set: missing blob {}".format(blob_name)
                 )
 
-            blob_client = self.container_client.get_blob_client(blob_name)
+        if max_concurrency is None:
+            max_concurrency = self.config.MAX_CONCURRENCY
+
+        try:
+            with self.metrics.phase("download"):
+                _map_concurrently(
+                    self._download_file, pending, max_concurrency, "download", "output files"
+                )
+        finally:
+            self._record_downloaded({self._output_tasks.get(b) for b in pending} - {None})
+
+    def _download_file(self, blob_name: str) -> str:
+        """
+        Streams a blob to the batch directory in chunks, so that large
+        outputs are never held in memory.
+
+        Returns:
+            The local path of the downloaded file
+        """
+        download_file_path = os.path.join(self.config.BATCH_DIRECTORY, blob_name)
+        if self._is_downloaded(blob_name):
+            return download_file_path
+
+        blob_client = self.container_client.get_blob_client(blob_name)
+        pathlib.Path(download_file_path).parent.mkdir(parents=True, exist_ok=True)
+
+        # write to a temporary file so that interrupted downloads never
+        # leave a partial output in place
+        partial_file_path = download_file_path + ".part"
+        with open(partial_file_path, "wb") as download_file:
+            blob_client.download_blob().readinto(download_file)
+        os.replace(partial_file_path, download_file_path)
+        return download_file_path
+
+    def _is_downloaded(self, blob_name: str) -> bool:
+        """
+        True if the journal records the output's task as downloaded and the file is on disk
+        """
+        return self.journal.get(
+            self._output_tasks.get(blob_name)
+        ) == DOWNLOADED and os.path.exists(
+            os.path.join(self.config.BATCH_DIRECTORY, blob_name)
+        )
+
+    def _record_downloaded(self, task_ids: Iterable[str]) -> None:
+        """
+        Records the tasks whose output files are all on disk as downloaded
+        """
+        self.journal.set(
+            [
+                task_id
+                for task_id in task_ids
+                if all(
+                    os.path.exists(os.path.join(self.config.BATCH_DIRECTORY, blob_name))
+                    for blob_name in self.task_outputs.get(task_id, [])
+                )
+            ],
+            DOWNLOADED,
+        )
+        self.journal.flush()
 
-            download_file_path = os.path.join(self.config.BATCH_DIRECTORY, blob_name)
-            with open(download_file_path, "wb") as download_file:
-                download_file.write(blob_client.download_blob().readall())
+    def _record_completed(self, tasks: List[models.CloudTask]) -> None:
+        """
+        Records the completed (batch or packed) tasks as succeeded or failed
+        """
+        self.metrics.record_tasks(tasks)
+        for task in tasks:
+            item_ids = self.packs.get(task.id, [task.id])
+            if task.execution_info and (
+                task.execution_info.exit_code or task.execution_info.failure_info
+            ):
+                self.journal.set(item_ids, FAILED)
+            else:
+                self.journal.set(
+                    [i for i in item_ids if self.journal.get(i) != DOWNLOADED], SUCCEEDED
+                )
+        self.journal.flush()
 
-    def run(self, wait: bool = True, **kwargs) -> None:
+    def iter_results(
+        self,
+        loader: Optional[Callable[[str], Any]] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Downloads the outputs of each task as soon as it completes, so that
+        results can be consumed while the remaining tasks are still running.
+        Use after calling `run(wait=False)`.
+
+        Args:
+            loader: Optional function used to deserialize each output file
+                (e.g. `joblib.load`).  It is called with the local path of
+                the output file in a worker thread.
+            max_concurrency: Maximum number of concurrent downloads. Defaults
+                to the `MAX_CONCURRENCY` configuration value
+
+        Yields:
+            `(task_id, local_path)` for each output file, or
+            `(task_id, loader(local_path))` when a loader is provided, in
+            the order in which the downloads complete.
+
+        Raises:
+            RuntimeError: If a task exits with a non-zero exit code or the
+                tasks do not complete within `STORAGE_ACCESS_DURATION_HRS`
+        """
+        if max_concurrency is None:
+            max_concurrency = self.config.MAX_CONCURRENCY
+
+        def fetch(blob_name):
+            local_path = self._download_file(blob_name)
+            return local_path if loader is None else loader(local_path)
+
+        pending = {}
+        remaining = {}
+
+        def harvest(future):
+            item_id = pending.pop(future)
+            remaining[item_id] -= 1
+            if not remaining[item_id]:
+                self._record_downloaded([item_id])
+            return item_id, future.result()
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            for _, tasks in _poll_completed_tasks(
+                self.batch_client,
+                self.config.JOB_ID,
+                datetime.timedelta(hours=self.config.STORAGE_ACCESS_DURATION_HRS),
+                self._task_count,
+                retrier=self._retrier,
+            ):
+                self._record_completed(tasks)
+                _check_exit_codes(tasks, self._retrier.retries)
+                for task in tasks:
+                    for item_id in self.packs.get(task.id, [task.id]):
+                        remaining[item_id] = len(self.task_outputs.get(item_id, []))
+                        for blob_name in self.task_outputs.get(item_id, []):
+                            pending[executor.submit(fetch, blob_name)] = item_id
+                for future in [f for f in pending if f.done()]:
+                    yield harvest(future)
+
+            for future in as_completed(list(pending)):
+                yield harvest(future)
+
+    def _build_packed_tasks(
+        self, tasks: List[models.TaskAddParameter], pack_size: int
+    ) -> List[models.TaskAddParameter]:
+        """
+        Groups the tasks into packs of `pack_size` tasks, each of which is
+        run by a single Azure Batch task.
+        """
+        runner = self.build_resource_file(RUNNER_PATH, RUNNER_FILE)
+        return self._pack(tasks, pack_size, runner)
+
+    def _pack(
+        self,
+        tasks: List[models.TaskAddParameter],
+        pack_size: int,
+        runner: models.ResourceFile,
+    ) -> List[models.TaskAddParameter]:
+        """
+        Groups the tasks into packs, adding them to `self.packs`.  Tasks
+        which depend on other tasks, or which other tasks depend on, are
+        not packed.
+        """
+        dependencies = {
+            task_id
+            for task in tasks
+            if task.depends_on
+            for task_id in task.depends_on.task_ids or []
+        }
+        packed_tasks = [
+            task for task in tasks if task.depends_on or task.id in dependencies
+        ]
+        tasks = [
+            task for task in tasks if not task.depends_on and task.id not in dependencies
+        ]
+        index = len(self.packs)
+        for start in range(0, len(tasks), pack_size):
+            while "Pack_{}".format(index) in self.packs:
+                index += 1
+            pack_id = "Pack_{}".format(index)
+            items = tasks[start : start + pack_size]
+            self.packs[pack_id] = [task.id for task in items]
+            packed_tasks.append(_pack_tasks(pack_id, items, runner))
+        return packed_tasks
+
+    def _add_job(self) -> bool:
+        """
+        Creates the job, or when resuming, uses the existing job
+
+        Returns:
+            True if the job already existed
+        """
+        try:
+            self.batch_client.job.add(self._job_description())
+        except models.BatchErrorException as err:
+            if self._resumed and err.error and err.error.code == "JobExists":
+                print("Resuming job: ", self.config.JOB_ID)
+                return True
+            raise
+        return False
+
+    def _tasks_to_submit(self, job_exists: bool) -> List[models.TaskAddParameter]:
+        """
+        Returns the tasks which need to be added to the job.  When resuming
+        into an existing job, the journal is brought up to date with the
+        service and failed tasks are reactivated.
+        """
+        if not job_exists:
+            self.packs = {}
+            self._submitted_count = 0
+            return [
+                task for task in self.tasks if self.journal.get(task.id) not in FINISHED_STATES
+            ]
+
+        existing = {
+            task.id: task
+            for task in self.batch_client.task.list(
+                self.config.JOB_ID,
+                task_list_options=models.TaskListOptions(
+                    select="id,state,creationTime,executionInfo,nodeInfo"
+                ),
+            )
+        }
+        packed = {item_id for item_ids in self.packs.values() for item_id in item_ids}
+        groups = dict(self.packs)
+        groups.update({task.id: [task.id] for task in self.tasks if task.id not in packed})
+
+        missing = set()
+        for batch_id, item_ids in groups.items():
+            task = existing.get(batch_id)
+            if task is None:
+                missing.update(item_ids)
+                self.packs.pop(batch_id, None)
+            elif task.state == models.TaskState.completed:
+                self._record_completed([task])
+                if self.journal.get(item_ids[0]) == FAILED:
+                    print("Reactivating failed task: ", batch_id)
+                    self.batch_client.task.reactivate(self.config.JOB_ID, batch_id)
+                    self.journal.set(item_ids, SUBMITTED)
+            else:
+                self.journal.set(item_ids, SUBMITTED)
+
+        self._submitted_count = len(existing)
+        return [
+            task
+            for task in self.tasks
+            if task.id in missing and self.journal.get(task.id) not in FINISHED_STATES
+        ]
+
+    def _record_submission(self, batch_tasks: List[models.TaskAddParameter]) -> None:
+        """
+        Writes the client's tasks to the journal and records the tasks to be added as submitted
+        """
+        self.journal.set(
+            [item_id for task in batch_tasks for item_id in self.packs.get(task.id, [task.id])],
+            SUBMITTED,
+        )
+        self.journal.write_client(
+            dict(
+                self.data,
+                tasks=[task.serialize() for task in self.tasks],
+                global_resources=[
+                    resource_file.serialize() for resource_file in self.global_resources
+                ],
+                image=self.image.serialize(),
+            )
+        )
+        self._submitted_count += len(batch_tasks)
+
+    def suggest_pack_size(self, target_seconds: float = 600, job_id: str = None) -> int:
+        """
+        Suggests a `TASK_PACK_SIZE` such that each Azure Batch task runs for
+        about `target_seconds`, based on the median run time of the
+        completed tasks in a previous (or the current) job.
+
+        Args:
+            target_seconds: The desired run time of each Azure Batch task
+            job_id: The job whose task run times are used. Defaults to `JOB_ID`
+
+        Raises:
+            ValueError: If the job has no completed tasks
+        """
+        options = models.TaskListOptions(
+            filter="state eq 'completed'", select="id,executionInfo"
+        )
+        runtimes = []
+        for task in self.batch_client.task.list(
+            job_id or self.config.JOB_ID, task_list_options=options
+        ):
+            info = task.execution_info
+            if info and info.start_time and info.end_time:
+                runtimes.append(
+                    (info.end_time - info.start_time).total_seconds()
+                    / len(self.packs.get(task.id, [task.id]))
+                )
+        if not runtimes:
+            raise ValueError("The job does not contain any completed tasks")
+        return max(1, int(target_seconds / max(statistics.median(runtimes), 1e-3)))
+
+    def run(self, wait: bool = True, pack_size: Optional[int] = None, **kwargs) -> Optional[Results]:
         """ Run the Batch Job
         wait: If true, wait for the batch to complete and then download the
             results to file by calling `self.load_results()` after loading
             all the tasks to the job.
+        pack_size: Number of tasks to run in each Azure Batch task. Defaults
+            to the `TASK_PACK_SIZE` configuration value
+        **kwargs: Passed to :meth:`load_results`
+
+        Returns:
+            The results returned by :meth:`load_results`, when waiting
 
         Raises:
             BatchErrorException: If raised by the Azure Batch Python SDK
@@ -334,37 +1442,32 @@ class Client:
             raise ValueError("Client restored from data cannot be used to run the job")
 
         try:
-            # Create the pool that will contain the compute nodes that will execute the
-            # tasks.
-            if not (
-                self.config.POOL_VM_SIZE
-                and (
-                    self.config.POOL_NODE_COUNT
-                    or self.config.POOL_LOW_PRIORITY_NODE_COUNT
+            with self.metrics.phase("submit"):
+                # Create the pool that will contain the compute nodes that will execute the
+                # tasks.
+                self._ensure_pool()
+
+                # Create the job that will run the tasks.
+                tasks = _use_global_resources(
+                    self._tasks_to_submit(self._add_job()), self.global_resources
                 )
-            ):
-                print("Using existing pool: ", self.config.POOL_ID)
 
-            else:
-                try:
-                    self._create_pool()
-                    print("Created pool: ", self.config.POOL_ID)
-                except models.BatchErrorException:
-                    print("Using pool: ", self.config.POOL_ID)
-
-            # Create the job that will run the tasks.
-            job_description = models.JobAddParameter(
-                id=self.config.JOB_ID,
-                pool_info=models.PoolInformation(pool_id=self.config.POOL_ID),
-            )
-            self.batch_client.job.add(job_description)
+                if pack_size is None:
+                    pack_size = self.config.TASK_PACK_SIZE
+                if pack_size > 1:
+                    tasks = self._build_packed_tasks(tasks, pack_size)
+                self._record_submission(tasks)
 
-            # Add the tasks to the job.
-            self.batch_client.task.add_collection(self.config.JOB_ID, self.tasks)
+                # Add the tasks to the job.
+                rate = _add_task_collection(
+                    self.batch_client, self.config.JOB_ID, tasks, self.config.MAX_CONCURRENCY,
+                )
+                print("Submitted {} tasks ({:.1f} tasks/sec)".format(len(tasks), rate))
 
             # if wait we wait till the results are ready
             if wait:
-                self.load_results(**kwargs)
+                return self.load_results(**kwargs)
+            return None
 
         except models.BatchErrorException as err:
             _print_batch_exception(err)
@@ -375,13 +1478,23 @@ class Client:
             if wait:
                 self._cleanup_batch_resources()
 
-        if wait:
-            self.load_results(**kwargs)
-
-    def load_results(self, quiet=False) -> None:
+    def load_results(
+        self,
+        quiet=False,
+        loader: Optional[Callable[[str], Any]] = None,
+        codec: Optional[str] = None,
+        mmap: bool = True,
+    ) -> Results:
         r"""
-        :param config: A :class:`BatchConfig` instance with the Azure Batch run parameters
-        :type config: :class:BatchConfig
+        Waits for the tasks to complete and downloads the output files.
+
+        :param quiet: Do not print the progress and timings of the job
+        :param loader: Optional function used to read each output file (e.g. `joblib.load`)
+        :param codec: The name of the codec to use in place of the one selected by the extension
+        :param mmap: Memory-map the output files when the format allows it
+
+        :returns: A :class:`~super_batch.results.Results` mapping from each
+            task id to its outputs, which are loaded when accessed
 
         :raises BatchErrorException: If raised by the Azure Batch Python SDK
         """
@@ -394,11 +1507,15 @@ class Client:
 
         try:
             # Pause execution until tasks reach Completed state.
-            _wait_for_tasks_to_complete(
-                self.batch_client,
-                self.config.JOB_ID,
-                datetime.timedelta(hours=self.config.STORAGE_ACCESS_DURATION_HRS),
-            )
+            with self.metrics.phase("wait"):
+                _wait_for_tasks_to_complete(
+                    self.batch_client,
+                    self.config.JOB_ID,
+                    datetime.timedelta(hours=self.config.STORAGE_ACCESS_DURATION_HRS),
+                    self._task_count,
+                    self._record_completed,
+                    self._retrier,
+                )
             self._download_files()
         except models.BatchErrorException as err:
             _print_batch_exception(err)
@@ -406,8 +1523,33 @@ class Client:
         finally:
              # Print out some timing info
             if not quiet:
+                self._print_retries()
+                self._print_metrics()
                 end_time = datetime.datetime.now().replace(microsecond=0)
                 print("End time: {}".format(end_time))
+        return self.results(loader, codec, mmap)
+
+    def results(
+        self,
+        loader: Optional[Callable[[str], Any]] = None,
+        codec: Optional[str] = None,
+        mmap: bool = True,
+    ) -> Results:
+        """
+        Returns the downloaded outputs of each task, which are loaded when
+        accessed.  See :meth:`load_results`
+        """
+        downloaded = set(self.output_files)
+        return Results(
+            self.config.BATCH_DIRECTORY,
+            {
+                task_id: [blob_name for blob_name in blob_names if blob_name in downloaded]
+                for task_id, blob_names in self.task_outputs.items()
+            },
+            loader,
+            codec,
+            mmap,
+        )
 
 
     def _cleanup_batch_resources(self):
@@ -419,24 +1561,109 @@ class Client:
         if self.config.DELETE_JOB_WHEN_DONE:
             self.batch_client.job.delete(self.config.JOB_ID)
         if self.config.DELETE_CONTAINER_WHEN_DONE:
-            self.container_client.delete_container() 
+            self.container_client.delete_container()
+            self.manifest.forget_container(self.container_client.url)
+            self.manifest.save()
 
-    def print_task_output(self, encoding=None):
-        """ Utilty method: Prints the stdout.txt file for each task in the job.
+    def task_logs(
+        self,
+        failed_only: bool = False,
+        tail_bytes: Optional[int] = None,
+        encoding: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> Iterator[TaskLog]:
         """
+        Reads the standard output and error of the tasks in the job.  The
+        tasks are listed once and their files are read concurrently.
 
-        print("Printing task output...")
+        Args:
+            failed_only: Only read the logs of the tasks which have failed
+            tail_bytes: Only read the last `tail_bytes` bytes of each file
+            encoding: The encoding of the files. Defaults to utf-8
+            max_concurrency: Maximum number of tasks whose files are read at
+                once. Defaults to the `MAX_CONCURRENCY` configuration value
+
+        Yields:
+            A :class:`TaskLog` for each task, in the order in which the tasks are listed
+        """
+        return self._iter_task_logs(failed_only, tail_bytes, encoding, max_concurrency)
 
-        for task in self.batch_client.task.list(self.config.JOB_ID):
+    def _iter_task_logs(
+        self,
+        failed_only: bool = False,
+        tail_bytes: Optional[int] = None,
+        encoding: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> Iterator[TaskLog]:
+        """
+        Implements `task_logs`
+        """
+        if max_concurrency is None:
+            max_concurrency = self.config.MAX_CONCURRENCY
+        tasks = self.batch_client.task.list(
+            self.config.JOB_ID,
+            task_list_options=models.TaskListOptions(select=LOG_TASK_SELECT),
+        )
+        if failed_only:
+            tasks = (task for task in tasks if _failed(task))
+        return _map_ordered(
+            lambda task: _task_log(
+                self.batch_client, self.config.JOB_ID, task, tail_bytes, encoding
+            ),
+            tasks,
+            max_concurrency,
+        )
 
-            node_id = self.batch_client.task.get(
-                self.config.JOB_ID, task.id
-            ).node_info.node_id
-            print("Task: {}".format(task.id))
-            print("Node: {}".format(node_id))
+    def follow_task_output(
+        self,
+        task_id: str,
+        file_name: str = STDOUT_FILE,
+        interval: float = 5,
+        encoding: Optional[str] = None,
+    ) -> Iterator[str]:
+        """
+        Yields the output a task writes to `file_name` as it is written,
+        until the task completes.
 
-            stream = self.batch_client.file.get_from_task(
-                self.config.JOB_ID, task.id, "stdout.txt"
-            )
-            print("Standard output:")
-            print(_read_stream_as_string(stream, encoding))
+        Args:
+            task_id: The id of the (Azure Batch) task
+            file_name: The file in the task's directory, e.g. `stdout.txt` or `stderr.txt`
+            interval: Time in seconds between checks for new output
+            encoding: The encoding of the file. Defaults to utf-8
+        """
+        follower = _OutputFollower(
+            self.batch_client, self.config.JOB_ID, task_id, file_name, encoding
+        )
+        while True:
+            text, done = follower.read()
+            if text:
+                yield text
+            if done:
+                return
+            time.sleep(interval)
+
+    def print_task_output(
+        self,
+        encoding=None,
+        failed_only: bool = False,
+        tail_bytes: Optional[int] = None,
+    ):
+        """ Utilty method: Prints the stdout.txt and stderr.txt files for each task in the job.
+
+        Args:
+            encoding: The encoding of the files. Defaults to utf-8
+            failed_only: Only print the output of the tasks which have failed
+            tail_bytes: Only print the last `tail_bytes` bytes of each file
+        """
+
+        print("Printing task output...")
+
+        for log in self._iter_task_logs(failed_only, tail_bytes, encoding):
+            print("Task: {}".format(log.id))
+            print("Node: {}".format(log.node_id))
+            if log.stdout is not None:
+                print("Standard output:")
+                print(log.stdout)
+            if log.stderr:
+                print("Standard error:")
+                print(log.stderr)
@@ -0,0 +1,71 @@
+"""
+Dependencies between the tasks of a job, see `Client.add_task`.
+
+Tasks may depend on task ids, on python `range`s of task indices or on
+`TaskIdRange`s (whose ends are inclusive, as in the Batch service).  The
+service only matches id ranges against numeric task ids, and the client's
+tasks are named `Task_<n>`, so ranges are expanded to the ids they cover.
+"""
+# pylint: disable=bad-continuation, line-too-long, invalid-name
+
+import re
+from typing import Iterable, List, Union
+
+import azure.batch.models as models
+
+# the batch service limits the total length of the ids a task depends on
+MAX_DEPENDENCY_ID_LENGTH = 64000
+
+_TASK_ID = re.compile(r"Task_(\d+)$")
+
+Dependency = Union[str, range, models.TaskIdRange]
+
+
+def _task_id(index: int) -> str:
+    return "Task_{}".format(index)
+
+
+def _task_index(task_id: str) -> int:
+    """
+    Returns the index of a task added by the client, or -1 for any other id
+    """
+    match = _TASK_ID.match(task_id)
+    return int(match.group(1)) if match else -1
+
+
+def _dependency_ids(depends_on: Iterable[Dependency], task_count: int) -> List[str]:
+    """
+    Returns the ids of the tasks which a new task depends on, in order and
+    without duplicates.
+
+    Raises:
+        ValueError: If a dependency is not one of the `task_count` tasks
+            which have already been added (so that the tasks form a DAG), or
+            the ids are too long for the batch service
+    """
+    ids: List[str] = []
+    for dependency in depends_on:
+        if isinstance(dependency, str):
+            indices = [_task_index(dependency)]
+        elif isinstance(dependency, models.TaskIdRange):
+            indices = range(dependency.start, dependency.end + 1)
+        else:
+            indices = dependency
+        for index in indices:
+            if not 0 <= index < task_count:
+                raise ValueError(
+                    "Tasks can only depend on tasks which have already been added, not {!r}".format(
+                        dependency
+                    )
+                )
+        ids.extend(_task_id(index) for index in indices)
+    ids = list(dict.fromkeys(ids))
+
+    length = sum(len(task_id) for task_id in ids)
+    if length > MAX_DEPENDENCY_ID_LENGTH:
+        raise ValueError(
+            "A task can depend on task ids totalling at most {} characters, not {} "
+            "({} tasks); consider combining their outputs with intermediate tasks "
+            "(e.g. with `Client.map`)".format(MAX_DEPENDENCY_ID_LENGTH, length, len(ids))
+        )
+    return ids
@@ -0,0 +1,101 @@
+"""
+Job-global resource files, which are downloaded once to each node by the
+job preparation task rather than once for each task.
+
+The tasks link the files from the job preparation task's working directory
+into their own working directory before running their command line, so
+that worker code reads them from the same relative paths as before.
+"""
+# pylint: disable=bad-continuation, line-too-long, invalid-name
+
+import copy
+import posixpath
+import shlex
+from typing import List
+
+import azure.batch.models as models
+
+# the job preparation task only downloads the resource files
+JOB_PREP_COMMAND_LINE = "/bin/sh -c true"
+JOB_PREP_DIR_VARIABLE = "AZ_BATCH_JOB_PREP_WORKING_DIR"
+
+
+def _job_preparation_task(
+    resource_files: List[models.ResourceFile],
+) -> models.JobPreparationTask:
+    return models.JobPreparationTask(
+        command_line=JOB_PREP_COMMAND_LINE,
+        resource_files=resource_files,
+        wait_for_success=True,
+    )
+
+
+def _strip_query(url):
+    return url.split("?", 1)[0] if url else url
+
+
+def _global_resource_key(resource_file: models.ResourceFile) -> tuple:
+    """
+    Identifies a resource file by its blob and `file_path`, ignoring the SAS
+    token in its URL, which is generated afresh each time the resource file
+    is built
+    """
+    return (
+        _strip_query(resource_file.http_url),
+        _strip_query(resource_file.storage_container_url),
+        resource_file.auto_storage_container_name,
+        resource_file.blob_prefix,
+        resource_file.file_path,
+    )
+
+
+def _link_command(file_paths: List[str], command_line: str) -> str:
+    """
+    Returns a command line which links the files from the job preparation
+    task's working directory and then runs the original command line
+    """
+    steps = []
+    for file_path in file_paths:
+        directory = posixpath.dirname(file_path)
+        if directory:
+            steps.append("mkdir -p {}".format(shlex.quote(directory)))
+        steps.append(
+            'ln -sf "${}"/{} {}'.format(
+                JOB_PREP_DIR_VARIABLE, shlex.quote(file_path), shlex.quote(file_path)
+            )
+        )
+    steps.append("exec {}".format(command_line))
+    return "/bin/sh -c {}".format(shlex.quote(" && ".join(steps)))
+
+
+def _use_global_resources(
+    tasks: List[models.TaskAddParameter], global_resources: List[models.ResourceFile]
+) -> List[models.TaskAddParameter]:
+    """
+    Returns copies of the tasks which link the global resource files rather
+    than downloading them
+
+    Raises:
+        ValueError: If a task has no command line to run after linking the files
+    """
+    if not global_resources:
+        return tasks
+    keys = {_global_resource_key(resource_file) for resource_file in global_resources}
+    file_paths = [resource_file.file_path for resource_file in global_resources]
+    out = []
+    for task in tasks:
+        if not task.command_line:
+            raise ValueError(
+                "Task {} has no command line to run after linking the global resources".format(
+                    task.id
+                )
+            )
+        task = copy.copy(task)
+        task.resource_files = [
+            resource_file
+            for resource_file in task.resource_files or []
+            if _global_resource_key(resource_file) not in keys
+        ]
+        task.command_line = _link_command(file_paths, task.command_line)
+        out.append(task)
+    return out
@@ -0,0 +1,110 @@
+"""
+A durable, append-only record of the state of each task in a job, kept in
+the batch directory so that interrupted or partially failed jobs can be
+resumed.
+"""
+# pylint: disable=bad-continuation, line-too-long, invalid-name
+
+import json
+import os
+import pathlib
+import threading
+
+JOURNAL_PATTERN = "{}.journal"
+
+SUBMITTED = "submitted"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+DOWNLOADED = "downloaded"
+
+# states in which a task does not need to be run again
+FINISHED_STATES = (SUCCEEDED, DOWNLOADED)
+
+
+class _JobJournal:
+    """
+    Records the definition of a job's tasks and the state of each task.
+
+    The journal is a json-lines file.  A `client` record holds the client's
+    data, its task definitions and a snapshot of the task states, and each
+    subsequent `states` record holds the tasks whose state has since
+    changed.  Records which were only partially written (e.g. when the
+    process was killed) are ignored when the journal is read.
+    """
+
+    def __init__(self, directory, job_id):
+        self.path = os.path.join(directory, JOURNAL_PATTERN.format(job_id))
+        self.states = {}
+        self._lock = threading.Lock()
+        self._changes = {}
+
+    def get(self, task_id, default=None):
+        """
+        Returns the state of the task
+        """
+        with self._lock:
+            return self.states.get(task_id, default)
+
+    def set(self, task_ids, state):
+        """
+        Sets the state of the tasks, to be written by the next call to `flush()`
+        """
+        with self._lock:
+            for task_id in task_ids:
+                if self.states.get(task_id) != state:
+                    self.states[task_id] = state
+                    self._changes[task_id] = state
+
+    def write_client(self, client_data):
+        """
+        Writes the client's data along with a snapshot of the task states
+        """
+        with self._lock:
+            record = {"client": client_data, "states": dict(self.states)}
+            self._changes = {}
+        self._append(record)
+
+    def flush(self):
+        """
+        Writes any task states which have changed since the last write
+        """
+        with self._lock:
+            if not self._changes:
+                return
+            record = {"states": self._changes}
+            self._changes = {}
+        self._append(record)
+
+    def _append(self, record):
+        pathlib.Path(os.path.dirname(self.path)).mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as fh:
+            fh.write(json.dumps(record) + "\n")
+
+    @staticmethod
+    def read(path):
+        """
+        Reads a journal file
+
+        Returns:
+            The client data from the most recent `client` record and the
+            current state of each task
+
+        Raises:
+            ValueError: If the journal does not contain a client record
+        """
+        client_data = None
+        states = {}
+        with open(path, "r") as fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if "client" in record:
+                    client_data = record["client"]
+                    states = record["states"]
+                else:
+                    states.update(record["states"])
+        if client_data is None:
+            raise ValueError("No client record found in journal: {}".format(path))
+        return client_data, states
@@ -0,0 +1,699 @@
+"""
+Runs SuperBatch jobs on the local machine
+
+The storage container is a directory in the batch directory and the tasks
+are run by a pool of worker processes, so that the resource and output file
+contract of a job can be exercised, profiled and benchmarked without Azure.
+
+The local container (`_LocalContainerClient`) and batch service
+(`_LocalBatchServiceClient`) are the supported backend of `LocalClient`.
+They implement the operations of the storage and batch SDKs which the
+clients use, with the semantics of the Azure services: resource files are
+staged into each task's working directory, output files are uploaded
+according to their upload conditions, and task dependencies (including
+`satisfy` dependency actions), job preparation tasks, the retry count
+constraint and reading task files are supported.  Pools are not: the tasks
+run on this machine, so pool settings such as autoscaling are ignored.
+"""
+# pylint: disable=bad-continuation, invalid-name, protected-access, line-too-long
+
+import datetime
+import glob
+import os
+import pathlib
+import re
+import shlex
+import shutil
+import subprocess
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import urlparse
+from urllib.request import url2pathname, urlopen
+
+import azure.batch.models as models
+
+from .BatchConfig import _BatchConfig, _CONFIG_SCHEMA, _validate, SERVICE_KEYS
+from .client import Client
+
+# the directory within the batch directory which holds the local container and task directories
+LOCAL_DIRECTORY = ".super_batch_local"
+# the working directory of the job preparation task, within the job directory
+JOB_PREP_DIRECTORY = "jobpreparation"
+
+# jobs run on the local machine do not use the Azure services
+_LOCAL_CONFIG_SCHEMA = dict(
+    _CONFIG_SCHEMA,
+    required=[k for k in _CONFIG_SCHEMA["required"] if k not in SERVICE_KEYS],
+)
+
+_WILDCARDS = re.compile(r"[*?\[]")
+_SINCE = re.compile(r"stateTransitionTime ge DateTime'([^']+)'")
+_RANGE = re.compile(r"bytes=(\d+)-")
+
+
+def _url_to_path(url: str) -> str:
+    return url2pathname(urlparse(url).path)
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+# --------------------------------------------------
+# STORAGE
+# --------------------------------------------------
+
+
+class _BlobProperties(NamedTuple):
+    name: str
+    size: int
+
+
+class _LocalDownload:
+    """
+    Mimics the `StorageStreamDownloader` returned by `download_blob()`
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def readinto(self, stream) -> int:
+        with open(self.path, "rb") as fh:
+            shutil.copyfileobj(fh, stream)
+            return fh.tell()
+
+    def readall(self) -> bytes:
+        with open(self.path, "rb") as fh:
+            return fh.read()
+
+    def chunks(self):
+        with open(self.path, "rb") as fh:
+            yield from iter(lambda: fh.read(4 * 1024 * 1024), b"")
+
+
+class _LocalBlobClient:
+    """
+    Mimics the parts of the storage `BlobClient` used by the client
+    """
+
+    def __init__(self, container, blob_name):
+        self.account_name = container.account_name
+        self.container_name = container.container_name
+        self.blob_name = blob_name
+        self.path = os.path.join(container.directory, blob_name)
+        self.url = pathlib.Path(self.path).as_uri()
+
+    def upload_blob(self, data, blob_type=None, overwrite=False, **kwargs):
+        # pylint: disable=unused-argument
+        if not overwrite and os.path.exists(self.path):
+            raise FileExistsError(self.blob_name)
+        pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        partial_path = "{}.{}.part".format(self.path, threading.get_ident())
+        with open(partial_path, "wb") as fh:
+            if isinstance(data, (bytes, bytearray)):
+                fh.write(data)
+            else:
+                shutil.copyfileobj(data, fh)
+        os.replace(partial_path, self.path)
+
+    def stage_block(self, block_id, data, length=None, **kwargs):
+        # pylint: disable=unused-argument
+        block_path = os.path.join(self.path + ".blocks", block_id)
+        pathlib.Path(block_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(block_path, "wb") as fh:
+            fh.write(data)
+
+    def commit_block_list(self, block_list, content_settings=None, **kwargs):
+        # pylint: disable=unused-argument
+        blocks_directory = self.path + ".blocks"
+        partial_path = "{}.{}.part".format(self.path, threading.get_ident())
+        with open(partial_path, "wb") as fh:
+            for block in block_list:
+                with open(os.path.join(blocks_directory, block.id), "rb") as block_file:
+                    shutil.copyfileobj(block_file, fh)
+        os.replace(partial_path, self.path)
+        shutil.rmtree(blocks_directory, ignore_errors=True)
+
+    def get_blob_properties(self, **kwargs) -> _BlobProperties:
+        # pylint: disable=unused-argument
+        return _BlobProperties(self.blob_name, os.path.getsize(self.path))
+
+    def download_blob(self, **kwargs) -> _LocalDownload:
+        # pylint: disable=unused-argument
+        return _LocalDownload(self.path)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+
+class _LocalContainerClient:
+    """
+    Mimics the parts of the storage `ContainerClient` used by the client,
+    storing each blob as a file within a directory
+    """
+
+    account_name = "local"
+
+    def __init__(self, directory, container_name):
+        self.directory = directory
+        self.container_name = container_name
+        self.url = pathlib.Path(directory).as_uri()
+
+    def create_container(self):
+        pathlib.Path(self.directory).mkdir(parents=True, exist_ok=True)
+
+    def delete_container(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def get_blob_client(self, blob_name) -> _LocalBlobClient:
+        return _LocalBlobClient(self, blob_name)
+
+    def list_blobs(self, name_starts_with=None, **kwargs):
+        # pylint: disable=unused-argument
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                blob_name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                if blob_name.endswith(".part"):
+                    continue
+                if name_starts_with and not blob_name.startswith(name_starts_with):
+                    continue
+                yield _BlobProperties(blob_name, os.path.getsize(path))
+
+
+# --------------------------------------------------
+# BATCH
+# --------------------------------------------------
+
+
+class _LocalTask:
+    """
+    The state of a task in a local job
+    """
+
+    def __init__(self, parameters: models.TaskAddParameter):
+        self.parameters = parameters
+        self.state = models.TaskState.active
+        self.creation_time = self.state_transition_time = _now()
+        self.execution_info = None
+        self.retry_count = 0
+
+    def set_state(self, state):
+        self.state = state
+        self.state_transition_time = _now()
+
+    def describe(self) -> models.CloudTask:
+        return models.CloudTask(
+            id=self.parameters.id,
+            creation_time=self.creation_time,
+            state=self.state,
+            state_transition_time=self.state_transition_time,
+            command_line=self.parameters.command_line,
+            resource_files=self.parameters.resource_files,
+            output_files=self.parameters.output_files,
+            execution_info=self.execution_info,
+            node_info=models.ComputeNodeInformation(node_id="localhost"),
+        )
+
+
+class _LocalBatchServiceClient:
+    """
+    Mimics the parts of the `BatchServiceClient` used by the client, running
+    each task in a subprocess using a pool of `workers` threads.
+
+    Each task's resource files are staged into its own working directory,
+    its command line is run (without a shell, as on a Batch node) and its
+    output files are copied to the container named in their destination
+    URL.  The docker image named in the task's container settings is not
+    used: commands are run on this machine.  Tasks with dependencies are run
+    once the tasks they depend on have succeeded (or have failed with a
+    `satisfy` dependency action).
+    """
+
+    def __init__(self, directory: str, workers: int):
+        self.directory = directory
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, _LocalTask]] = {}
+        # the active tasks which have not been started, by job
+        self._waiting: Dict[str, Dict[str, _LocalTask]] = {}
+        # the job preparation task of each job, until it has been run
+        self._preparation: Dict[str, Optional[models.JobPreparationTask]] = {}
+        self._preparation_lock = threading.Lock()
+
+        self.job = types.SimpleNamespace(
+            add=self._add_job,
+            delete=self._delete_job,
+            get_task_counts=self._get_task_counts,
+        )
+        self.task = types.SimpleNamespace(
+            add_collection=self._add_tasks,
+            list=self._list_tasks,
+            get=self._get_task,
+            reactivate=self._reactivate_task,
+        )
+        self.file = types.SimpleNamespace(
+            get_from_task=self._get_task_file,
+            get_properties_from_task=self._get_task_file_properties,
+        )
+        self.pool = types.SimpleNamespace(delete=lambda pool_id: None)
+
+    # jobs
+
+    def _add_job(self, job: models.JobAddParameter):
+        """
+        Creates the job, replacing any local job with the same id
+        """
+        with self._lock:
+            self._jobs[job.id] = {}
+            self._waiting[job.id] = {}
+            self._preparation[job.id] = job.job_preparation_task
+
+    def _delete_job(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._waiting.pop(job_id, None)
+            self._preparation.pop(job_id, None)
+        shutil.rmtree(os.path.join(self.directory, job_id), ignore_errors=True)
+
+    def _get_task_counts(self, job_id: str) -> models.TaskCounts:
+        with self._lock:
+            states = [task.state for task in self._jobs[job_id].values()]
+            failed = sum(
+                task.state == models.TaskState.completed
+                and task.execution_info.result == models.TaskExecutionResult.failure
+                for task in self._jobs[job_id].values()
+            )
+        completed = states.count(models.TaskState.completed)
+        return models.TaskCounts(
+            active=states.count(models.TaskState.active),
+            running=states.count(models.TaskState.running),
+            completed=completed,
+            succeeded=completed - failed,
+            failed=failed,
+        )
+
+    # tasks
+
+    def _add_tasks(self, job_id: str, tasks: List[models.TaskAddParameter], threads=None):
+        # pylint: disable=unused-argument
+        results = []
+        for parameters in tasks:
+            task = _LocalTask(parameters)
+            with self._lock:
+                self._jobs[job_id][parameters.id] = task
+                self._waiting[job_id][parameters.id] = task
+            results.append(
+                models.TaskAddResult(
+                    status=models.TaskAddStatus.success, task_id=parameters.id
+                )
+            )
+        self._schedule(job_id)
+        return models.TaskAddCollectionResult(value=results)
+
+    def _schedule(self, job_id: str):
+        """
+        Starts the active tasks whose dependencies are satisfied
+        """
+        with self._lock:
+            tasks = self._jobs.get(job_id, {})
+            waiting = self._waiting.get(job_id, {})
+            ready = [
+                task
+                for task in waiting.values()
+                if all(
+                    _satisfies(tasks.get(task_id))
+                    for task_id in _dependencies(task.parameters)
+                )
+            ]
+            for task in ready:
+                del waiting[task.parameters.id]
+        for task in ready:
+            self._executor.submit(self._run_task, job_id, task)
+
+    def _list_tasks(self, job_id: str, task_list_options=None) -> List[models.CloudTask]:
+        task_filter = task_list_options.filter if task_list_options else None
+        with self._lock:
+            tasks = [task.describe() for task in self._jobs[job_id].values()]
+        if task_filter and "state eq 'completed'" in task_filter:
+            tasks = [task for task in tasks if task.state == models.TaskState.completed]
+        since = _SINCE.search(task_filter or "")
+        if since:
+            since = datetime.datetime.strptime(
+                since.group(1), "%Y-%m-%dT%H:%M:%S.%fZ"
+            ).replace(tzinfo=datetime.timezone.utc)
+            tasks = [task for task in tasks if task.state_transition_time >= since]
+        return tasks
+
+    def _get_task(self, job_id: str, task_id: str) -> models.CloudTask:
+        with self._lock:
+            return self._jobs[job_id][task_id].describe()
+
+    def _reactivate_task(self, job_id: str, task_id: str):
+        with self._lock:
+            task = self._jobs[job_id][task_id]
+            task.retry_count = 0
+            task.set_state(models.TaskState.active)
+            self._waiting[job_id][task_id] = task
+        self._schedule(job_id)
+
+    def _task_file_path(self, job_id: str, task_id: str, file_path: str) -> str:
+        path = os.path.join(self.directory, job_id, task_id, file_path)
+        if not os.path.isfile(path):
+            raise _batch_error(
+                "FileNotFound", "The file {} of task {} does not exist".format(file_path, task_id)
+            )
+        return path
+
+    def _get_task_file(
+        self, job_id: str, task_id: str, file_path: str, file_get_from_task_options=None
+    ):
+        path = self._task_file_path(job_id, task_id, file_path)
+        start = 0
+        if file_get_from_task_options and file_get_from_task_options.ocp_range:
+            start = int(_RANGE.match(file_get_from_task_options.ocp_range).group(1))
+
+        def chunks():
+            with open(path, "rb") as fh:
+                fh.seek(start)
+                yield from iter(lambda: fh.read(1024 * 1024), b"")
+
+        return chunks()
+
+    def _get_task_file_properties(
+        self, job_id: str, task_id: str, file_path: str, raw=False
+    ):
+        # pylint: disable=unused-argument
+        path = self._task_file_path(job_id, task_id, file_path)
+        return types.SimpleNamespace(headers={"Content-Length": os.path.getsize(path)})
+
+    # execution
+
+    def _prepare_job(self, job_id: str):
+        """
+        Runs the job preparation task before the first task of the job, as
+        on each node of a pool.  Its working directory is kept for the tasks.
+
+        Returns:
+            The exit code and failure information of the job preparation task
+        """
+        with self._preparation_lock:
+            preparation = self._preparation.get(job_id)
+            if preparation is None:
+                return None, None
+            working_directory = os.path.join(self.directory, job_id, JOB_PREP_DIRECTORY)
+            try:
+                shutil.rmtree(working_directory, ignore_errors=True)
+                pathlib.Path(working_directory).mkdir(parents=True)
+                _stage_resource_files(preparation.resource_files, working_directory)
+                exit_code = subprocess.call(
+                    shlex.split(preparation.command_line),
+                    cwd=working_directory,
+                    env=dict(os.environ, AZ_BATCH_JOB_ID=job_id),
+                )
+            except Exception as err:  # pylint: disable=broad-except
+                return None, models.TaskFailureInformation(
+                    category=models.ErrorCategory.user_error,
+                    code=type(err).__name__,
+                    message="The job preparation task failed: {}".format(err),
+                )
+            if exit_code:
+                return exit_code, models.TaskFailureInformation(
+                    category=models.ErrorCategory.user_error,
+                    code="JobPreparationTaskFailed",
+                    message="The job preparation task exited with code {}".format(exit_code),
+                )
+            self._preparation[job_id] = None
+            return None, None
+
+    def _run_task(self, job_id: str, task: _LocalTask):
+        """
+        Runs the task, retrying it as allowed by its constraints
+        """
+        parameters = task.parameters
+        max_retries = (
+            parameters.constraints.max_task_retry_count or 0
+            if parameters.constraints
+            else 0
+        )
+        task_directory = os.path.join(self.directory, job_id, parameters.id)
+        start_time = _now()
+        with self._lock:
+            task.set_state(models.TaskState.running)
+
+        while True:
+            exit_code, failure_info = self._prepare_job(job_id)
+            if exit_code or failure_info:
+                break
+            exit_code, failure_info = _execute(parameters, job_id, task_directory)
+            if not exit_code or (max_retries != -1 and task.retry_count >= max_retries):
+                break
+            task.retry_count += 1
+
+        with self._lock:
+            task.execution_info = models.TaskExecutionInformation(
+                start_time=start_time,
+                end_time=_now(),
+                exit_code=exit_code,
+                failure_info=failure_info,
+                retry_count=task.retry_count,
+                requeue_count=0,
+                result=models.TaskExecutionResult.failure
+                if exit_code or failure_info
+                else models.TaskExecutionResult.success,
+            )
+            task.set_state(models.TaskState.completed)
+        self._schedule(job_id)
+
+
+def _batch_error(code: str, message: str) -> models.BatchErrorException:
+    """
+    Returns a BatchErrorException like those raised by the batch service
+    """
+    err = models.BatchErrorException.__new__(models.BatchErrorException)
+    Exception.__init__(err, message)
+    err.message = message
+    err.response = None
+    err.error = models.BatchError(code=code, message=models.ErrorMessage(value=message))
+    return err
+
+
+def _dependencies(parameters: models.TaskAddParameter) -> List[str]:
+    return parameters.depends_on.task_ids or [] if parameters.depends_on else []
+
+
+def _satisfies(task: Optional[_LocalTask]) -> bool:
+    """
+    True if the completed task allows the tasks which depend on it to run
+    """
+    if task is None or task.state != models.TaskState.completed:
+        return False
+    if task.execution_info.result == models.TaskExecutionResult.success:
+        return True
+    exit_conditions = task.parameters.exit_conditions
+    return bool(
+        exit_conditions
+        and exit_conditions.default
+        and exit_conditions.default.dependency_action == models.DependencyAction.satisfy
+    )
+
+
+def _execute(parameters: models.TaskAddParameter, job_id: str, task_directory: str):
+    """
+    Stages the resource files, runs the command line and uploads the output
+    files of a task
+
+    Returns:
+        The exit code of the command (or None if it was not run) and a
+        TaskFailureInformation if the task could not be run or its outputs
+        could not be uploaded
+    """
+    working_directory = os.path.join(task_directory, "wd")
+    exit_code = None
+    try:
+        shutil.rmtree(working_directory, ignore_errors=True)
+        pathlib.Path(working_directory).mkdir(parents=True)
+
+        _stage_resource_files(parameters.resource_files, working_directory)
+
+        env = dict(
+            os.environ,
+            AZ_BATCH_JOB_ID=job_id,
+            AZ_BATCH_TASK_ID=parameters.id,
+            AZ_BATCH_TASK_DIR=task_directory,
+            AZ_BATCH_TASK_WORKING_DIR=working_directory,
+            AZ_BATCH_JOB_PREP_WORKING_DIR=os.path.join(
+                os.path.dirname(task_directory), JOB_PREP_DIRECTORY
+            ),
+        )
+        env.update(
+            (setting.name, setting.value or "")
+            for setting in parameters.environment_settings or []
+        )
+        with open(os.path.join(task_directory, "stdout.txt"), "wb") as stdout, open(
+            os.path.join(task_directory, "stderr.txt"), "wb"
+        ) as stderr:
+            exit_code = subprocess.call(
+                shlex.split(parameters.command_line),
+                cwd=working_directory,
+                env=env,
+                stdout=stdout,
+                stderr=stderr,
+            )
+
+        for output_file in parameters.output_files or []:
+            condition = output_file.upload_options.upload_condition
+            if (condition == models.OutputFileUploadCondition.task_success and exit_code) or (
+                condition == models.OutputFileUploadCondition.task_failure and not exit_code
+            ):
+                continue
+            _upload_output_file(output_file, working_directory)
+
+    except Exception as err:  # pylint: disable=broad-except
+        return (
+            exit_code,
+            models.TaskFailureInformation(
+                category=models.ErrorCategory.user_error,
+                code=type(err).__name__,
+                message=str(err),
+            ),
+        )
+    finally:
+        shutil.rmtree(working_directory, ignore_errors=True)
+    return exit_code, None
+
+
+def _stage_resource_files(resource_files: List[models.ResourceFile], working_directory: str):
+    """
+    Copies the resource files into the working directory
+    """
+    for resource_file in resource_files or []:
+        if not resource_file.http_url:
+            raise ValueError(
+                "Only resource files with an http_url can be run locally"
+            )
+        destination = os.path.join(working_directory, resource_file.file_path)
+        pathlib.Path(destination).parent.mkdir(parents=True, exist_ok=True)
+        if urlparse(resource_file.http_url).scheme == "file":
+            shutil.copyfile(_url_to_path(resource_file.http_url), destination)
+        else:
+            with urlopen(resource_file.http_url) as source, open(destination, "wb") as fh:
+                shutil.copyfileobj(source, fh)
+
+
+def _upload_output_file(output_file: models.OutputFile, working_directory: str):
+    """
+    Copies the files matching the output file's pattern to its destination
+    container.  As on Azure Batch, the destination path names a blob when
+    the pattern names a single file and a virtual directory when the pattern
+    contains wildcards.
+    """
+    destination = output_file.destination.container
+    container_directory = _url_to_path(destination.container_url)
+    pattern = os.path.join(working_directory, output_file.file_pattern)
+
+    if not _WILDCARDS.search(output_file.file_pattern):
+        if os.path.isfile(pattern):
+            _copy_blob(pattern, container_directory, destination.path)
+        return
+
+    for path in glob.glob(pattern, recursive=True):
+        if os.path.isfile(path):
+            blob_name = os.path.relpath(path, working_directory).replace(os.sep, "/")
+            if destination.path:
+                blob_name = destination.path.rstrip("/") + "/" + blob_name
+            _copy_blob(path, container_directory, blob_name)
+
+
+def _copy_blob(path: str, container_directory: str, blob_name: str):
+    blob_path = os.path.join(container_directory, blob_name)
+    pathlib.Path(blob_path).parent.mkdir(parents=True, exist_ok=True)
+    partial_path = "{}.{}.part".format(blob_path, threading.get_ident())
+    shutil.copyfile(path, partial_path)
+    os.replace(partial_path, blob_path)
+
+
+# --------------------------------------------------
+# CLIENT
+# --------------------------------------------------
+
+
+class LocalClient(Client):
+    """ Local SuperBatch Client
+
+    Provides the same interface as :class:`super_batch.Client`, but runs the
+    job on this machine: resource and output files are stored in a local
+    container directory (`.super_batch_local` within the batch directory)
+    and the tasks' command lines are run by a pool of worker processes, one
+    per core by default.  Output files are downloaded to the batch
+    directory exactly as they would be from Azure.
+
+    The Azure account keys are not required, the docker image is not used,
+    and the command line is run on this machine, so it should name a worker
+    which can be found from the task's working directory (e.g.
+    `COMMAND_LINE="python /path/to/worker.py"`).
+
+    Usage::
+
+        batch_client = super_batch.LocalClient(**config)
+        ...
+        batch_client.run()
+    """
+
+    def __init__(self, image=None, workers: Optional[int] = None, **kwargs):
+        """
+        Args:
+            image: Unused; accepted for compatibility with :class:`super_batch.Client`
+            workers: The number of tasks to run at once. Defaults to the number of cores
+            **kwargs: Additinal arguments passed to :class:`super_barch.BatchConfig`
+        """
+        self.workers = workers or os.cpu_count() or 1
+        super().__init__(image, **kwargs)
+
+    def _build_config(self, **kwargs) -> _BatchConfig:
+        """
+        Validates the configuration, which need not include the Azure account keys
+        """
+        return _validate(_BatchConfig(**kwargs), _LOCAL_CONFIG_SCHEMA)
+
+    def _create_clients(self):
+        """
+        Creates the local container and the local task runner
+        """
+        directory = os.path.join(self.config.BATCH_DIRECTORY, LOCAL_DIRECTORY)
+        self.blob_client = None
+        self.container_client = _LocalContainerClient(
+            os.path.join(directory, "containers", self.config.BLOB_CONTAINER_NAME),
+            self.config.BLOB_CONTAINER_NAME,
+        )
+        self.container_client.create_container()
+        self.batch_client = _LocalBatchServiceClient(
+            os.path.join(directory, "tasks"), self.workers
+        )
+
+    def _resource_file(
+        self, blob_name: str, container_path: str, duration_hours: int
+    ) -> models.ResourceFile:
+        """
+        Returns a ResourceFile with a file URL for the blob
+        """
+        # pylint: disable=unused-argument
+        return models.ResourceFile(
+            http_url=self.container_client.get_blob_client(blob_name).url,
+            file_path=container_path,
+        )
+
+    def _container_url(self) -> str:
+        """
+        Returns the file URL of the container
+        """
+        return self.container_client.url
+
+    def _ensure_pool(self):
+        """
+        Tasks are run on this machine, so there is no pool to create
+        """
+        print("Running tasks locally with {} workers".format(self.workers))
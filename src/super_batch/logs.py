@@ -0,0 +1,170 @@
+"""
+Retrieval of the standard output and error files of tasks
+"""
+# pylint: disable=bad-continuation, line-too-long, invalid-name
+
+import codecs
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional, Tuple, TypeVar
+
+import azure.batch.models as models
+
+STDOUT_FILE = "stdout.txt"
+STDERR_FILE = "stderr.txt"
+
+# the task properties needed to describe each task's logs
+LOG_TASK_SELECT = "id,state,executionInfo,nodeInfo"
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class TaskLog(NamedTuple):
+    """
+    The standard output and error of a task.  Either is None when the file
+    could not be read, e.g. because the task has not started or its node
+    has been removed from the pool.
+    """
+
+    id: str
+    node_id: Optional[str]
+    state: Optional[str]
+    exit_code: Optional[int]
+    stdout: Optional[str]
+    stderr: Optional[str]
+
+
+def _failed(task: models.CloudTask) -> bool:
+    info = task.execution_info
+    return bool(info and (info.exit_code or info.failure_info))
+
+
+def _file_size(batch_client, job_id: str, task_id: str, file_name: str) -> int:
+    """
+    Returns the size in bytes of a file in the task's directory
+    """
+    response = batch_client.file.get_properties_from_task(job_id, task_id, file_name, raw=True)
+    return response.headers["Content-Length"]
+
+
+def _read_task_file(
+    batch_client, job_id: str, task_id: str, file_name: str, start: Optional[int] = None
+) -> bytes:
+    """
+    Reads a file in the task's directory, from byte `start` when provided
+    """
+    options = (
+        models.FileGetFromTaskOptions(ocp_range="bytes={}-".format(start))
+        if start
+        else None
+    )
+    return b"".join(
+        batch_client.file.get_from_task(
+            job_id, task_id, file_name, file_get_from_task_options=options
+        )
+    )
+
+
+def _tail_task_file(
+    batch_client, job_id: str, task_id: str, file_name: str, tail_bytes: Optional[int]
+) -> bytes:
+    """
+    Reads the whole file, or only its last `tail_bytes` bytes
+    """
+    start = None
+    if tail_bytes is not None:
+        start = max(0, _file_size(batch_client, job_id, task_id, file_name) - tail_bytes)
+    return _read_task_file(batch_client, job_id, task_id, file_name, start)
+
+
+def _task_log(
+    batch_client,
+    job_id: str,
+    task: models.CloudTask,
+    tail_bytes: Optional[int],
+    encoding: Optional[str],
+) -> TaskLog:
+    """
+    Reads the standard output and error of a listed task
+    """
+
+    def read(file_name):
+        try:
+            data = _tail_task_file(batch_client, job_id, task.id, file_name, tail_bytes)
+        except models.BatchErrorException:
+            return None
+        return data.decode(encoding or "utf-8", errors="replace")
+
+    state = getattr(task.state, "value", task.state)
+    return TaskLog(
+        id=task.id,
+        node_id=task.node_info.node_id if task.node_info else None,
+        state=state,
+        exit_code=task.execution_info.exit_code if task.execution_info else None,
+        stdout=read(STDOUT_FILE),
+        stderr=read(STDERR_FILE),
+    )
+
+
+class _OutputFollower:
+    """
+    Reads the output a task has written to a file since the previous read,
+    for `follow_task_output`
+    """
+
+    def __init__(
+        self, batch_client, job_id: str, task_id: str, file_name: str, encoding: Optional[str]
+    ):
+        self.batch_client = batch_client
+        self.job_id = job_id
+        self.task_id = task_id
+        self.file_name = file_name
+        self.decoder = codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+        self.offset = 0
+
+    def read(self) -> Tuple[str, bool]:
+        """
+        Returns the text written since the previous read, and whether the
+        task has completed and all of its output has been read
+        """
+        # the state is read first, so that output written before the task
+        # completed is read before it is reported as done
+        completed = (
+            self.batch_client.task.get(self.job_id, self.task_id).state
+            == models.TaskState.completed
+        )
+        try:
+            size = _file_size(self.batch_client, self.job_id, self.task_id, self.file_name)
+        except models.BatchErrorException:
+            # the task has not started
+            size = self.offset
+        text = ""
+        if size > self.offset:
+            # the file may have grown since its size was read: the whole of
+            # the returned range is kept, so that it is not read again
+            data = _read_task_file(
+                self.batch_client, self.job_id, self.task_id, self.file_name, self.offset
+            )
+            self.offset += len(data)
+            text = self.decoder.decode(data)
+        done = completed and size <= self.offset
+        if done:
+            text += self.decoder.decode(b"", final=True)
+        return text, done
+
+
+def _map_ordered(
+    func: Callable[[T], R], items: Iterable[T], max_workers: int
+) -> Iterator[R]:
+    """
+    Applies `func` to each item using a pool of worker threads, yielding the
+    results in order while keeping at most `2 * max_workers` results in memory
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = []
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= 2 * max_workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
@@ -0,0 +1,111 @@
+"""
+A local record of the resource files which have already been uploaded to
+blob storage, keyed by the SHA-256 digest of their contents.
+"""
+# pylint: disable=bad-continuation, line-too-long, invalid-name
+
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+
+MANIFEST_FILE = ".super_batch_manifest.json"
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+class _ResourceManifest:
+    """
+    Maps local files to their content digests (so unchanged files are not
+    re-hashed) and content digests to the blobs which hold them in each
+    storage container.
+
+    The manifest is stored as json in the batch directory so that it is
+    shared between runs.
+    """
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, MANIFEST_FILE)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            data = {}
+        self.files = data.get("files", {})
+        self.blobs = data.get("blobs", {})
+
+    def digest(self, file_path):
+        """
+        Returns the SHA-256 digest of the file, re-using the cached value
+        when the size and modification time of the file are unchanged.
+        """
+        key = os.path.abspath(file_path)
+        stat = os.stat(key)
+        with self._lock:
+            entry = self.files.get(key)
+        if (
+            entry is not None
+            and entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return entry["sha256"]
+
+        sha = hashlib.sha256()
+        with open(key, "rb") as fh:
+            for block in iter(lambda: fh.read(_HASH_BLOCK_SIZE), b""):
+                sha.update(block)
+        digest = sha.hexdigest()
+
+        with self._lock:
+            self.files[key] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": digest,
+            }
+        return digest
+
+    def get_blob(self, container_url, digest):
+        """
+        Returns the name of the blob containing content with the given digest, or None
+        """
+        with self._lock:
+            return self.blobs.get(container_url, {}).get(digest)
+
+    def add_blob(self, container_url, digest, blob_name):
+        """
+        Records that the blob contains the content with the given digest
+        """
+        with self._lock:
+            self.blobs.setdefault(container_url, {})[digest] = blob_name
+
+    def forget_container(self, container_url):
+        """
+        Drops all blobs recorded for the container (e.g. when it has been deleted)
+        """
+        with self._lock:
+            self.blobs.pop(container_url, None)
+
+    def save(self):
+        """
+        Writes the manifest to disk.  The manifest may be shared by clients
+        in several threads (e.g. the shards of a `ShardedClient`), so it is
+        written to a temporary file of its own and moved into place while
+        the lock is held.  Separate manifests of the same directory (e.g. in
+        other processes) are not merged: the last one saved wins.
+        """
+        directory = os.path.dirname(self.path)
+        pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            with tempfile.NamedTemporaryFile(
+                "w", dir=directory, prefix=MANIFEST_FILE, suffix=".tmp", delete=False
+            ) as fh:
+                tmp_path = fh.name
+                try:
+                    json.dump({"files": self.files, "blobs": self.blobs}, fh)
+                except BaseException:
+                    fh.close()
+                    os.remove(tmp_path)
+                    raise
+            os.replace(tmp_path, self.path)
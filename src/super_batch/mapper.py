@@ -0,0 +1,83 @@
+"""
+Worker-side runner for the tasks created by `Client.map`.
+
+Map tasks call the named function with the item (and the global parameters
+as keyword arguments) and write its return value, and reduce tasks combine
+the values written by the tasks they depend on with the named function::
+
+    python super_batch_mapper.py map package.module:function
+    python super_batch_mapper.py reduce operator:add
+
+The function is named as `module:attribute` (or `module.attribute`) and
+must be importable within the worker image.
+
+This module is uploaded as a resource file and executed by the node, and
+so must only depend on the standard library.
+"""
+# pylint: disable=invalid-name
+
+import functools
+import importlib
+import os
+import pickle
+import sys
+
+# readable by the python 3.4+ interpreters which may be found in worker images
+PICKLE_PROTOCOL = 4
+
+GLOBAL_PARAMS_FILE = "global.pickle"
+ITEM_FILE = "item.pickle"
+INPUTS_DIRECTORY = "inputs"
+OUTPUT_FILE = "output.pickle"
+
+
+def _load(path):
+    with open(path, "rb") as fh:
+        return pickle.load(fh)
+
+
+def _dump(obj, path):
+    with open(path, "wb") as fh:
+        pickle.dump(obj, fh, protocol=PICKLE_PROTOCOL)
+
+
+def _import(func_name):
+    """
+    Returns the function named by `module:attribute` or `module.attribute`
+    """
+    if ":" in func_name:
+        module_name, attribute = func_name.split(":", 1)
+    else:
+        module_name, _, attribute = func_name.rpartition(".")
+    obj = importlib.import_module(module_name)
+    for name in attribute.split("."):
+        obj = getattr(obj, name)
+    return obj
+
+
+def _map(func):
+    global_params = _load(GLOBAL_PARAMS_FILE) if os.path.exists(GLOBAL_PARAMS_FILE) else {}
+    return func(_load(ITEM_FILE), **global_params)
+
+
+def _reduce(func):
+    # inputs are numbered in the order of the items they were computed from
+    names = sorted(os.listdir(INPUTS_DIRECTORY), key=lambda name: int(name.split(".")[0]))
+    return functools.reduce(
+        func, (_load(os.path.join(INPUTS_DIRECTORY, name)) for name in names)
+    )
+
+
+def main(argv):
+    """
+    Runs a map or reduce step
+    """
+    step, func_name = argv
+    sys.path.insert(0, os.getcwd())
+    func = _import(func_name)
+    _dump(_map(func) if step == "map" else _reduce(func), OUTPUT_FILE)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
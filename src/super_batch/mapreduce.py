@@ -0,0 +1,44 @@
+"""
+Describes the tasks of a map and its reduction, see `Client.map`
+"""
+# pylint: disable=bad-continuation, line-too-long, invalid-name
+
+import os
+import pickle
+from typing import Any, List
+
+import azure.batch.models as models
+
+from .mapper import PICKLE_PROTOCOL, INPUTS_DIRECTORY
+
+# the local path to the mapper script and where it is placed on the node
+MAPPER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mapper.py")
+MAPPER_FILE = "super_batch_mapper.py"
+
+# a failed task releases the tasks which depend on it, which then fail for
+# want of its output, so that a failure completes the job rather than
+# leaving the rest of the reduction blocked
+SATISFY_DEPENDENCIES = models.ExitConditions(
+    default=models.ExitOptions(dependency_action=models.DependencyAction.satisfy)
+)
+
+
+def _command_line(step: str, func_name: str) -> str:
+    return "python {} {} {}".format(MAPPER_FILE, step, func_name)
+
+
+def _dump(obj: Any, path: str) -> None:
+    with open(path, "wb") as fh:
+        pickle.dump(obj, fh, protocol=PICKLE_PROTOCOL)
+
+
+def _input_file(index: int) -> str:
+    return "{}/{}.pickle".format(INPUTS_DIRECTORY, index)
+
+
+def _fan_in(items: List[Any], fan_in: int) -> List[List[Any]]:
+    """
+    Splits one level of the reduction tree into the groups reduced by each task
+    """
+    return [items[start : start + fan_in] for start in range(0, len(items), fan_in)]
+
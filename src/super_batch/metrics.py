@@ -0,0 +1,255 @@
+"""
+Timing of each phase of a job and execution metrics for each task, for
+finding stragglers, slow nodes and queueing delays.
+
+Usage::
+
+    batch_client.metrics.on_task(lambda task: print(task.id, task.running_seconds))
+    batch_client.run()
+    print(batch_client.metrics.summary())
+    batch_client.metrics.to_csv("tasks.csv")
+"""
+# pylint: disable=bad-continuation, line-too-long, invalid-name
+
+import contextlib
+import csv
+import datetime
+import json
+import statistics
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+
+class TaskMetrics(NamedTuple):
+    """
+    The execution metrics of a completed Azure Batch task.  Packed tasks are
+    reported under the id of the Azure Batch task which ran them.
+
+    `queued_seconds` is the time from the creation of the task until it
+    started running, and `running_seconds` the time it spent running on the
+    node.  The statistics fields are only populated by
+    :meth:`super_batch.Client.collect_task_stats`.
+    """
+
+    id: str
+    node_id: Optional[str] = None
+    creation_time: Optional[datetime.datetime] = None
+    start_time: Optional[datetime.datetime] = None
+    end_time: Optional[datetime.datetime] = None
+    queued_seconds: Optional[float] = None
+    running_seconds: Optional[float] = None
+    exit_code: Optional[int] = None
+    result: Optional[str] = None
+    retry_count: int = 0
+    requeue_count: int = 0
+    cpu_seconds: Optional[float] = None
+    wall_clock_seconds: Optional[float] = None
+    wait_seconds: Optional[float] = None
+    read_gib: Optional[float] = None
+    write_gib: Optional[float] = None
+
+
+def _seconds(start, end):
+    if start is None or end is None:
+        return None
+    return (end - start).total_seconds()
+
+
+def _task_metrics(task) -> TaskMetrics:
+    """
+    Returns the metrics of a task listed by the batch service
+    """
+    info = task.execution_info
+    node_info = getattr(task, "node_info", None)
+    creation_time = getattr(task, "creation_time", None)
+    if info is None:
+        return TaskMetrics(
+            id=task.id,
+            node_id=node_info.node_id if node_info else None,
+            creation_time=creation_time,
+        )
+    result = getattr(info, "result", None)
+    return TaskMetrics(
+        id=task.id,
+        node_id=node_info.node_id if node_info else None,
+        creation_time=creation_time,
+        start_time=info.start_time,
+        end_time=info.end_time,
+        queued_seconds=_seconds(creation_time, info.start_time),
+        running_seconds=_seconds(info.start_time, info.end_time),
+        exit_code=info.exit_code,
+        result=getattr(result, "value", result),
+        retry_count=info.retry_count or 0,
+        requeue_count=getattr(info, "requeue_count", 0) or 0,
+    )
+
+
+def _describe(values: List[float]) -> Optional[Dict[str, float]]:
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    return {
+        "min": min(values),
+        "median": statistics.median(values),
+        "mean": statistics.mean(values),
+        "max": max(values),
+        "total": sum(values),
+    }
+
+
+def _serializable(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+class JobMetrics:
+    """
+    Collects the time spent in each phase of a job (`upload`, `submit`,
+    `wait` and `download`) and the execution metrics of each completed task.
+
+    Hooks registered with :meth:`on_phase` are called with the name and
+    duration of each phase as it ends, and hooks registered with
+    :meth:`on_task` with the :class:`TaskMetrics` of each task as it
+    completes.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.tasks: Dict[str, TaskMetrics] = {}
+        self._lock = threading.Lock()
+        self._phase_hooks: List[Callable[[str, float], Any]] = []
+        self._task_hooks: List[Callable[[TaskMetrics], Any]] = []
+
+    def on_phase(self, hook: Callable[[str, float], Any]) -> Callable[[str, float], Any]:
+        """
+        Registers a function to be called with the name and duration in seconds of each phase
+        """
+        self._phase_hooks.append(hook)
+        return hook
+
+    def on_task(self, hook: Callable[[TaskMetrics], Any]) -> Callable[[TaskMetrics], Any]:
+        """
+        Registers a function to be called with the metrics of each completed task
+        """
+        self._task_hooks.append(hook)
+        return hook
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """
+        Adds the time spent in the context to the named phase
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + seconds
+            for hook in self._phase_hooks:
+                hook(name, seconds)
+
+    def record_tasks(self, tasks: List) -> None:
+        """
+        Records the metrics of the completed tasks
+        """
+        for task in tasks:
+            metrics = _task_metrics(task)
+            with self._lock:
+                self.tasks[metrics.id] = metrics
+            for hook in self._task_hooks:
+                hook(metrics)
+
+    def record_stats(self, tasks: List) -> None:
+        """
+        Adds the resource usage statistics of the tasks to their metrics
+        """
+        with self._lock:
+            for task in tasks:
+                stats = task.stats
+                if stats is None or task.id not in self.tasks:
+                    continue
+                self.tasks[task.id] = self.tasks[task.id]._replace(
+                    cpu_seconds=(
+                        stats.user_cpu_time + stats.kernel_cpu_time
+                    ).total_seconds(),
+                    wall_clock_seconds=stats.wall_clock_time.total_seconds(),
+                    wait_seconds=stats.wait_time.total_seconds(),
+                    read_gib=stats.read_io_gi_b,
+                    write_gib=stats.write_io_gi_b,
+                )
+
+    def stragglers(self, n: int = 10) -> List[TaskMetrics]:
+        """
+        Returns the `n` tasks which ran for longest
+        """
+        with self._lock:
+            tasks = [t for t in self.tasks.values() if t.running_seconds is not None]
+        return sorted(tasks, key=lambda t: t.running_seconds, reverse=True)[:n]
+
+    def nodes(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the number of tasks run by each node and the distribution of their running times
+        """
+        by_node: Dict[str, List[TaskMetrics]] = {}
+        with self._lock:
+            for task in self.tasks.values():
+                by_node.setdefault(task.node_id, []).append(task)
+        return {
+            node_id: {
+                "tasks": len(tasks),
+                "running_seconds": _describe([t.running_seconds for t in tasks]),
+            }
+            for node_id, tasks in by_node.items()
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns the phase timings and the distribution of the queued and
+        running times of the tasks
+        """
+        with self._lock:
+            phases = dict(self.phases)
+            tasks = list(self.tasks.values())
+        return {
+            "phases": phases,
+            "tasks": len(tasks),
+            "queued_seconds": _describe([t.queued_seconds for t in tasks]),
+            "running_seconds": _describe([t.running_seconds for t in tasks]),
+            "retries": sum(t.retry_count for t in tasks),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the phase timings and task metrics as plain (JSON serializable) data
+        """
+        with self._lock:
+            tasks = list(self.tasks.values())
+        return {
+            "summary": self.summary(),
+            "tasks": [
+                {k: _serializable(v) for k, v in task._asdict().items()}
+                for task in tasks
+            ],
+        }
+
+    def to_json(self, path: str) -> None:
+        """
+        Writes the phase timings and task metrics to a JSON file
+        """
+        with open(path, "w") as fh:
+            json.dump(self.to_dict(), fh, indent=2)
+
+    def to_csv(self, path: str) -> None:
+        """
+        Writes the task metrics to a CSV file with a row for each task
+        """
+        with self._lock:
+            tasks = list(self.tasks.values())
+        with open(path, "w", newline="") as fh:
+            writer = csv.writer(fh)
+            writer.writerow(TaskMetrics._fields)
+            for task in tasks:
+                writer.writerow([_serializable(v) for v in task])
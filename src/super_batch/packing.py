@@ -0,0 +1,104 @@
+"""
+Groups several logical tasks into a single Azure Batch task
+"""
+# pylint: disable=bad-continuation, line-too-long, invalid-name
+
+import copy
+import json
+import os
+import posixpath
+from typing import List
+
+import azure.batch.models as models
+
+from .runner import PACK_ENVIRONMENT_VARIABLE, SHARED_DIRECTORY
+
+# the local path to the runner script and where it is placed on the node
+RUNNER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runner.py")
+RUNNER_FILE = "super_batch_runner.py"
+
+_ITEM_DIRECTORY = "item_{}"
+
+
+def _resource_key(resource_file):
+    return (
+        resource_file.http_url,
+        resource_file.storage_container_url,
+        resource_file.auto_storage_container_name,
+        resource_file.blob_prefix,
+        resource_file.file_path,
+    )
+
+
+def _relocate(resource_file, directory):
+    """
+    Returns a copy of the resource file which is placed within `directory`
+    """
+    out = copy.copy(resource_file)
+    out.file_path = (
+        posixpath.join(directory, resource_file.file_path)
+        if resource_file.file_path
+        else directory
+    )
+    return out
+
+
+def _pack_tasks(
+    pack_id: str,
+    tasks: List[models.TaskAddParameter],
+    runner: models.ResourceFile,
+) -> models.TaskAddParameter:
+    """
+    Combines the tasks into a single task which runs each of them in turn
+    using the runner script.
+
+    Resource files which are shared by every task are downloaded once into
+    the shared directory; all other resource files and output file patterns
+    are moved into a directory for each item.
+
+    Args:
+        pack_id: The id for the packed task
+        tasks: The tasks to be packed
+        runner: A ResourceFile which places the runner script at `RUNNER_FILE`
+    """
+    shared_keys = set.intersection(
+        *[{_resource_key(rf) for rf in task.resource_files or []} for task in tasks]
+    )
+    shared = [
+        rf for rf in tasks[0].resource_files or [] if _resource_key(rf) in shared_keys
+    ]
+
+    resource_files = [runner] + [_relocate(rf, SHARED_DIRECTORY) for rf in shared]
+    output_files = []
+    items = []
+    for i, task in enumerate(tasks):
+        item_dir = _ITEM_DIRECTORY.format(i)
+        resource_files.extend(
+            _relocate(rf, item_dir)
+            for rf in task.resource_files or []
+            if _resource_key(rf) not in shared_keys
+        )
+        for output_file in task.output_files or []:
+            output_file = copy.copy(output_file)
+            output_file.file_pattern = posixpath.join(item_dir, output_file.file_pattern)
+            output_files.append(output_file)
+        items.append(
+            {"id": task.id, "dir": item_dir, "command_line": task.command_line}
+        )
+
+    pack = {"shared": [rf.file_path for rf in shared if rf.file_path], "items": items}
+
+    return models.TaskAddParameter(
+        id=pack_id,
+        command_line="python {}".format(RUNNER_FILE),
+        resource_files=resource_files,
+        output_files=output_files,
+        environment_settings=[
+            models.EnvironmentSetting(
+                name=PACK_ENVIRONMENT_VARIABLE, value=json.dumps(pack)
+            )
+        ],
+        container_settings=tasks[0].container_settings,
+        constraints=tasks[0].constraints,
+        required_slots=max((task.required_slots or 1) for task in tasks),
+    )
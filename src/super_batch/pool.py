@@ -0,0 +1,197 @@
+"""
+Pool sizing
+"""
+# pylint: disable=bad-continuation, line-too-long, invalid-name
+
+import hashlib
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+# The Batch service allows at most 256 task slots per node, and at most four
+# times the number of cores of the VM size
+MAX_TASK_SLOTS_PER_NODE = 256
+MAX_TASK_SLOTS_PER_CORE = 4
+
+# VM sizes are named `Standard_<family><vCPUs>[-<constrained vCPUs>]<features>[_v<n>]`,
+# except for these older sizes
+_VM_CORES = {
+    "standard_a0": 1,
+    "standard_a3": 4,
+    "standard_a4": 8,
+    "standard_a5": 2,
+    "standard_a6": 4,
+    "standard_a7": 8,
+    "standard_a8": 8,
+    "standard_a9": 16,
+    "standard_a10": 8,
+    "standard_a11": 16,
+    "standard_g1": 2,
+    "standard_g2": 4,
+    "standard_g3": 8,
+    "standard_g4": 16,
+    "standard_g5": 32,
+    "standard_gs1": 2,
+    "standard_gs2": 4,
+    "standard_gs3": 8,
+    "standard_gs4": 16,
+    "standard_gs5": 32,
+}
+for _family in ("d", "ds"):
+    for _size, _cores in (
+        (1, 1), (2, 2), (3, 4), (4, 8), (5, 16), (11, 2), (12, 4), (13, 8), (14, 16), (15, 20)
+    ):
+        _VM_CORES["standard_{}{}".format(_family, _size)] = _cores
+        _VM_CORES["standard_{}{}_v2".format(_family, _size)] = _cores
+_VM_SIZE = re.compile(r"^standard_[a-z]+(?P<cores>\d+)(?:-(?P<constrained>\d+))?")
+
+# Sizes the pool to the task slots of the pending (active and running) tasks.
+# The most recent sample is used so that the pool shrinks as soon as the
+# backlog drains, and nodes are only removed once their running tasks
+# complete.  Until the service has sampled the pending tasks (e.g. when the
+# pool is created) the pool is sized to the tasks queued by the client, rather
+# than starting at its minimum.  Dedicated and low priority nodes are mixed in
+# proportion to their maxima.
+_AUTOSCALE_FORMULA = """\
+$pending = $PendingTasks.GetSamplePercent(TimeInterval_Minute * 5) < 1 ? {queued_tasks} : max($PendingTasks.GetSample(1));
+$nodes = ceil($pending * {slots_per_task} / {task_slots_per_node});
+$dedicated = min({max_dedicated}, max({min_dedicated}, ceil($nodes * {dedicated_fraction})));
+$TargetDedicatedNodes = $dedicated;
+$TargetLowPriorityNodes = min({max_low_priority}, max(0, $nodes - $dedicated));
+$NodeDeallocationOption = taskcompletion;"""
+
+
+def _autoscale_formula(
+    min_dedicated: int,
+    max_dedicated: int,
+    max_low_priority: int,
+    task_slots_per_node: int = 1,
+    slots_per_task: float = 1,
+    queued_tasks: int = 0,
+) -> str:
+    """
+    Returns an autoscale formula which sizes the pool to the pending task backlog
+
+    Args:
+        min_dedicated: The number of dedicated nodes to keep when there are no pending tasks
+        max_dedicated: The maximum number of dedicated nodes
+        max_low_priority: The maximum number of low priority nodes
+        task_slots_per_node: The number of task slots on each node
+        slots_per_task: The mean number of slots required by each task
+        queued_tasks: The number of tasks to size the pool for until the
+            service has sampled the pending tasks
+    """
+    max_nodes = max_dedicated + max_low_priority
+    if max_nodes < 1:
+        raise ValueError("An autoscaling pool requires a maximum of at least one node")
+    if min_dedicated > max_dedicated:
+        raise ValueError(
+            "The minimum number of dedicated nodes ({}) exceeds the maximum ({})".format(
+                min_dedicated, max_dedicated
+            )
+        )
+    return _AUTOSCALE_FORMULA.format(
+        min_dedicated=int(min_dedicated),
+        max_dedicated=int(max_dedicated),
+        max_low_priority=int(max_low_priority),
+        task_slots_per_node=int(task_slots_per_node),
+        slots_per_task=round(slots_per_task, 3),
+        queued_tasks=int(queued_tasks),
+        dedicated_fraction=max_dedicated / max_nodes,
+    )
+
+
+def _vm_cores(vm_size: Optional[str]) -> Optional[int]:
+    """
+    Returns the number of vCPUs of a VM size, or None when it is not known
+    """
+    if not vm_size:
+        return None
+    name = vm_size.lower()
+    if name in _VM_CORES:
+        return _VM_CORES[name]
+    match = _VM_SIZE.match(name)
+    if not match:
+        return None
+    return int(match.group("constrained") or match.group("cores"))
+
+
+def _validate_task_slots(vm_size: Optional[str], task_slots_per_node: int) -> None:
+    """
+    Raises a ValueError when the VM size cannot provide the task slots
+    """
+    if task_slots_per_node > MAX_TASK_SLOTS_PER_NODE:
+        raise ValueError(
+            "TASK_SLOTS_PER_NODE ({}) exceeds the maximum of {}".format(
+                task_slots_per_node, MAX_TASK_SLOTS_PER_NODE
+            )
+        )
+    cores = _vm_cores(vm_size)
+    if cores is not None and task_slots_per_node > MAX_TASK_SLOTS_PER_CORE * cores:
+        raise ValueError(
+            "TASK_SLOTS_PER_NODE ({}) exceeds {} times the {} cores of {}".format(
+                task_slots_per_node, MAX_TASK_SLOTS_PER_CORE, cores, vm_size
+            )
+        )
+
+
+def _lower(value):
+    value = getattr(value, "value", value)
+    return value.lower() if isinstance(value, str) else value
+
+
+def _pool_spec(pool) -> Dict[str, Any]:
+    """
+    Returns the properties of a pool which cannot be changed once it has
+    been created: the VM size and image, the container images and
+    registries, the subnet and the task slots and scheduling policy.
+
+    Args:
+        pool: The `PoolAddParameter` describing a new pool, or the `CloudPool` describing an existing pool
+    """
+    vm = pool.virtual_machine_configuration
+    image = vm.image_reference if vm else None
+    containers = vm.container_configuration if vm else None
+    network = pool.network_configuration
+    policy = pool.task_scheduling_policy
+    return {
+        "vm_size": _lower(pool.vm_size),
+        "image": [
+            _lower(getattr(image, name))
+            for name in ("publisher", "offer", "sku", "version", "virtual_machine_image_id")
+        ]
+        if image
+        else None,
+        "node_agent_sku_id": _lower(vm.node_agent_sku_id) if vm else None,
+        "container_images": sorted(containers.container_image_names or [])
+        if containers
+        else [],
+        "registries": sorted(
+            _lower(registry.registry_server) or ""
+            for registry in (containers.container_registries or [] if containers else [])
+        ),
+        "subnet_id": _lower(network.subnet_id) if network else None,
+        "task_slots_per_node": pool.task_slots_per_node or 1,
+        "node_fill_type": _lower(policy.node_fill_type) if policy else "spread",
+    }
+
+
+def _pool_fingerprint(pool) -> str:
+    """
+    Returns a digest of the properties of a pool which cannot be changed
+    once it has been created (see `_pool_spec`)
+    """
+    return hashlib.sha256(json.dumps(_pool_spec(pool), sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _pool_differences(existing, wanted) -> List[str]:
+    """
+    Describes the properties which differ between an existing pool and the
+    description of the pool which is wanted
+    """
+    existing, wanted = _pool_spec(existing), _pool_spec(wanted)
+    return [
+        "{}: {} (wanted {})".format(key, existing[key], wanted[key])
+        for key in sorted(wanted)
+        if existing[key] != wanted[key]
+    ]
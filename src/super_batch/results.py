@@ -0,0 +1,176 @@
+"""
+Lazy access to the downloaded output files of a job, see `Client.load_results`.
+
+Outputs are read from the batch directory each time they are accessed and
+are not retained, so that iterating over (or reducing) the results of a
+large job holds at most one task's outputs in memory.  NumPy (`.npy`) and
+Arrow outputs are memory-mapped by default.
+
+Usage::
+
+    results = batch_client.load_results()
+    results["Task_0"]                    # the output of a single task
+    total = results.sum()                # a streaming sum
+    array = results.concatenate()        # one array, allocated once
+"""
+# pylint: disable=bad-continuation, line-too-long, invalid-name, import-outside-toplevel
+
+import functools
+import os
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from . import serializers
+
+
+class Results(Mapping):
+    """
+    A read-only mapping from the id of each task (in the order the tasks were
+    added) to its output: the loaded output file for a task with a single
+    output file, or a list of the loaded files for a task with several.
+    Tasks without output files are omitted.
+
+    Args:
+        batch_directory: The directory the output files were downloaded to
+        task_outputs: The output files (relative to the batch directory) of each task
+        loader: Optional function used to read each output file (e.g.
+            `joblib.load`), called with the file's local path.  Defaults to
+            :func:`super_batch.serializers.load`
+        codec: The name of the codec to use in place of the one selected by
+            the extension, when no loader is provided
+        mmap: Memory-map the files rather than reading them into memory,
+            when the format allows it and no loader is provided
+    """
+
+    def __init__(
+        self,
+        batch_directory: str,
+        task_outputs: Dict[str, List[str]],
+        loader: Optional[Callable[[str], Any]] = None,
+        codec: Optional[str] = None,
+        mmap: bool = True,
+    ):
+        self.batch_directory = batch_directory
+        self.task_outputs = {
+            task_id: list(output_files)
+            for task_id, output_files in task_outputs.items()
+            if output_files
+        }
+        if loader is None:
+            loader = functools.partial(serializers.load, codec=codec, mmap=mmap)
+        self._loader = loader
+
+    def __getitem__(self, task_id: str) -> Any:
+        output_files = self.task_outputs[task_id]
+        if len(output_files) == 1:
+            return self.load(output_files[0])
+        return [self.load(output_file) for output_file in output_files]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.task_outputs)
+
+    def __len__(self) -> int:
+        return len(self.task_outputs)
+
+    def __repr__(self) -> str:
+        return "<Results: {} tasks in {}>".format(len(self), self.batch_directory)
+
+    def path(self, output_file: str) -> str:
+        """
+        Returns the local path of an output file
+        """
+        return os.path.join(self.batch_directory, output_file)
+
+    def load(self, output_file: str) -> Any:
+        """
+        Reads an output file (as passed to `build_output_file`)
+        """
+        return self._loader(self.path(output_file))
+
+    def outputs(self) -> Iterator[Any]:
+        """
+        Yields each output file in task order, loading it when it is reached.
+        The reductions below combine the outputs in this order.
+        """
+        for output_files in self.task_outputs.values():
+            for output_file in output_files:
+                yield self.load(output_file)
+
+    def reduce(self, func: Callable[[Any, Any], Any], *initial) -> Any:
+        """
+        Combines the outputs with `func`, as `functools.reduce` does,
+        loading each output only when it is combined
+        """
+        return functools.reduce(func, self.outputs(), *initial)
+
+    def sum(self, start: Any = 0) -> Any:
+        """
+        Adds the outputs, loading each output only when it is added.  The
+        total starts as `start + first output`, a new object which neither
+        output nor `start` share, and is then updated in place (`+=`), so
+        summing NumPy arrays allocates a single array.  When an output
+        cannot be added in place (e.g. it has a wider dtype than the total),
+        a new total is allocated.
+        """
+        total = start
+        for index, value in enumerate(self.outputs()):
+            if index == 0:
+                total = total + value
+                continue
+            try:
+                total += value
+            except TypeError:
+                # NumPy refuses to cast the sum to the dtype of the total
+                total = total + value
+        return total
+
+    def concatenate(self, out=None, axis: int = 0, dtype=None):
+        """
+        Concatenates array outputs along `axis` into a single NumPy array
+        (requires `numpy`), copying each output into its place in the
+        result rather than materializing every output first.
+
+        Args:
+            out: A preallocated array to fill.  When omitted, the outputs are
+                read once to find their shapes and the result is allocated,
+                which is cheap when the outputs are memory-mapped
+            axis: The axis along which the outputs are joined
+            dtype: The dtype of the allocated result. Defaults to the dtype
+                of the first output
+
+        Raises:
+            ValueError: If the outputs do not fit `out`, or there are none
+        """
+        numpy = serializers._require("numpy", "numpy")
+        if out is None:
+            shape = None
+            for value in self.outputs():
+                value = numpy.asanyarray(value)
+                if shape is None:
+                    shape = list(value.shape)
+                    dtype = value.dtype if dtype is None else dtype
+                else:
+                    shape[axis] += value.shape[axis]
+            if shape is None:
+                raise ValueError("There are no outputs to concatenate")
+            out = numpy.empty(shape, dtype=dtype)
+
+        index = [slice(None)] * out.ndim
+        offset = 0
+        for value in self.outputs():
+            value = numpy.asanyarray(value)
+            length = value.shape[axis]
+            if offset + length > out.shape[axis]:
+                raise ValueError(
+                    "The outputs are larger than the output array along axis {}".format(axis)
+                )
+            index[axis] = slice(offset, offset + length)
+            out[tuple(index)] = value
+            offset += length
+        if offset != out.shape[axis]:
+            raise ValueError(
+                "The outputs fill {} of {} entries of the output array along axis {}".format(
+                    offset, out.shape[axis], axis
+                )
+            )
+        return out
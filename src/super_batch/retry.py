@@ -0,0 +1,104 @@
+"""
+Client-side retry of failed tasks
+"""
+# pylint: disable=bad-continuation, line-too-long, invalid-name
+
+import time
+from typing import Dict, Iterable, List, Optional
+
+
+class _TaskRetrier:
+    """
+    Decides which failed tasks are retried, and reactivates them once their
+    backoff has elapsed.
+
+    Retries performed by the Batch service (via the task's
+    `max_task_retry_count` constraint) happen before the task is reported as
+    completed, and are only counted; retries performed by the client are
+    scheduled when a task completes with a retryable exit code and remaining
+    retry budget, and the task is reactivated once its backoff has elapsed.
+
+    Args:
+        batch_service_client: A Batch service client
+        job_id: The id of the job whose tasks are retried
+        max_retries: The number of times each task may be retried by the client
+        exit_codes: The exit codes which are retried. Defaults to any non-zero exit code
+        backoff: Seconds to wait before the first retry of a task, doubling with each further retry
+    """
+
+    def __init__(
+        self,
+        batch_service_client,
+        job_id: str,
+        max_retries: int = 0,
+        exit_codes: Optional[Iterable[int]] = None,
+        backoff: float = 0,
+    ):
+        self.batch_service_client = batch_service_client
+        self.job_id = job_id
+        self.max_retries = max_retries
+        self.exit_codes = None if exit_codes is None else set(exit_codes)
+        self.backoff = backoff
+        # the number of times each task has been retried
+        self.retries: Dict[str, int] = {}
+        # the time at which each scheduled retry is due
+        self._due: Dict[str, float] = {}
+        # retries which the client made
+        self._requeued: Dict[str, int] = {}
+
+    def _is_retryable(self, task) -> bool:
+        info = task.execution_info
+        if not info or not info.exit_code:
+            return False
+        if self._requeued.get(task.id, 0) >= self.max_retries:
+            return False
+        return self.exit_codes is None or info.exit_code in self.exit_codes
+
+    def filter(self, tasks: List) -> List:
+        """
+        Schedules a retry for each failed task with retry budget remaining,
+        and returns the tasks which have completed for good.
+        """
+        final = []
+        for task in tasks:
+            if task.id in self._due:
+                continue
+            if self._is_retryable(task):
+                self._due[task.id] = time.time() + self.backoff * 2 ** self._requeued.get(task.id, 0)
+                continue
+            service_retries = (
+                (task.execution_info.retry_count or 0) if task.execution_info else 0
+            )
+            self.retries[task.id] = self._requeued.get(task.id, 0) + service_retries
+            final.append(task)
+        return final
+
+    def reactivate_due(self) -> None:
+        """
+        Reactivates the tasks whose backoff has elapsed
+        """
+        now = time.time()
+        for task_id in [task_id for task_id, due in self._due.items() if due <= now]:
+            self.batch_service_client.task.reactivate(self.job_id, task_id)
+            del self._due[task_id]
+            self._requeued[task_id] = self._requeued.get(task_id, 0) + 1
+            print(
+                "Retrying task {} ({} of {})".format(
+                    task_id, self._requeued[task_id], self.max_retries
+                )
+            )
+
+    @property
+    def waiting(self) -> int:
+        """
+        The number of tasks waiting to be retried
+        """
+        return len(self._due)
+
+    def next_due(self) -> Optional[float]:
+        """
+        Seconds until the next scheduled retry, or None if no retries are scheduled
+        """
+        if not self._due:
+            return None
+        return max(0, min(self._due.values()) - time.time())
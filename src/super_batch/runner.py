@@ -0,0 +1,65 @@
+"""
+Worker-side runner for packed tasks.
+
+When tasks are packed, several logical tasks (items) are run by a single
+Azure Batch task.  Each item's resource files are placed in its own
+directory (`item_0`, `item_1`, ...) and resource files shared by every item
+are downloaded once to the `shared` directory.  This script links the
+shared files into each item's directory and runs the item's command line
+from within it, so that worker code written for unpacked tasks runs
+unchanged.
+
+This module is uploaded as a resource file and executed by the node, and
+so must only depend on the standard library.
+"""
+# pylint: disable=invalid-name
+
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+
+PACK_ENVIRONMENT_VARIABLE = "SUPER_BATCH_PACK"
+SHARED_DIRECTORY = "shared"
+
+
+def _link_shared_files(shared_files, item_dir):
+    """
+    Makes the shared files available at the same relative paths within the item directory
+    """
+    for file_path in shared_files:
+        source = os.path.join(SHARED_DIRECTORY, file_path)
+        target = os.path.join(item_dir, file_path)
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        if os.path.lexists(target):
+            continue
+        try:
+            os.symlink(os.path.relpath(source, os.path.dirname(target) or "."), target)
+        except OSError:
+            shutil.copy(source, target)
+
+
+def main():
+    """
+    Runs each item in the pack, stopping at the first item which fails
+    """
+    pack = json.loads(os.environ[PACK_ENVIRONMENT_VARIABLE])
+
+    for item in pack["items"]:
+        os.makedirs(item["dir"], exist_ok=True)
+        _link_shared_files(pack["shared"], item["dir"])
+
+        print("Running {} ({})".format(item["id"], item["command_line"]))
+        sys.stdout.flush()
+        exit_code = subprocess.call(shlex.split(item["command_line"]), cwd=item["dir"])
+        if exit_code:
+            print("{} exited with code {}".format(item["id"], exit_code))
+            return exit_code
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Serialization of resource and output files, shared by the controller and
+the worker so that both sides of the contract read and write the same
+formats.
+
+The codec is chosen from the file extension:
+
+* `.pickle`, `.pkl`: Python pickle.  Files written by `joblib.dump` (which
+  plain pickle cannot read when they contain NumPy arrays) are read with
+  `joblib` when it is installed
+* `.joblib`: joblib pickle (requires `joblib`); NumPy arrays can be memory-mapped on load
+* `.pickle.zst`: Python pickle compressed with zstandard (requires `zstandard`)
+* `.pickle.lz4`: Python pickle compressed with lz4 (requires `lz4`)
+* `.npy`: NumPy array (requires `numpy`); can be memory-mapped on load
+* `.arrow`, `.feather`: Arrow IPC table (requires `pyarrow`); can be memory-mapped on load
+
+Usage::
+
+    from super_batch import serializers
+    serializers.dump(array, "output.npy")
+    array = serializers.load("output.npy", mmap=True)
+"""
+# pylint: disable=bad-continuation, line-too-long, invalid-name, import-outside-toplevel
+
+import importlib.util
+import pickle
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+
+class Codec(NamedTuple):
+    """
+    A named pair of functions for writing and reading objects to and from files
+    """
+
+    name: str
+    extensions: Tuple[str, ...]
+    dump: Callable[[Any, str], None]
+    load: Callable[[str, bool], Any]
+
+
+_CODECS: Dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec) -> None:
+    """
+    Registers a codec, replacing any codec with the same name
+    """
+    _CODECS[codec.name] = codec
+
+
+def get_codec(path: str, codec: Optional[str] = None) -> Codec:
+    """
+    Returns the named codec, or the codec with the longest extension matching the path
+
+    Raises:
+        ValueError: If no codec matches
+    """
+    if codec is not None:
+        try:
+            return _CODECS[codec]
+        except KeyError:
+            raise ValueError("Unknown codec: {}".format(codec)) from None
+
+    matches = [
+        (len(extension), c)
+        for c in _CODECS.values()
+        for extension in c.extensions
+        if path.endswith(extension)
+    ]
+    if not matches:
+        raise ValueError("No codec registered for file: {}".format(path))
+    return max(matches, key=lambda match: match[0])[1]
+
+
+def dump(obj: Any, path: str, codec: Optional[str] = None) -> None:
+    """
+    Writes the object to file using the codec for the file extension (or the named codec)
+    """
+    get_codec(path, codec).dump(obj, path)
+
+
+def load(path: str, codec: Optional[str] = None, mmap: bool = False) -> Any:
+    """
+    Reads an object from file using the codec for the file extension (or the named codec)
+
+    Args:
+        mmap: Memory-map the file rather than reading it into memory, when
+            the format allows it.
+    """
+    return get_codec(path, codec).load(path, mmap)
+
+
+def _require(module_name, package_name):
+    try:
+        return __import__(module_name, fromlist=["_"])
+    except ImportError:
+        raise ImportError(
+            "The {} package is required to read and write this format; install it with `pip install {}`".format(
+                package_name, package_name
+            )
+        ) from None
+
+
+# ------------------------------
+# Pickle
+# ------------------------------
+
+
+def _dump_pickle(obj, path):
+    with open(path, "wb") as fh:
+        pickle.dump(obj, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_pickle(path, mmap):
+    with open(path, "rb") as fh:
+        try:
+            return pickle.load(fh)
+        except pickle.UnpicklingError as err:
+            if importlib.util.find_spec("joblib") is None:
+                raise
+            error = err
+    # e.g. written by `joblib.dump`, which stores NumPy arrays after the
+    # pickle rather than in it
+    try:
+        return _load_joblib(path, mmap)
+    except Exception:  # pylint: disable=broad-except
+        raise error
+
+
+def _dump_joblib(obj, path):
+    joblib = _require("joblib", "joblib")
+    joblib.dump(obj, path)
+
+
+def _load_joblib(path, mmap):
+    joblib = _require("joblib", "joblib")
+    return joblib.load(path, mmap_mode="r" if mmap else None)
+
+
+def _dump_zstd(obj, path):
+    zstandard = _require("zstandard", "zstandard")
+    with open(path, "wb") as fh:
+        with zstandard.ZstdCompressor().stream_writer(fh) as writer:
+            pickle.dump(obj, writer, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_zstd(path, mmap):
+    # pylint: disable=unused-argument
+    zstandard = _require("zstandard", "zstandard")
+    with open(path, "rb") as fh:
+        with zstandard.ZstdDecompressor().stream_reader(fh) as reader:
+            return pickle.load(reader)
+
+
+def _dump_lz4(obj, path):
+    lz4_frame = _require("lz4.frame", "lz4")
+    with lz4_frame.open(path, "wb") as fh:
+        pickle.dump(obj, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_lz4(path, mmap):
+    # pylint: disable=unused-argument
+    lz4_frame = _require("lz4.frame", "lz4")
+    with lz4_frame.open(path, "rb") as fh:
+        return pickle.load(fh)
+
+
+# ------------------------------
+# NumPy
+# ------------------------------
+
+
+def _dump_npy(obj, path):
+    numpy = _require("numpy", "numpy")
+    with open(path, "wb") as fh:
+        numpy.save(fh, numpy.asarray(obj), allow_pickle=False)
+
+
+def _load_npy(path, mmap):
+    numpy = _require("numpy", "numpy")
+    return numpy.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+
+
+# ------------------------------
+# Arrow
+# ------------------------------
+
+
+def _dump_arrow(obj, path):
+    pyarrow = _require("pyarrow", "pyarrow")
+    if not isinstance(obj, pyarrow.Table):
+        obj = pyarrow.Table.from_pandas(obj)
+    with pyarrow.OSFile(path, "wb") as sink:
+        with pyarrow.ipc.new_file(sink, obj.schema) as writer:
+            writer.write_table(obj)
+
+
+def _load_arrow(path, mmap):
+    pyarrow = _require("pyarrow", "pyarrow")
+    source = pyarrow.memory_map(path, "r") if mmap else pyarrow.OSFile(path, "rb")
+    return pyarrow.ipc.open_file(source).read_all()
+
+
+register_codec(Codec("pickle", (".pickle", ".pkl"), _dump_pickle, _load_pickle))
+register_codec(Codec("joblib", (".joblib",), _dump_joblib, _load_joblib))
+register_codec(Codec("zstd", (".pickle.zst",), _dump_zstd, _load_zstd))
+register_codec(Codec("lz4", (".pickle.lz4",), _dump_lz4, _load_lz4))
+register_codec(Codec("npy", (".npy",), _dump_npy, _load_npy))
+register_codec(Codec("arrow", (".arrow", ".feather"), _dump_arrow, _load_arrow))
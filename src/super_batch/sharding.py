@@ -0,0 +1,428 @@
+"""
+Runs one logical job as several jobs (shards), each with its own pool and
+possibly in its own Batch and storage accounts, so that a job is not limited
+by a single account's core quota or a single pool's size.  See `ShardedClient`.
+"""
+# pylint: disable=bad-continuation, line-too-long, invalid-name, protected-access
+
+import copy
+import datetime
+import os
+import pathlib
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from . import serializers
+from .BatchConfig import _BatchConfig
+from .client import Client
+from .print_progress import _print_progress
+from .results import Results
+from .utils import _check_exit_codes, _poll_completed_tasks
+
+
+class _ShardTask(NamedTuple):
+    """
+    A task which has not yet been assigned to a shard
+    """
+
+    resource_files: List[Tuple[str, str]]
+    output_files: List[Tuple[str, str]]
+    command_line: Optional[str]
+    required_slots: int
+
+
+def _capacity(config: _BatchConfig) -> int:
+    """
+    The number of tasks the shard's pool runs at once, as configured
+    """
+    nodes = (config.POOL_NODE_COUNT or 0) + (config.POOL_LOW_PRIORITY_NODE_COUNT or 0)
+    return int(nodes) * config.TASK_SLOTS_PER_NODE
+
+
+def _split(count: int, weights: List[float]) -> List[int]:
+    """
+    Splits `count` tasks in proportion to the weights, giving the remainder
+    to the shards with the largest fractional shares
+    """
+    total = sum(weights)
+    shares = [count * weight / total for weight in weights]
+    sizes = [int(share) for share in shares]
+    by_remainder = sorted(
+        range(len(weights)), key=lambda i: sizes[i] - shares[i]
+    )
+    for index in by_remainder[: count - sum(sizes)]:
+        sizes[index] += 1
+    return sizes
+
+
+class ShardedClient:
+    """
+    Splits the tasks of one logical job across several clients (shards),
+    each with its own pool, job and (optionally) Batch and storage accounts,
+    in proportion to the capacity of their pools.  The shards are monitored
+    together and their outputs are downloaded to a single batch directory.
+
+    Since each shard uploads the resource files its tasks use to its own
+    storage container, tasks are described by the local paths of their
+    resource files rather than by `ResourceFile`s, and are only assigned to
+    shards when the job is run.
+
+    Usage::
+
+        batch_client = ShardedClient(
+            [
+                dict(BATCH_ACCOUNT_NAME="eastus-account", POOL_ID="pool-a", ...),
+                dict(BATCH_ACCOUNT_NAME="westus-account", POOL_ID="pool-b", ...),
+            ],
+            JOB_ID="my-job",
+            BATCH_DIRECTORY="batch",
+            ...
+        )
+        for i, seed in enumerate(seeds):
+            batch_client.add_task(
+                [
+                    batch_client.build_resource_object({"seed": seed}, "in_{}.pickle".format(i), "inputs.pickle"),
+                    ("config.pickle", "config.pickle"),
+                ],
+                [("outputs.pickle", "out_{}.pickle".format(i))],
+            )
+        results = batch_client.run()
+    """
+
+    clients: List[Client]
+    weights: List[float]
+    shard_tasks: Dict[str, Tuple[int, str]]
+
+    def __init__(
+        self,
+        shards: Iterable[Dict[str, Any]],
+        weights: Optional[Iterable[float]] = None,
+        client_class: Callable[..., Client] = Client,
+        **kwargs
+    ):
+        """
+        Args:
+            shards: The configuration of each shard, as a dict of keyword
+                arguments for the client, which override `kwargs`.  A
+                shard without its own `JOB_ID` runs the job as
+                `<JOB_ID>-<index>`.  Every shard uses the same `BATCH_DIRECTORY`
+            weights: The share of the tasks given to each shard. Defaults to
+                the number of task slots in each shard's pool (the node counts
+                times `TASK_SLOTS_PER_NODE`)
+            client_class: The client used for each shard, e.g. `LocalClient`
+            **kwargs: Configuration shared by the shards
+
+        Raises:
+            TypeError: If a shard is a `BatchConfig` rather than a dict
+            ValueError: If there are no shards, the shards use different
+                batch directories or job ids, or the weights are invalid
+        """
+        configs = []
+        for index, shard in enumerate(shards):
+            if isinstance(shard, _BatchConfig):
+                # a BatchConfig holds every default, which would override
+                # the shared configuration
+                raise TypeError(
+                    "Shards are configured with dicts of the values which override "
+                    "the shared configuration, not BatchConfigs"
+                )
+            config = dict(kwargs, **shard)
+            if "JOB_ID" not in shard and "JOB_ID" in kwargs:
+                config["JOB_ID"] = "{}-{}".format(kwargs["JOB_ID"], index)
+            configs.append(config)
+        if not configs:
+            raise ValueError("A sharded client needs at least one shard")
+        if len({config.get("BATCH_DIRECTORY") for config in configs}) > 1:
+            raise ValueError("The shards must share the same BATCH_DIRECTORY")
+        if len({config.get("JOB_ID") for config in configs}) < len(configs):
+            raise ValueError("The shards must have different JOB_IDs")
+
+        self.clients = [client_class(**config) for config in configs]
+        # the shards share the batch directory, and so the resource manifest
+        for client in self.clients[1:]:
+            client.manifest = self.clients[0].manifest
+
+        if weights is None:
+            weights = [_capacity(client.config) for client in self.clients]
+            if not all(weights):
+                raise ValueError(
+                    "The capacity of shards without node counts is unknown; provide weights"
+                )
+        weights = list(weights)
+        if len(weights) != len(self.clients) or min(weights) < 0 or not sum(weights):
+            raise ValueError(
+                "Provide a non-negative weight for each shard, not {}".format(weights)
+            )
+        self.weights = weights
+
+        self.tasks: List[_ShardTask] = []
+        self.shard_tasks = {}
+        # the id in the sharded job of each shard's tasks
+        self._task_names: List[Dict[str, str]] = [{} for _ in self.clients]
+
+    @property
+    def batch_directory(self) -> str:
+        """
+        The directory shared by the shards
+        """
+        return self.clients[0].config.BATCH_DIRECTORY
+
+    @property
+    def task_states(self) -> Dict[str, str]:
+        """ The state of each task, as recorded in its shard's journal
+        """
+        states = [client.task_states for client in self.clients]
+        return {
+            task_id: states[shard][shard_task_id]
+            for task_id, (shard, shard_task_id) in self.shard_tasks.items()
+            if shard_task_id in states[shard]
+        }
+
+    def build_resource_object(
+        self, obj: Any, file_path: str, container_path: str, codec: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """
+        Serializes an object to a file in the batch directory, to be uploaded
+        by the shard its task is assigned to.  See :meth:`Client.build_resource_object`
+
+        Returns:
+            The `(file_path, container_path)` pair to pass to :meth:`add_task`
+        """
+        local_path = os.path.join(self.batch_directory, file_path)
+        pathlib.Path(local_path).parent.mkdir(parents=True, exist_ok=True)
+        serializers.dump(obj, local_path, codec)
+        return file_path, container_path
+
+    def add_task(
+        self,
+        resource_files: Iterable[Tuple[str, str]],
+        output_files: Iterable[Tuple[str, str]],
+        command_line=None,
+        required_slots: int = 1,
+    ) -> str:
+        """
+        Adds a task to the job.  Tasks in different shards run in different
+        jobs, and so cannot depend on each other.
+
+        Args:
+            resource_files: `(file_path, container_path)` pairs, as would be
+                passed to :meth:`Client.build_resource_file`.  Files shared by
+                many tasks are uploaded (and signed) once per shard
+            output_files: `(output_file, container_path)` pairs, as would be
+                passed to :meth:`Client.build_output_file`
+            command_line: The command used for the task. Defaults to `COMMAND_LINE`
+            required_slots: The number of the node's task slots the task occupies
+
+        Returns:
+            The id of the task
+        """
+        self.tasks.append(
+            _ShardTask(list(resource_files), list(output_files), command_line, required_slots)
+        )
+        return "Task_{}".format(len(self.tasks) - 1)
+
+    def _submit(self, shard: int, first: int, count: int, pack_size: Optional[int]) -> None:
+        """
+        Uploads the resource files of a shard's tasks, adds the tasks and
+        submits them to the shard's job
+        """
+        client = self.clients[shard]
+        tasks = self.tasks[first : first + count]
+        paths = list(
+            dict.fromkeys(path for task in tasks for path in task.resource_files)
+        )
+        resource_files = dict(zip(paths, client.build_resource_files(paths)))
+        for index, task in enumerate(tasks, first):
+            shard_task_id = client.add_task(
+                [resource_files[path] for path in task.resource_files],
+                [client.build_output_file(*output) for output in task.output_files],
+                task.command_line,
+                task.required_slots,
+            )
+            self.shard_tasks["Task_{}".format(index)] = (shard, shard_task_id)
+            self._task_names[shard][shard_task_id] = "Task_{}".format(index)
+        client.run(wait=False, pack_size=pack_size)
+
+    def _active_shards(self) -> List[int]:
+        shards = {shard for shard, _ in self.shard_tasks.values()}
+        return [index for index in range(len(self.clients)) if index in shards]
+
+    def run(self, wait: bool = True, pack_size: Optional[int] = None, **kwargs) -> Optional[Results]:
+        """ Splits the tasks across the shards and runs each shard's job
+
+        Args:
+            wait: If true, wait for every shard to complete and then download
+                the results by calling `self.load_results()`
+            pack_size: Number of tasks to run in each Azure Batch task. Defaults
+                to each shard's `TASK_PACK_SIZE`
+            **kwargs: Passed to :meth:`load_results`
+
+        Returns:
+            The results, when waiting
+
+        Raises:
+            ValueError: If there are no tasks, or the job has already been run
+            RuntimeError: If the tasks of any shard could not be submitted
+        """
+        if not self.tasks:
+            raise ValueError("The job has no tasks")
+        if self.shard_tasks:
+            raise ValueError("The job has already been run")
+        sizes = _split(len(self.tasks), self.weights)
+        starts = [sum(sizes[:index]) for index in range(len(sizes))]
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.clients)) as executor:
+                futures = {
+                    shard: executor.submit(self._submit, shard, start, size, pack_size)
+                    for shard, (start, size) in enumerate(zip(starts, sizes))
+                    if size
+                }
+            errors = {
+                shard: future.exception()
+                for shard, future in futures.items()
+                if future.exception()
+            }
+            if errors:
+                raise RuntimeError(
+                    "Failed to submit the tasks of some shards:\n"
+                    + "\n".join(
+                        "   {}: {!r}".format(self.clients[shard].config.JOB_ID, err)
+                        for shard, err in errors.items()
+                    )
+                )
+            if wait:
+                return self.load_results(**kwargs)
+            return None
+        finally:
+            if wait:
+                for shard in self._active_shards():
+                    self.clients[shard]._cleanup_batch_resources()
+
+    def _global_tasks(self, shard: int, tasks: list) -> list:
+        """
+        Returns copies of a shard's tasks named by their ids in the sharded job
+        """
+        names = self._task_names[shard]
+        out = []
+        for task in tasks:
+            task = copy.copy(task)
+            task.id = names.get(task.id, "{}/{}".format(self.clients[shard].config.JOB_ID, task.id))
+            out.append(task)
+        return out
+
+    def _monitor(self, shard: int, counts: list, stop: threading.Event) -> None:
+        """
+        Waits for a shard's tasks to complete, recording the latest task counts
+        """
+        client = self.clients[shard]
+        with client.metrics.phase("wait"):
+            for shard_counts, completed in _poll_completed_tasks(
+                client.batch_client,
+                client.config.JOB_ID,
+                datetime.timedelta(hours=client.config.STORAGE_ACCESS_DURATION_HRS),
+                client._task_count,
+                retrier=client._retrier,
+            ):
+                counts[shard] = shard_counts
+                client._record_completed(completed)
+                _check_exit_codes(self._global_tasks(shard, completed))
+                if stop.is_set():
+                    return
+
+    def _wait_for_shards(self, quiet: bool) -> None:
+        """
+        Monitors the shards together, printing their combined progress, and
+        raises the first error of any shard
+        """
+        shards = self._active_shards()
+        counts: list = [None] * len(self.clients)
+        stop = threading.Event()
+        start_time = datetime.datetime.now()
+        with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+            futures = [executor.submit(self._monitor, shard, counts, stop) for shard in shards]
+            try:
+                while True:
+                    done, pending = wait(futures, timeout=1, return_when=FIRST_EXCEPTION)
+                    for future in done:
+                        future.result()
+                    if not quiet:
+                        known = [c for c in counts if c is not None]
+                        completed = sum(c.completed for c in known)
+                        total = sum(c.active + c.running + c.completed for c in known)
+                        elapsed = int((datetime.datetime.now() - start_time).total_seconds())
+                        hours, remainder = divmod(elapsed, 3600)
+                        minutes, seconds = divmod(remainder, 60)
+                        _print_progress(
+                            completed,
+                            max(total, 1),
+                            prefix="Time elapsed {:02}:{:02}:{:02} ({} shards)".format(
+                                hours, minutes, seconds, len(shards)
+                            ),
+                            decimals=1,
+                            bar_length=min(max(total, 1), 50),
+                        )
+                    if not pending:
+                        break
+            finally:
+                stop.set()
+                if not quiet:
+                    print()
+
+    def load_results(
+        self,
+        quiet=False,
+        loader: Optional[Callable[[str], Any]] = None,
+        codec: Optional[str] = None,
+        mmap: bool = True,
+    ) -> Results:
+        """
+        Waits for every shard's tasks to complete and downloads the output
+        files of all shards to the batch directory.
+
+        See :meth:`Client.load_results`
+        """
+        if not quiet:
+            print(
+                "Jobs: {}\nStart time: {}".format(
+                    ", ".join(self.clients[shard].config.JOB_ID for shard in self._active_shards()),
+                    datetime.datetime.now().replace(microsecond=0),
+                )
+            )
+        try:
+            self._wait_for_shards(quiet)
+            for shard in self._active_shards():
+                self.clients[shard]._download_files()
+        finally:
+            if not quiet:
+                for shard in self._active_shards():
+                    print("Shard {}:".format(self.clients[shard].config.JOB_ID))
+                    self.clients[shard]._print_retries()
+                    self.clients[shard]._print_metrics()
+                print("End time: {}".format(datetime.datetime.now().replace(microsecond=0)))
+        return self.results(loader, codec, mmap)
+
+    def results(
+        self,
+        loader: Optional[Callable[[str], Any]] = None,
+        codec: Optional[str] = None,
+        mmap: bool = True,
+    ) -> Results:
+        """
+        Returns the downloaded outputs of each task, named by their ids in the
+        sharded job.  See :meth:`Client.results`
+        """
+        shard_outputs = [client.results().task_outputs for client in self.clients]
+        task_outputs = {}
+        for index in range(len(self.tasks)):
+            task_id = "Task_{}".format(index)
+            if task_id in self.shard_tasks:
+                shard, shard_task_id = self.shard_tasks[task_id]
+                task_outputs[task_id] = shard_outputs[shard].get(shard_task_id, [])
+        return Results(
+            self.batch_directory,
+            task_outputs,
+            loader,
+            codec,
+            mmap,
+        )
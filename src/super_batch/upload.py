@@ -0,0 +1,183 @@
+"""
+Uploads large files as blocks which are read from a memory-mapped file and
+staged in parallel, so that the file is never read into memory as a whole
+and is not limited to the bandwidth of a single connection.
+
+Each block is sent with its MD5 digest, which the storage service verifies,
+so integrity is checked per block only.  The MD5 digest of the whole file is
+stored as the blob's `Content-MD5` (for clients which download the blob) but
+is not verified by the service when the blocks are committed.
+"""
+# pylint: disable=bad-continuation, line-too-long, invalid-name
+
+import asyncio
+import hashlib
+import mmap
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator, List, Tuple
+
+# the storage service allows at most 50,000 blocks in a blob
+MAX_BLOCKS = 50000
+MIB = 1024 * 1024
+
+
+def _block_size(size: int, block_size: int) -> int:
+    """
+    Returns the block size, increased when necessary to stay within the block count limit
+    """
+    return max(block_size, -(-size // MAX_BLOCKS))
+
+
+def _blocks(size: int, block_size: int) -> Iterator[Tuple[str, int, int]]:
+    """
+    Yields the id, start and end of each block.  Ids have the same length, as the service requires
+    """
+    for index, start in enumerate(range(0, size, block_size)):
+        yield "{:06d}".format(index), start, min(start + block_size, size)
+
+
+def _block_md5(block: memoryview) -> bytearray:
+    """
+    Returns the MD5 digest of a block, which the storage service verifies when
+    the block is staged
+    """
+    return bytearray(hashlib.md5(block).digest())
+
+
+def _stage_block(blob_client, block_id: str, block: memoryview) -> None:
+    """
+    Stages a block, releasing its view of the memory-mapped file once it is sent
+    """
+    try:
+        blob_client.stage_block(
+            block_id, block, length=len(block), transactional_content_md5=_block_md5(block)
+        )
+    finally:
+        block.release()
+
+
+async def _stage_block_async(blob_client, block_id: str, block: memoryview) -> None:
+    """
+    Stages a block with an `azure.storage.blob.aio` blob client.
+
+    See :func:`_stage_block`
+    """
+    try:
+        await blob_client.stage_block(
+            block_id, block, length=len(block), transactional_content_md5=_block_md5(block)
+        )
+    finally:
+        block.release()
+
+
+def _commit_args(block_ids: List[str], md5) -> Tuple[list, dict]:
+    """
+    Returns the arguments which commit the staged blocks with the file's MD5
+    digest.  The storage SDK is imported here, when it is first needed.
+    """
+    from azure.storage.blob import BlobBlock, ContentSettings
+
+    return (
+        [[BlobBlock(block_id) for block_id in block_ids]],
+        dict(content_settings=ContentSettings(content_md5=bytearray(md5.digest()))),
+    )
+
+
+def _check_size(blob_client, size: int) -> None:
+    """
+    Raises an IOError when the committed blob does not have the size of the file
+    """
+    blob_size = blob_client.get_blob_properties().size
+    if blob_size != size:
+        raise IOError(
+            "Uploaded {} bytes of {} bytes to {}".format(blob_size, size, blob_client.blob_name)
+        )
+
+
+def _upload_blocks(
+    blob_client, local_path: str, block_size: int = 8 * MIB, max_concurrency: int = 8
+) -> None:
+    """
+    Uploads a file to a block blob in blocks of `block_size` bytes, with at
+    most `max_concurrency` blocks (and so `max_concurrency * block_size`
+    bytes) in flight at once.  Blocks are views of the memory-mapped file,
+    so they are not copied before they are sent.
+
+    Raises:
+        IOError: If the committed blob does not have the size of the file
+    """
+    size = os.path.getsize(local_path)
+    block_size = _block_size(size, block_size)
+    md5 = hashlib.md5()
+    block_ids: List[str] = []
+
+    # the executor is shut down (waiting for the staged blocks, which release
+    # their views) before the file is unmapped
+    with open(local_path, "rb") as fh, mmap.mmap(
+        fh.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mapped, ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        with memoryview(mapped) as view:
+            pending = set()
+            for block_id, start, end in _blocks(size, block_size):
+                if len(pending) >= max_concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                block = view[start:end]
+                md5.update(block)
+                block_ids.append(block_id)
+                pending.add(executor.submit(_stage_block, blob_client, block_id, block))
+            for future in pending:
+                future.result()
+
+    args, kwargs = _commit_args(block_ids, md5)
+    blob_client.commit_block_list(*args, **kwargs)
+    _check_size(blob_client, size)
+
+
+async def _upload_blocks_async(
+    blob_client, local_path: str, block_size: int = 8 * MIB, max_concurrency: int = 8
+) -> None:
+    """
+    Uploads a file to a block blob with an `azure.storage.blob.aio` blob client.
+
+    See :func:`_upload_blocks`
+    """
+    size = os.path.getsize(local_path)
+    block_size = _block_size(size, block_size)
+    md5 = hashlib.md5()
+    block_ids: List[str] = []
+
+    with open(local_path, "rb") as fh, mmap.mmap(
+        fh.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mapped, memoryview(mapped) as view:
+        pending = set()
+        try:
+            for block_id, start, end in _blocks(size, block_size):
+                if len(pending) >= max_concurrency:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        task.result()
+                block = view[start:end]
+                md5.update(block)
+                block_ids.append(block_id)
+                pending.add(
+                    asyncio.ensure_future(_stage_block_async(blob_client, block_id, block))
+                )
+            if pending:
+                await asyncio.gather(*pending)
+        finally:
+            # the blocks still in flight release their views before the file
+            # is unmapped, as they do when the sync executor is shut down
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    args, kwargs = _commit_args(block_ids, md5)
+    await blob_client.commit_block_list(*args, **kwargs)
+    blob_size = (await blob_client.get_blob_properties()).size
+    if blob_size != size:
+        raise IOError(
+            "Uploaded {} bytes of {} bytes to {}".format(blob_size, size, blob_client.blob_name)
+        )
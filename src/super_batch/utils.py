@@ -1,15 +1,8 @@
-import io
 import time
 import sys
 import datetime
-from collections import defaultdict
-from azure.storage.blob import (
-    generate_container_sas,
-    ContainerSasPermissions,
-    generate_blob_sas,
-    BlobSasPermissions,
-)
-from azure.batch.models import TaskState
+from concurrent.futures import ThreadPoolExecutor, wait
+from azure.batch.models import TaskListOptions, CreateTasksErrorException
 from .print_progress import _print_progress
 
 # pylint: disable=bad-continuation, line-too-long, invalid-name
@@ -35,7 +28,9 @@ def _print_batch_exception(batch_exception):
     print("-------------------------------------------")
 
 
-def _wait_for_tasks_to_complete(batch_service_client, job_id, timeout):
+def _wait_for_tasks_to_complete(
+    batch_service_client, job_id, timeout, task_count=None, callback=None, retrier=None
+):
     """
     Returns when all tasks in the specified job reach the Completed state.
 
@@ -45,67 +40,276 @@ def _wait_for_tasks_to_complete(batch_service_client, job_id, timeout):
     :param timedelta timeout: The duration to wait for task completion. If all
     tasks in the specified job do not reach Completed state within this time
     period, an exception will be raised.
+    :param int task_count: The number of tasks added to the job, if known.
+    :param callable callback: Called with the list of newly completed tasks
+    after each poll, before checking their exit codes.
+    :param retrier: Optional `_TaskRetrier` which decides which failed tasks
+    are retried.
     """
 
     _start_time = datetime.datetime.now()
-    timeout_expiration = _start_time + timeout
 
     # print( "Monitoring all tasks for 'Completed' state, timeout in {}...".format(timeout), end="",)
 
-    while datetime.datetime.now() < timeout_expiration:
-        sys.stdout.flush()
-        tasks = [t for t in batch_service_client.task.list(job_id)]
-
-        incomplete_tasks = [task for task in tasks if task.state != TaskState.completed]
-
-        hours, remainder = divmod((datetime.datetime.now() - _start_time).seconds, 3600)
-        minutes, seconds = divmod(remainder, 60)
-        _print_progress(
-            len(tasks) - len(incomplete_tasks),
-            len(tasks),
-            prefix="Time elapsed {:02}:{:02}:{:02}".format(
-                int(hours), int(minutes), int(seconds)
-            ),
-            decimals=1,
-            bar_length=min(len(tasks), 50),
-        )
+    try:
+        for counts, completed in _poll_completed_tasks(
+            batch_service_client, job_id, timeout, task_count, retrier=retrier
+        ):
+            if callback is not None:
+                callback(completed)
+            _check_exit_codes(completed, retrier.retries if retrier is not None else None)
 
-        error_codes = [
-            "   Task {} exited with code {}".format(i, t.execution_info.exit_code)
-            for i, t in enumerate(tasks)
-            if t.execution_info and t.execution_info.exit_code
-        ]
-        if len(error_codes):
-            raise RuntimeError(
-                "\nSome tasks have exited with a non-zero exit code including:\n"
-                + "\n".join(error_codes)
+            sys.stdout.flush()
+            total = counts.active + counts.running + counts.completed
+
+            hours, remainder = divmod(
+                (datetime.datetime.now() - _start_time).seconds, 3600
             )
-        if not incomplete_tasks:
-            print()
-            return True
-        time.sleep(1)
+            minutes, seconds = divmod(remainder, 60)
+            _print_progress(
+                counts.completed,
+                max(total, 1),
+                prefix="Time elapsed {:02}:{:02}:{:02}".format(
+                    int(hours), int(minutes), int(seconds)
+                ),
+                decimals=1,
+                bar_length=min(total, 50),
+            )
+    finally:
+        print()
+    return True
+
+
+def _poll_completed_tasks(
+    batch_service_client,
+    job_id,
+    timeout,
+    task_count=None,
+    min_interval=1,
+    max_interval=30,
+    retrier=None,
+):
+    """
+    Polls the specified job, yielding the job's task counts along with the
+    tasks which have reached the Completed state since the previous poll
+    (possibly an empty list), and returns once every task has completed.
+
+    Progress is read from the job's task counts, and tasks are only listed
+    when the counts show that tasks have completed which have not yet been
+    seen, in which case only completed tasks whose state changed since the
+    last listing are fetched.  The wait between polls doubles (up to
+    `max_interval`) while the task counts do not change, and is reset to
+    `min_interval` when they do, so the cost of monitoring scales with the
+    number of state changes rather than the number of tasks.
+
+    When a `retrier` is provided, failed tasks which it retries are not
+    yielded until they complete for good.
+
+    :param batch_service_client: A Batch service client.
+    :type batch_service_client: `azure.batch.BatchServiceClient`
+    :param str job_id: The id of the job whose tasks should be to monitored.
+    :param timedelta timeout: The duration to wait for task completion. If all
+    tasks in the specified job do not reach Completed state within this time
+    period, an exception will be raised.
+    :param int task_count: The number of tasks added to the job, if known.
+    Guards against returning early while the task counts are out of date.
+    :param float min_interval: Seconds to wait between polls after a change.
+    :param float max_interval: The longest wait between polls.
+    :param retrier: Optional `_TaskRetrier` which decides which failed tasks
+    are retried.
+    """
+    timeout_expiration = datetime.datetime.now() + timeout
+    interval = min_interval
+    watermark = None
+    seen = set()
+    previous_counts = None
+
+    while datetime.datetime.now() < timeout_expiration:
+        if retrier is not None:
+            retrier.reactivate_due()
+        counts = _get_task_counts(batch_service_client, job_id)
+
+        listed = []
+        if len(seen) < counts.completed:
+            listed = [
+                task
+                for task in _list_completed_tasks(
+                    batch_service_client, job_id, watermark
+                )
+                if task.id not in seen
+            ]
+
+            if listed:
+                watermark = max(
+                    [task.state_transition_time for task in listed]
+                    + ([watermark] if watermark else [])
+                )
+            else:
+                # the counts are ahead of the listing; fall back to a full
+                # listing in case a transition time fell behind the watermark
+                watermark = None
+
+        completed = listed if retrier is None else retrier.filter(listed)
+        seen.update(task.id for task in completed)
+
+        yield counts, completed
+
+        if (
+            counts.active + counts.running == 0
+            and not (retrier is not None and retrier.waiting)
+            and len(seen) >= (counts.completed if task_count is None else task_count)
+        ):
+            return
+
+        # e.g. tasks which started, completed or were reactivated for a retry
+        current_counts = (counts.active, counts.running, counts.completed)
+        if completed or current_counts != previous_counts:
+            interval = min_interval
+        else:
+            interval = min(interval * 2, max_interval)
+        previous_counts = current_counts
+        delay = min(interval, (timeout_expiration - datetime.datetime.now()).total_seconds())
+        if retrier is not None and retrier.waiting:
+            delay = min(delay, retrier.next_due())
+        time.sleep(max(delay, 0))
 
-    print()
     raise RuntimeError(
         "ERROR: Tasks did not reach 'Completed' state within "
         "timeout period of " + str(timeout)
     )
 
 
-def _read_stream_as_string(stream, encoding):
-    """Read stream as string
-    :param stream: input stream generator
-    :param str encoding: The encoding of the file. The default is utf-8.
-    :return: The file content.
-    :rtype: str
+def _check_exit_codes(tasks, retries=None):
     """
-    output = io.BytesIO()
-    try:
-        for data in stream:
-            output.write(data)
-        if encoding is None:
-            encoding = "utf-8"
-        return output.getvalue().decode(encoding)
-    finally:
-        output.close()
-    raise RuntimeError("could not write data to stream or decode bytes")
+    Raises a RuntimeError listing the tasks which exited with a non-zero exit code
+
+    :param dict retries: Optional number of times each task was retried
+    """
+    error_codes = [
+        "   Task {} exited with code {}{}".format(
+            t.id,
+            t.execution_info.exit_code,
+            " after {} retries".format(retries[t.id]) if retries and retries.get(t.id) else "",
+        )
+        for t in tasks
+        if t.execution_info and t.execution_info.exit_code
+    ]
+    if len(error_codes):
+        raise RuntimeError(
+            "\nSome tasks have exited with a non-zero exit code including:\n"
+            + "\n".join(error_codes)
+        )
+
+
+def _get_task_counts(batch_service_client, job_id):
+    """
+    Returns the active, running, completed, succeeded and failed task counts for the job.
+    """
+    result = batch_service_client.job.get_task_counts(job_id)
+    # older versions of the SDK return the TaskCounts directly
+    return getattr(result, "task_counts", result)
+
+
+def _list_completed_tasks(batch_service_client, job_id, since=None):
+    """
+    Lists the completed tasks in the job, fetching only the properties
+    needed for monitoring.
+
+    :param datetime since: When provided, only tasks which reached their
+    current state at or after this time are listed.
+    """
+    task_filter = "state eq 'completed'"
+    if since is not None:
+        task_filter += " and stateTransitionTime ge DateTime'{}'".format(
+            since.astimezone(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        )
+    options = TaskListOptions(
+        filter=task_filter, select="id,state,stateTransitionTime,creationTime,executionInfo,nodeInfo"
+    )
+    return batch_service_client.task.list(job_id, task_list_options=options)
+
+
+def _add_task_collection(batch_service_client, job_id, tasks, threads, max_retries=5):
+    """
+    Adds the tasks to the job in service-compliant chunks of up to 100
+    tasks, submitted concurrently.
+
+    Chunks which exceed the maximum request size are split, and tasks which
+    fail with a server error are resubmitted by the SDK's `add_collection`.
+    Submission interrupted by any other error (e.g. throttling) is resumed
+    with exponential backoff.
+
+    :param batch_service_client: A Batch service client.
+    :type batch_service_client: `azure.batch.BatchServiceClient`
+    :param str job_id: The id of the job to which the tasks are added.
+    :param list tasks: The `TaskAddParameter`s to add.
+    :param int threads: The number of chunks to submit concurrently.
+    :param int max_retries: The number of times to resume an interrupted submission.
+    :return: The number of tasks submitted per second.
+    :raises RuntimeError: If any of the tasks are rejected by the service.
+    """
+    if not tasks:
+        return 0.0
+
+    _start_time = time.time()
+    pending = list(tasks)
+
+    for attempt in range(max_retries + 1):
+        try:
+            batch_service_client.task.add_collection(job_id, pending, threads=threads)
+            break
+        except CreateTasksErrorException as err:
+            if err.failure_tasks:
+                raise RuntimeError(
+                    "\nFailed to add {} tasks:\n".format(len(err.failure_tasks))
+                    + "\n".join(
+                        "   Task {}: {}".format(
+                            result.task_id,
+                            result.error.message.value
+                            if result.error and result.error.message
+                            else result.status,
+                        )
+                        for result in err.failure_tasks
+                    )
+                ) from err
+            if attempt == max_retries or not err.pending_tasks:
+                raise
+            pending = err.pending_tasks
+            time.sleep(2 ** attempt)
+
+    return len(tasks) / max(time.time() - _start_time, 1e-6)
+
+
+def _map_concurrently(func, items, max_workers, verb, noun, keys=None):
+    """
+    Applies `func` to each item using a bounded pool of worker threads.
+
+    :param callable func: The function to call with each item.
+    :param list items: The items to process.
+    :param int max_workers: The maximum number of concurrent calls.
+    :param str verb: Describes the operation in the error message (e.g. "upload").
+    :param str noun: Describes the items in the error message (e.g. "output files").
+    :param list keys: Labels for the items in the error message. Defaults to the items.
+    :return: The results of each call, in the same order as `items`.
+    :raises RuntimeError: If any of the calls raised, listing each failed item and its error.
+    """
+    items = list(items)
+    if keys is None:
+        keys = items
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(func, item) for item in items]
+        wait(futures)
+
+    errors = [
+        "   {}: {!r}".format(key, future.exception())
+        for key, future in zip(keys, futures)
+        if future.exception() is not None
+    ]
+    if errors:
+        raise RuntimeError(
+            "\nFailed to {} {} of {} {}:\n".format(verb, len(errors), len(items), noun)
+            + "\n".join(errors)
+        )
+
+    return [future.result() for future in futures]
@@ -0,0 +1,320 @@
+""" Benchmarks the client-side costs of a SuperBatch job
+
+Runs each phase of a job against local stand-ins for the Azure services:
+blob storage is provided by Azurite (or by a local directory with
+`--storage local`) and the Batch service by `fake_batch.py`, whose tasks
+complete without running anything.  For each job size the harness reports
+the items/sec, MB/sec and number of storage and batch requests of each
+phase:
+
+* upload:   `build_resource_files()` for a new resource file per task
+* reupload: the same call again, when every file is already uploaded
+* sas:      `build_output_file()` for an output file per task
+* submit:   `add_task()` for each task and `run(wait=False)`
+* monitor:  waiting for the tasks to complete, as `load_results()` does
+* download: `_download_files()` for an output file per task
+
+usage:
+
+    # azurite --skipApiVersionCheck &
+    python benchmark.py --tasks 1000 10000 100000
+    python benchmark.py --tasks 1000 --storage local --json results.json
+"""
+# pylint: disable=invalid-name, protected-access
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import pathlib
+import shutil
+import tempfile
+import time
+from collections import Counter
+from urllib.request import urlopen
+
+from azure.batch import BatchServiceClient
+from azure.batch.batch_auth import SharedKeyCredentials
+from azure.storage.blob import BlobServiceClient
+from azure.core.exceptions import ResourceExistsError
+
+import super_batch
+from super_batch.local import _LocalContainerClient
+from super_batch.utils import _wait_for_tasks_to_complete
+
+import fake_batch
+
+# the well known development storage account used by Azurite
+AZURITE_ACCOUNT_KEY = (
+    "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=="
+)
+AZURITE_CONNECTION_STRING = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey={};BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;".format(
+        AZURITE_ACCOUNT_KEY
+    )
+)
+
+class _CountedCalls:
+    """ Counts the calls made to the methods of a (local) storage client
+    """
+
+    def __init__(self, target, requests):
+        self._target = target
+        self._requests = requests
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name == "get_blob_client":
+            return lambda *args, **kwargs: _CountedCalls(
+                attr(*args, **kwargs), self._requests
+            )
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self._requests["storage." + name] += 1
+            return attr(*args, **kwargs)
+
+        return call
+
+
+class BenchmarkClient(super_batch.Client):
+    """ A client which uses the local stand-ins and counts its storage requests
+    """
+
+    def __init__(self, storage, batch_url, **kwargs):
+        self.storage = storage
+        self.batch_url = batch_url
+        self.requests = Counter()
+        super().__init__(**kwargs)
+
+    def _count_request(self, request):
+        self.requests["storage." + request.http_request.method] += 1
+
+    def _create_clients(self):
+        if self.storage == "local":
+            self.blob_client = None
+            self.container_client = _CountedCalls(
+                _LocalContainerClient(
+                    os.path.join(self.config.BATCH_DIRECTORY, "container"),
+                    self.config.BLOB_CONTAINER_NAME,
+                ),
+                self.requests,
+            )
+            self.container_client.create_container()
+        else:
+            self.blob_client = BlobServiceClient.from_connection_string(
+                self.config.STORAGE_ACCOUNT_CONNECTION_STRING,
+                raw_request_hook=self._count_request,
+            )
+            self.container_client = self.blob_client.get_container_client(
+                self.config.BLOB_CONTAINER_NAME
+            )
+            try:
+                self.container_client.create_container()
+            except ResourceExistsError:
+                pass
+
+        self.batch_client = BatchServiceClient(
+            SharedKeyCredentials(
+                self.config.BATCH_ACCOUNT_NAME, self.config.BATCH_ACCOUNT_KEY
+            ),
+            batch_url=self.batch_url,
+        )
+
+
+def _batch_requests(batch_url):
+    with urlopen(batch_url + "/_stats") as response:
+        return Counter(
+            {"batch." + k: v for k, v in json.loads(response.read()).items()}
+        )
+
+
+class _Phase:
+    """ Measures the wall time, CPU time and requests of a phase
+    """
+
+    def __init__(self, client, name, items, size=0):
+        self.client = client
+        self.name = name
+        self.items = items
+        self.size = size
+
+    def __enter__(self):
+        self.requests = self.client.requests.copy() + _batch_requests(self.client.batch_url)
+        self.cpu = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.seconds = time.perf_counter() - self.start
+        self.cpu = time.process_time() - self.cpu
+        after = self.client.requests.copy() + _batch_requests(self.client.batch_url)
+        self.requests = dict(after - self.requests)
+
+    @property
+    def result(self):
+        return {
+            "phase": self.name,
+            "items": self.items,
+            "seconds": self.seconds,
+            "cpu_seconds": self.cpu,
+            "items_per_sec": self.items / max(self.seconds, 1e-9),
+            "mb_per_sec": self.size / 1e6 / max(self.seconds, 1e-9),
+            "requests": self.requests,
+        }
+
+
+def run_benchmark(n_tasks, args, batch_url):
+    """ Runs each phase of a job with `n_tasks` tasks, returning the measurements
+    """
+    directory = tempfile.mkdtemp(prefix="super_batch_benchmark_")
+    job_id = "benchmark{}t{}".format(
+        n_tasks, datetime.datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    )
+    results = []
+    try:
+        client = BenchmarkClient(
+            args.storage,
+            batch_url,
+            POOL_ID="benchmark",
+            JOB_ID=job_id,
+            POOL_VM_SIZE=None,
+            BLOB_CONTAINER_NAME=job_id,
+            BATCH_DIRECTORY=directory,
+            DOCKER_IMAGE="benchmark",
+            COMMAND_LINE="python /worker.py",
+            BATCH_ACCOUNT_NAME="benchmark",
+            BATCH_ACCOUNT_KEY=AZURITE_ACCOUNT_KEY,
+            BATCH_ACCOUNT_ENDPOINT="localhost",
+            STORAGE_ACCOUNT_KEY=AZURITE_ACCOUNT_KEY,
+            STORAGE_ACCOUNT_CONNECTION_STRING=AZURITE_CONNECTION_STRING,
+            MAX_CONCURRENCY=args.concurrency,
+        )
+        size = n_tasks * args.file_size
+
+        for i in range(n_tasks):
+            with open(os.path.join(directory, "input_{}.bin".format(i)), "wb") as fh:
+                fh.write(os.urandom(args.file_size))
+        paths = [("input_{}.bin".format(i), "input.bin") for i in range(n_tasks)]
+
+        with _Phase(client, "upload", n_tasks, size) as phase:
+            resources = client.build_resource_files(paths)
+        results.append(phase.result)
+
+        with _Phase(client, "reupload", n_tasks, size) as phase:
+            client.build_resource_files(paths)
+        results.append(phase.result)
+
+        with _Phase(client, "sas", n_tasks) as phase:
+            outputs = [
+                client.build_output_file("output.bin", "outputs/{}.bin".format(i))
+                for i in range(n_tasks)
+            ]
+        results.append(phase.result)
+
+        with _Phase(client, "submit", n_tasks) as phase:
+            for resource, output in zip(resources, outputs):
+                client.add_task([resource], [output])
+            client.run(wait=False)
+        results.append(phase.result)
+
+        with _Phase(client, "monitor", n_tasks) as phase:
+            _wait_for_tasks_to_complete(
+                client.batch_client,
+                job_id,
+                datetime.timedelta(hours=1),
+                client._task_count,
+                client._record_completed,
+                client._retrier,
+            )
+        results.append(phase.result)
+
+        # the fake tasks do not write their outputs, so upload them directly
+        for i, (file_path, _) in enumerate(paths):
+            client._upload_blob(
+                os.path.join(directory, file_path), "outputs/{}.bin".format(i)
+            )
+
+        with _Phase(client, "download", n_tasks, size) as phase:
+            client._download_files()
+        results.append(phase.result)
+
+        if args.storage != "local":
+            client.container_client.delete_container()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return results
+
+
+def _print_results(n_tasks, results):
+    print("\n{} tasks".format(n_tasks))
+    print(
+        "{:<10}{:>10}{:>10}{:>12}{:>10}  {}".format(
+            "phase", "seconds", "cpu", "items/sec", "MB/sec", "requests"
+        )
+    )
+    for r in results:
+        print(
+            "{:<10}{:>10.2f}{:>10.2f}{:>12.1f}{:>10.2f}  {}".format(
+                r["phase"],
+                r["seconds"],
+                r["cpu_seconds"],
+                r["items_per_sec"],
+                r["mb_per_sec"],
+                ", ".join(
+                    "{}={}".format(k, v) for k, v in sorted(r["requests"].items())
+                ),
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the client against local storage and batch stand-ins"
+    )
+    parser.add_argument("--tasks", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument(
+        "--file-size", type=int, default=1024, help="bytes per input and output file"
+    )
+    parser.add_argument(
+        "--task-seconds",
+        type=float,
+        default=10.0,
+        help="the longest time a fake task takes to complete",
+    )
+    parser.add_argument("--concurrency", type=int, default=8, help="MAX_CONCURRENCY")
+    parser.add_argument("--storage", choices=("azurite", "local"), default="azurite")
+    parser.add_argument("--batch-url", help="use a fake batch endpoint which is already running")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    server = None
+    batch_url = args.batch_url
+    if batch_url is None:
+        ready = multiprocessing.Queue()
+        server = multiprocessing.Process(
+            target=fake_batch.serve, args=(0, args.task_seconds, ready), daemon=True
+        )
+        server.start()
+        batch_url = "http://127.0.0.1:{}".format(ready.get(timeout=30))
+
+    all_results = {}
+    try:
+        for n_tasks in args.tasks:
+            results = run_benchmark(n_tasks, args, batch_url)
+            _print_results(n_tasks, results)
+            all_results[n_tasks] = results
+    finally:
+        if server is not None:
+            server.terminate()
+
+    if args.json:
+        pathlib.Path(args.json).write_text(json.dumps(all_results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+""" A fake Azure Batch endpoint for benchmarking the client
+
+Implements just enough of the Batch REST API for the client to create a job,
+add tasks, monitor them and list the completed tasks.  Tasks are never run:
+each one completes successfully a random duration (up to `--task-seconds`)
+after it was added.  The number of requests for each operation is served
+at `/_stats`.
+
+usage:
+
+    python fake_batch.py --port 8555 --task-seconds 10
+"""
+# pylint: disable=invalid-name
+
+import argparse
+import datetime
+import json
+import random
+import re
+import threading
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+PAGE_SIZE = 1000
+
+_SINCE = re.compile(r"stateTransitionTime ge DateTime'([^']+)'")
+_ROUTES = [
+    ("POST", re.compile(r"^/jobs$"), "job.add"),
+    ("DELETE", re.compile(r"^/jobs/(?P<job>[^/]+)$"), "job.delete"),
+    ("POST", re.compile(r"^/jobs/(?P<job>[^/]+)/addtaskcollection$"), "task.add_collection"),
+    ("GET", re.compile(r"^/jobs/(?P<job>[^/]+)/taskcounts$"), "job.get_task_counts"),
+    ("GET", re.compile(r"^/jobs/(?P<job>[^/]+)/tasks$"), "task.list"),
+    ("GET", re.compile(r"^/_stats$"), "stats"),
+]
+
+
+def _format_time(t):
+    return t.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class FakeBatchService:
+    """ The state of the fake service
+    """
+
+    def __init__(self, task_seconds=0.0, seed=0):
+        self.task_seconds = task_seconds
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.requests = Counter()
+
+    def add_job(self, job_id):
+        with self.lock:
+            self.jobs[job_id] = {}
+
+    def add_tasks(self, job_id, task_ids):
+        now = datetime.datetime.utcnow()
+        with self.lock:
+            tasks = self.jobs[job_id]
+            for task_id in task_ids:
+                duration = self.random.uniform(0, self.task_seconds)
+                tasks[task_id] = (now, now + datetime.timedelta(seconds=duration))
+
+    def task_counts(self, job_id):
+        now = datetime.datetime.utcnow()
+        with self.lock:
+            completed = sum(end <= now for _, end in self.jobs[job_id].values())
+            total = len(self.jobs[job_id])
+        return {
+            "active": 0,
+            "running": total - completed,
+            "completed": completed,
+            "succeeded": completed,
+            "failed": 0,
+        }
+
+    def list_tasks(self, job_id, task_filter):
+        now = datetime.datetime.utcnow()
+        since = _SINCE.search(task_filter or "")
+        since = (
+            datetime.datetime.strptime(since.group(1), "%Y-%m-%dT%H:%M:%S.%fZ")
+            if since
+            else None
+        )
+        completed_only = "state eq 'completed'" in (task_filter or "")
+        with self.lock:
+            items = sorted(self.jobs[job_id].items())
+        out = []
+        for task_id, (start, end) in items:
+            completed = end <= now
+            if completed_only and not completed:
+                continue
+            if since is not None and (not completed or end < since):
+                continue
+            task = {
+                "id": task_id,
+                "state": "completed" if completed else "running",
+                "stateTransitionTime": _format_time(end if completed else start),
+                "creationTime": _format_time(start),
+                "nodeInfo": {"nodeId": "node-{}".format(zlib.crc32(task_id.encode()) % 16)},
+            }
+            if completed:
+                task["executionInfo"] = {
+                    "startTime": _format_time(start),
+                    "endTime": _format_time(end),
+                    "exitCode": 0,
+                    "retryCount": 0,
+                    "requeueCount": 0,
+                    "result": "success",
+                }
+            out.append(task)
+        return out
+
+
+def _handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        """ Routes the Batch REST API requests to the fake service
+        """
+
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):  # pylint: disable=arguments-differ
+            pass
+
+        def _reply(self, status, body=None):
+            data = b"" if body is None else json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; odata=minimalmetadata")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length)) if length else None
+
+        def _route(self, method):
+            url = urlparse(self.path)
+            for route_method, pattern, name in _ROUTES:
+                match = pattern.match(url.path)
+                if route_method == method and match:
+                    if name != "stats":
+                        with service.lock:
+                            service.requests[name] += 1
+                    return name, match.groupdict(), parse_qs(url.query), url
+            return None, None, None, url
+
+        def do_POST(self):  # pylint: disable=invalid-name
+            name, args, _, _ = self._route("POST")
+            body = self._body()
+            if name == "job.add":
+                service.add_job(body["id"])
+                self._reply(201)
+            elif name == "task.add_collection":
+                task_ids = [task["id"] for task in body["value"]]
+                service.add_tasks(args["job"], task_ids)
+                self._reply(
+                    200,
+                    {"value": [{"status": "success", "taskId": t} for t in task_ids]},
+                )
+            else:
+                self._reply(404, {"code": "NotFound"})
+
+        def do_DELETE(self):  # pylint: disable=invalid-name
+            name, args, _, _ = self._route("DELETE")
+            if name == "job.delete":
+                with service.lock:
+                    service.jobs.pop(args["job"], None)
+                self._reply(202)
+            else:
+                self._reply(404, {"code": "NotFound"})
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            name, args, query, url = self._route("GET")
+            if name == "stats":
+                with service.lock:
+                    self._reply(200, dict(service.requests))
+            elif name == "job.get_task_counts":
+                self._reply(
+                    200,
+                    {
+                        "taskCounts": service.task_counts(args["job"]),
+                        "taskSlotCounts": service.task_counts(args["job"]),
+                    },
+                )
+            elif name == "task.list":
+                task_filter = query.get("$filter", [None])[0]
+                skip = int(query.get("$skiptoken", ["0"])[0])
+                tasks = service.list_tasks(args["job"], task_filter)
+                body = {"value": tasks[skip : skip + PAGE_SIZE]}
+                if skip + PAGE_SIZE < len(tasks):
+                    next_query = {k: v[0] for k, v in query.items()}
+                    next_query["$skiptoken"] = str(skip + PAGE_SIZE)
+                    body["odata.nextLink"] = "http://{}{}?{}".format(
+                        self.headers["Host"], url.path, urlencode(next_query)
+                    )
+                self._reply(200, body)
+            else:
+                self._reply(404, {"code": "NotFound"})
+
+    return Handler
+
+
+def serve(port, task_seconds=0.0, ready=None):
+    """ Runs the fake service until the process is terminated
+
+    Args:
+        port: The port to listen on (0 for any free port)
+        task_seconds: The longest time a task takes to complete
+        ready: Optional `multiprocessing.Queue` on which the port is reported once listening
+    """
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", port), _handler(FakeBatchService(task_seconds))
+    )
+    if ready is not None:
+        ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="A fake Azure Batch endpoint")
+    parser.add_argument("--port", type=int, default=8555)
+    parser.add_argument("--task-seconds", type=float, default=0.0)
+    args = parser.parse_args()
+    serve(args.port, args.task_seconds)
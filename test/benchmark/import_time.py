@@ -0,0 +1,101 @@
+""" Benchmarks the startup costs of the super_batch package
+
+Each measurement is taken in a fresh interpreter (so that nothing is
+already imported), and the median of `--repeat` runs is reported:
+
+* import:        `import super_batch`
+* config:        the first `super_batch.BatchConfig(...)`, which imports
+                 jsonschema and builds the schema validator
+* config_again:  each further `BatchConfig(...)`, with the cached validator
+* client_import: `import super_batch.client`, which imports the batch SDK
+
+The modules of the Azure SDKs and of jsonschema which were imported by
+`import super_batch` alone are listed as well; there should be none.
+
+usage:
+
+    python import_time.py
+    python import_time.py --repeat 20 --json import_time.json
+"""
+# pylint: disable=invalid-name
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# run in a fresh interpreter, printing the timings (in seconds) as json
+_PROBE = r"""
+import json, sys, time
+
+t0 = time.perf_counter()
+import super_batch
+t1 = time.perf_counter()
+heavy = sorted(m for m in sys.modules if m.startswith(("azure", "jsonschema")))
+
+config = dict(
+    POOL_ID="pool",
+    JOB_ID="job",
+    BLOB_CONTAINER_NAME="container",
+    BATCH_DIRECTORY="batch",
+    DOCKER_IMAGE="image",
+    POOL_VM_SIZE="STANDARD_D2_V3",
+    BATCH_ACCOUNT_NAME="account",
+    BATCH_ACCOUNT_KEY="key",
+    BATCH_ACCOUNT_ENDPOINT="https://account.batch.azure.com",
+    STORAGE_ACCOUNT_KEY="key",
+    STORAGE_ACCOUNT_CONNECTION_STRING="connection",
+)
+t2 = time.perf_counter()
+super_batch.BatchConfig(**config)
+t3 = time.perf_counter()
+for _ in range(100):
+    super_batch.BatchConfig(**config)
+t4 = time.perf_counter()
+import super_batch.client
+t5 = time.perf_counter()
+
+print(json.dumps({
+    "import": t1 - t0,
+    "config": t3 - t2,
+    "config_again": (t4 - t3) / 100,
+    "client_import": t5 - t4,
+    "heavy_modules": heavy,
+}))
+"""
+
+PHASES = ("import", "config", "config_again", "client_import")
+
+
+def _probe() -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE], check=True, stdout=subprocess.PIPE
+    ).stdout
+    return json.loads(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    runs = [_probe() for _ in range(args.repeat)]
+    results = {
+        phase: statistics.median(run[phase] for run in runs) * 1000 for phase in PHASES
+    }
+    results["heavy_modules"] = runs[0]["heavy_modules"]
+
+    print("{:<15}{:>10}".format("phase", "ms"))
+    for phase in PHASES:
+        print("{:<15}{:>10.2f}".format(phase, results[phase]))
+    print("modules imported by `import super_batch`:", results["heavy_modules"] or "none")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Fixtures shared by the tests.  Jobs are run with `LocalClient`, so the
+tests do not need Azure accounts.
+"""
+# pylint: disable=redefined-outer-name
+
+import shlex
+import sys
+
+import pytest
+
+import super_batch
+
+
+@pytest.fixture
+def batch_directory(tmp_path):
+    return str(tmp_path / "batch")
+
+
+@pytest.fixture
+def make_client(batch_directory):
+    """
+    Returns a function which creates a `LocalClient` in the test's batch
+    directory, with keyword arguments overriding the default configuration
+    """
+
+    def make(**kwargs):
+        config = dict(
+            POOL_ID="pool",
+            JOB_ID="job",
+            POOL_VM_SIZE=None,
+            BLOB_CONTAINER_NAME="container",
+            BATCH_DIRECTORY=batch_directory,
+            DOCKER_IMAGE="image",
+            workers=2,
+        )
+        config.update(kwargs)
+        return super_batch.LocalClient(**config)
+
+    return make
+
+
+@pytest.fixture
+def python_command():
+    """
+    Returns a function which builds the command line of a task which runs
+    a snippet of python in the task's working directory
+    """
+
+    def command(code):
+        return "{} -c {}".format(shlex.quote(sys.executable), shlex.quote(code))
+
+    return command
@@ -1,11 +1,9 @@
-import pdb
 import os
-from os.path import join, expanduser
+from os.path import expanduser
 import datetime
 import pathlib
-import joblib
-from task import task
 import super_batch
+from super_batch import serializers
 
 from constants import (
     GLOBAL_RESOURCE_FILE,
@@ -53,12 +51,9 @@ batch_client = super_batch.Client(
 global_parameters = {"power": 3, "size": (10,)}
 # <<< YOUR CODE GOES ABOVE >>>
 
-# write the global parameters resource to disk
-joblib.dump(global_parameters, join(BATCH_DIRECTORY, GLOBAL_RESOURCE_FILE))
-
-# upload the task resource
-global_parameters_resource = batch_client.build_resource_file(
-    GLOBAL_RESOURCE_FILE, GLOBAL_RESOURCE_FILE
+# write the global parameters resource to disk and upload it
+global_parameters_resource = batch_client.build_resource_object(
+    global_parameters, GLOBAL_RESOURCE_FILE, GLOBAL_RESOURCE_FILE
 )
 
 
@@ -73,14 +68,16 @@ for i, seed in enumerate(SEEDS):
     # <<< YOUR CODE GOES ABOVE >>>
 
     # write the resource to disk
-    local_resource_file = LOCAL_RESOURCE_PATTERN.format(i)
-    joblib.dump(task_parameters, join(BATCH_DIRECTORY, local_resource_file))
-
-    # upload the task resource
-    input_resource = batch_client.build_resource_file(
-        local_resource_file, TASK_RESOURCE_FILE
+    serializers.dump(
+        task_parameters, os.path.join(BATCH_DIRECTORY, LOCAL_RESOURCE_PATTERN.format(i))
     )
 
+# upload the task resources concurrently
+input_resources = batch_client.build_resource_files(
+    (LOCAL_RESOURCE_PATTERN.format(i), TASK_RESOURCE_FILE) for i in range(len(SEEDS))
+)
+
+for i, input_resource in enumerate(input_resources):
     # create an output resource
     output_resource = batch_client.build_output_file(
         TASK_OUTPUT_FILE, LOCAL_OUTPUT_PATTERN.format(i)
@@ -101,10 +98,7 @@ batch_client.run()
 # aggregate the results
 # ------------------------------
 
-task_results = []
-for out_file in batch_client.output_files:
-    task_result = joblib.load(join(BATCH_DIRECTORY, out_file))
-    task_results.append(task_result)
+task_results = [batch_client.load_output(out_file) for out_file in batch_client.output_files]
 
 # <<< YOUR CODE GOES BELOW >>>
 print(sum(task_results))
@@ -0,0 +1,170 @@
+import asyncio
+import os
+
+import azure.batch.models as models
+import pytest
+
+from super_batch.local import _LocalBatchServiceClient
+
+pytest.importorskip("aiohttp")
+
+from super_batch import AsyncClient  # pylint: disable=wrong-import-position
+
+KEY = "a2V5a2V5a2V5"
+SERVICE_CONFIG = dict(
+    BATCH_ACCOUNT_NAME="account",
+    BATCH_ACCOUNT_KEY=KEY,
+    BATCH_ACCOUNT_ENDPOINT="account.batch.azure.com",
+    STORAGE_ACCOUNT_KEY=KEY,
+    STORAGE_ACCOUNT_CONNECTION_STRING="DefaultEndpointsProtocol=https;AccountName=account;"
+    "AccountKey={};EndpointSuffix=core.windows.net".format(KEY),
+)
+
+
+@pytest.fixture
+def async_client(batch_directory):
+    """
+    An AsyncClient whose batch service is run locally
+    """
+    client = AsyncClient(
+        POOL_ID="pool",
+        JOB_ID="job",
+        POOL_VM_SIZE=None,
+        BLOB_CONTAINER_NAME="container",
+        BATCH_DIRECTORY=batch_directory,
+        DOCKER_IMAGE="image",
+        **SERVICE_CONFIG
+    )
+    client.batch_client = _LocalBatchServiceClient(os.path.join(batch_directory, "tasks"), 2)
+    return client
+
+
+def add_task(client, command_line):
+    client.batch_client.job.add(
+        models.JobAddParameter(id="job", pool_info=models.PoolInformation(pool_id="pool"))
+    )
+    client.batch_client.task.add_collection(
+        "job", [models.TaskAddParameter(id="Task_0", command_line=command_line)]
+    )
+
+
+async def ticking(coroutine):
+    """
+    Awaits the coroutine while counting the ticks of a timer, which only
+    advances when the coroutine does not block the event loop
+    """
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker = asyncio.ensure_future(tick())
+    try:
+        return await coroutine, ticks
+    finally:
+        ticker.cancel()
+
+
+def test_follow_task_output(async_client, python_command):
+    code = "import time\nfor i in range(3):\n    print(i, flush=True)\n    time.sleep(0.2)"
+    add_task(async_client, python_command(code))
+
+    async def follow():
+        output = async_client.follow_task_output("Task_0", interval=0.05)
+        return "".join([text async for text in output])
+
+    output, ticks = asyncio.run(ticking(follow()))
+
+    assert output == "0\n1\n2\n"
+    assert ticks > 10
+
+
+def test_suggest_pack_size(async_client, python_command):
+    add_task(async_client, python_command("import time; time.sleep(0.5)"))
+
+    async def suggest():
+        async for _ in async_client.follow_task_output("Task_0", interval=0.05):
+            pass
+        return await async_client.suggest_pack_size(target_seconds=10)
+
+    assert 1 < asyncio.run(suggest()) <= 20
+
+
+def test_collect_task_stats(async_client, python_command):
+    add_task(async_client, python_command("pass"))
+    assert asyncio.run(async_client.collect_task_stats()) is None
+
+
+def test_from_journal(make_client, python_command, batch_directory):
+    client = make_client()
+    client.add_task([], [], command_line=python_command("pass"))
+    client.run()
+
+    restored = asyncio.run(AsyncClient.from_journal(batch_directory, "job", **SERVICE_CONFIG))
+
+    assert isinstance(restored, AsyncClient)
+    assert [task.id for task in restored.tasks] == ["Task_0"]
+    assert restored.task_states == {"Task_0": "succeeded"}
+
+
+def test_map_awaits_the_uploads(async_client):
+    uploads = []
+
+    async def upload_blob(local_path, blob_name):
+        uploads.append(blob_name)
+
+    async_client._upload_blob = upload_blob
+
+    outputs = asyncio.run(async_client.map("operator:neg", range(3), global_params={"a": 1}))
+
+    assert outputs == ["job/map_0/result_{}.pickle".format(i) for i in range(3)]
+    # the mapper, the global parameters and the items
+    assert len(uploads) == 5
+    for task in async_client.tasks:
+        assert all(isinstance(r, models.ResourceFile) for r in task.resource_files)
+        assert [r.file_path for r in task.resource_files] == [
+            "super_batch_mapper.py",
+            "global.pickle",
+            "item.pickle",
+        ]
+
+
+def test_task_logs_are_yielded_as_they_are_read(async_client, python_command):
+    add_task(async_client, python_command("print('hello')"))
+
+    async def logs():
+        async for _ in async_client.follow_task_output("Task_0", interval=0.05):
+            pass
+        return [log async for log in async_client.task_logs()]
+
+    [log] = asyncio.run(logs())
+
+    assert (log.id, log.exit_code, log.stdout) == ("Task_0", 0, "hello\n")
+
+
+def test_build_resource_files_bounds_the_uploads(async_client, batch_directory):
+    in_flight = []
+    most = 0
+
+    async def upload_blob(local_path, blob_name):
+        nonlocal most
+        in_flight.append(blob_name)
+        most = max(most, len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(blob_name)
+
+    async_client._upload_blob = upload_blob
+    os.makedirs(batch_directory, exist_ok=True)
+    paths = []
+    for i in range(6):
+        with open(os.path.join(batch_directory, "in_{}.txt".format(i)), "w") as fh:
+            fh.write(str(i))
+        paths.append(("in_{}.txt".format(i), "in_{}.txt".format(i)))
+
+    resource_files = asyncio.run(async_client.build_resource_files(paths, max_concurrency=2))
+
+    assert [r.file_path for r in resource_files] == [path for path, _ in paths]
+    assert most == 2
@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import sys
+
+import super_batch
+
+BENCHMARK_DIRECTORY = os.path.join(os.path.dirname(__file__), "benchmark")
+
+
+def test_benchmark_counts_the_requests_of_each_phase(tmp_path):
+    output = str(tmp_path / "results.json")
+    # the benchmark imports the package under test, which may not be installed
+    python_path = [os.path.dirname(os.path.dirname(super_batch.__file__))]
+    if os.environ.get("PYTHONPATH"):
+        python_path.append(os.environ["PYTHONPATH"])
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(python_path))
+    subprocess.run(
+        [
+            sys.executable,
+            "benchmark.py",
+            "--storage",
+            "local",
+            "--tasks",
+            "3",
+            "--task-seconds",
+            "0",
+            "--file-size",
+            "16",
+            "--json",
+            output,
+        ],
+        cwd=BENCHMARK_DIRECTORY,
+        env=env,
+        check=True,
+        capture_output=True,
+        timeout=120,
+    )
+    with open(output) as fh:
+        requests = {r["phase"]: r["requests"] for r in json.load(fh)["3"]}
+
+    assert requests["upload"] == {"storage.upload_blob": 3}
+    # the files are in the manifest, and SAS tokens are signed locally
+    assert requests["reupload"] == {}
+    assert requests["sas"] == {}
+    assert requests["submit"] == {"batch.job.add": 1, "batch.task.add_collection": 1}
+    assert requests["monitor"]["batch.job.get_task_counts"] >= 1
+    assert requests["monitor"]["batch.task.list"] >= 1
+    assert requests["download"] == {"storage.list_blobs": 1, "storage.download_blob": 3}
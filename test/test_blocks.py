@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from super_batch.local import _url_to_path
+from super_batch.upload import MAX_BLOCKS, _block_size, _blocks, _upload_blocks_async
+
+
+def released(view):
+    try:
+        len(view)
+    except ValueError:
+        return True
+    return False
+
+
+def test_blocks_cover_the_file():
+    blocks = list(_blocks(10, 4))
+
+    assert blocks == [("000000", 0, 4), ("000001", 4, 8), ("000002", 8, 10)]
+    assert _block_size(10, 4) == 4
+
+
+def test_block_size_stays_within_the_block_count_limit():
+    size = MAX_BLOCKS * 10 + 1
+
+    block_size = _block_size(size, 4)
+
+    assert block_size == 11
+    assert len(list(_blocks(size, block_size))) <= MAX_BLOCKS
+
+
+def test_large_files_are_uploaded_in_blocks(make_client, batch_directory):
+    client = make_client(CACHE_RESOURCES=False, UPLOAD_BLOCK_SIZE_MB=0.001)
+    staged = []
+    get_blob_client = client.container_client.get_blob_client
+
+    def blob_client(blob_name):
+        blob = get_blob_client(blob_name)
+        stage_block = blob.stage_block
+
+        def record(block_id, data, **kwargs):
+            assert kwargs["transactional_content_md5"] == hashlib.md5(data).digest()
+            staged.append((block_id, data))
+            return stage_block(block_id, data, **kwargs)
+
+        blob.stage_block = record
+        return blob
+
+    client.container_client.get_blob_client = blob_client
+    data = os.urandom(10000)
+    os.makedirs(batch_directory, exist_ok=True)
+    with open(os.path.join(batch_directory, "large.bin"), "wb") as fh:
+        fh.write(data)
+
+    resource_file = client.build_resource_file("large.bin", "large.bin")
+
+    assert sorted(block_id for block_id, _ in staged) == ["{:06d}".format(i) for i in range(10)]
+    # blocks are views of the file, released once they are staged
+    assert all(isinstance(view, memoryview) and released(view) for _, view in staged)
+    with open(_url_to_path(resource_file.http_url), "rb") as fh:
+        assert fh.read() == data
+
+
+class AsyncBlobClient:
+    """
+    Wraps a local blob client as an `azure.storage.blob.aio` blob client,
+    failing to stage the block `fail`
+    """
+
+    def __init__(self, blob, fail=None):
+        self.blob = blob
+        self.blob_name = blob.blob_name
+        self.fail = fail
+
+    async def stage_block(self, block_id, data, **kwargs):
+        await asyncio.sleep(0)
+        if block_id == self.fail:
+            raise IOError("cannot stage " + block_id)
+        self.blob.stage_block(block_id, data, **kwargs)
+
+    async def commit_block_list(self, block_list, **kwargs):
+        self.blob.commit_block_list(block_list, **kwargs)
+
+    async def get_blob_properties(self):
+        return self.blob.get_blob_properties()
+
+
+def test_large_files_are_uploaded_in_blocks_asynchronously(make_client, tmp_path):
+    client = make_client()
+    data = os.urandom(10000)
+    local_path = str(tmp_path / "large.bin")
+    with open(local_path, "wb") as fh:
+        fh.write(data)
+    blob = client.container_client.get_blob_client("large.bin")
+
+    asyncio.run(_upload_blocks_async(AsyncBlobClient(blob), local_path, 1000, 3))
+
+    with open(blob.path, "rb") as fh:
+        assert fh.read() == data
+    # a failed block is raised once the blocks in flight release the file
+    with pytest.raises(IOError, match="cannot stage 000004"):
+        asyncio.run(
+            _upload_blocks_async(AsyncBlobClient(blob, fail="000004"), local_path, 1000, 3)
+        )
@@ -0,0 +1,62 @@
+import pytest
+from jsonschema import ValidationError
+
+from super_batch import BatchConfig
+from super_batch.BatchConfig import _CONFIG_SCHEMA, _VALIDATORS, _check
+
+SERVICES = dict(
+    BATCH_ACCOUNT_NAME="batch",
+    BATCH_ACCOUNT_KEY="key",
+    BATCH_ACCOUNT_ENDPOINT="https://batch",
+    STORAGE_ACCOUNT_KEY="key",
+    STORAGE_ACCOUNT_CONNECTION_STRING="connection",
+)
+
+
+def config(**kwargs):
+    values = dict(
+        SERVICES,
+        POOL_ID="pool",
+        JOB_ID="job",
+        POOL_VM_SIZE="standard_d2_v2",
+        BLOB_CONTAINER_NAME="container",
+        BATCH_DIRECTORY="batch",
+        DOCKER_IMAGE="image",
+    )
+    values.update(kwargs)
+    return BatchConfig(**values)
+
+
+def test_unset_optional_values_are_not_validated():
+    # SUBNET_ID and the registry credentials default to None
+    assert config().SUBNET_ID is None
+    assert config(SUBNET_ID="subnet").SUBNET_ID == "subnet"
+
+
+def test_set_values_are_validated():
+    with pytest.raises(ValidationError):
+        config(SUBNET_ID=1)
+    with pytest.raises(ValidationError):
+        config(MAX_CONCURRENCY=0)
+
+
+def test_unset_required_values_are_missing():
+    with pytest.raises(ValidationError, match="'POOL_ID' is a required property"):
+        config(POOL_ID=None)
+
+
+def test_registry_credentials_are_set_together():
+    with pytest.raises(ValidationError, match="'REGISTRY_PASSWORD' is a dependency"):
+        config(REGISTRY_SERVER="registry", REGISTRY_USERNAME="user")
+    config(REGISTRY_SERVER="registry", REGISTRY_USERNAME="user", REGISTRY_PASSWORD="password")
+
+
+def test_validators_are_cached_by_schema():
+    config()
+    count = len(_VALIDATORS)
+    schema = dict(_CONFIG_SCHEMA, required=[])
+    _check({}, schema)
+    _check({}, schema)
+    config()
+
+    assert len(_VALIDATORS) == count + 1
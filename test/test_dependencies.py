@@ -0,0 +1,39 @@
+import azure.batch.models as models
+import pytest
+
+from super_batch.dependencies import MAX_DEPENDENCY_ID_LENGTH, _dependency_ids
+
+
+def test_dependency_ids():
+    depends_on = ["Task_3", range(2), models.TaskIdRange(start=1, end=3)]
+
+    assert _dependency_ids(depends_on, 4) == ["Task_3", "Task_0", "Task_1", "Task_2"]
+
+
+@pytest.mark.parametrize(
+    "dependency",
+    ["Task_4", "other", range(3, 5), models.TaskIdRange(start=0, end=4)],
+)
+def test_dependencies_must_already_be_added(dependency):
+    with pytest.raises(ValueError, match="already been added"):
+        _dependency_ids([dependency], 4)
+
+
+def test_dependency_ids_length_limit():
+    task_count = MAX_DEPENDENCY_ID_LENGTH // len("Task_1000") + 1000
+
+    with pytest.raises(ValueError, match="intermediate tasks"):
+        _dependency_ids([range(task_count)], task_count)
+
+
+def test_add_task_validates_dependencies(make_client):
+    client = make_client()
+    first = client.add_task([], [], command_line="true")
+
+    with pytest.raises(ValueError, match="already been added"):
+        client.add_task([], [], command_line="true", depends_on=["Task_1"])
+    second = client.add_task([], [], command_line="true", depends_on=[first])
+
+    assert client.tasks[1].depends_on.task_ids == [first]
+    assert client.tasks[0].depends_on is None
+    assert second == "Task_1"
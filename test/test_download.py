@@ -0,0 +1,47 @@
+import glob
+import os
+
+import pytest
+
+
+def add_writer(client, python_command, index, write=True):
+    code = "open('out.txt', 'w').write('{}')".format(index) if write else "pass"
+    client.add_task(
+        [],
+        [client.build_output_file("out.txt", "outputs/{}.txt".format(index))],
+        command_line=python_command(code),
+    )
+
+
+def test_outputs_are_downloaded_to_the_batch_directory(
+    make_client, batch_directory, python_command
+):
+    client = make_client()
+    for i in range(3):
+        add_writer(client, python_command, i)
+    client.run()
+
+    for i in range(3):
+        with open(os.path.join(batch_directory, "outputs", "{}.txt".format(i))) as fh:
+            assert fh.read() == str(i)
+    assert not glob.glob(os.path.join(batch_directory, "outputs", "*.part"))
+
+
+def test_downloaded_outputs_are_not_downloaded_again(make_client, python_command):
+    client = make_client()
+    add_writer(client, python_command, 0)
+    client.run()
+
+    downloads = []
+    client._download_file = downloads.append
+    client._download_files()
+    assert downloads == []
+
+
+def test_missing_outputs_are_reported(make_client, python_command):
+    client = make_client()
+    add_writer(client, python_command, 0)
+    add_writer(client, python_command, 1, write=False)
+
+    with pytest.raises(RuntimeError, match="missing blob outputs/1.txt"):
+        client.run()
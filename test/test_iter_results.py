@@ -0,0 +1,47 @@
+import pytest
+
+
+def add_writer(client, python_command, index, exit_code=0):
+    code = "open('out.txt', 'w').write('{}'); raise SystemExit({})".format(index, exit_code)
+    client.add_task(
+        [],
+        [client.build_output_file("out.txt", "outputs/{}.txt".format(index))],
+        command_line=python_command(code),
+    )
+
+
+def read(path):
+    with open(path) as fh:
+        return fh.read()
+
+
+def test_yields_the_output_of_each_task(make_client, python_command):
+    client = make_client()
+    for i in range(4):
+        add_writer(client, python_command, i)
+    client.run(wait=False)
+
+    results = dict(client.iter_results(loader=read))
+
+    assert results == {"Task_{}".format(i): str(i) for i in range(4)}
+    assert set(client.task_states.values()) == {"downloaded"}
+
+
+def test_yields_local_paths_without_a_loader(make_client, python_command, batch_directory):
+    client = make_client()
+    add_writer(client, python_command, 0)
+    client.run(wait=False)
+
+    [(task_id, path)] = list(client.iter_results())
+
+    assert task_id == "Task_0"
+    assert path.startswith(batch_directory) and read(path) == "0"
+
+
+def test_raises_when_a_task_fails(make_client, python_command):
+    client = make_client()
+    add_writer(client, python_command, 0, exit_code=3)
+    client.run(wait=False)
+
+    with pytest.raises(RuntimeError, match="Task Task_0 exited with code 3"):
+        list(client.iter_results())
@@ -0,0 +1,83 @@
+import azure.batch.models as models
+import pytest
+
+from super_batch.jobprep import _use_global_resources
+
+
+def resource(file_path, url="https://account/blob"):
+    return models.ResourceFile(http_url=url, file_path=file_path)
+
+
+def test_global_resources_are_linked_rather_than_downloaded():
+    shared = resource("data/globals.pickle")
+    task = models.TaskAddParameter(
+        id="Task_0", command_line="python worker.py", resource_files=[shared, resource("in.pickle")]
+    )
+
+    [linked] = _use_global_resources([task], [shared])
+
+    assert [r.file_path for r in linked.resource_files] == ["in.pickle"]
+    assert linked.command_line == (
+        "/bin/sh -c 'mkdir -p data && ln -sf \"$AZ_BATCH_JOB_PREP_WORKING_DIR\"/data/globals.pickle "
+        "data/globals.pickle && exec python worker.py'"
+    )
+    # the client's task is unchanged
+    assert task.command_line == "python worker.py" and len(task.resource_files) == 2
+
+
+def test_global_resources_are_matched_without_their_sas_token():
+    shared = resource("globals.pickle", "https://account/container/globals.pickle?sig=1")
+    task = models.TaskAddParameter(
+        id="Task_0",
+        command_line="python worker.py",
+        resource_files=[
+            resource("globals.pickle", "https://account/container/globals.pickle?sig=2")
+        ],
+    )
+
+    [linked] = _use_global_resources([task], [shared])
+
+    assert linked.resource_files == []
+
+
+def test_tasks_without_a_command_line_are_rejected():
+    task = models.TaskAddParameter(id="Task_0", command_line=None)
+
+    with pytest.raises(ValueError, match="Task_0 has no command line"):
+        _use_global_resources([task], [resource("globals.pickle")])
+
+
+def test_tasks_are_unchanged_without_global_resources():
+    tasks = [models.TaskAddParameter(id="Task_0", command_line="true")]
+
+    assert _use_global_resources(tasks, []) is tasks
+
+
+def test_global_resources_are_added_once(make_client, batch_directory):
+    client = make_client()
+    with open("{}/globals.txt".format(batch_directory), "w") as fh:
+        fh.write("shared")
+    resource_file = client.build_resource_file("globals.txt", "globals.txt")
+
+    client.add_global_resource(resource_file)
+    client.add_global_resource(client.build_resource_file("globals.txt", "globals.txt"))
+
+    assert client.global_resources == [resource_file]
+
+
+def test_global_resources_with_fresh_sas_tokens_are_added_once(make_client):
+    client = make_client()
+    first = resource("globals.pickle", "https://account/container/globals.pickle?sig=1")
+
+    client.add_global_resource(first)
+    client.add_global_resource(
+        resource("globals.pickle", "https://account/container/globals.pickle?sig=2")
+    )
+    client.add_global_resource(
+        resource("other/globals.pickle", "https://account/container/globals.pickle?sig=3")
+    )
+
+    assert [r.http_url for r in client.global_resources] == [
+        "https://account/container/globals.pickle?sig=1",
+        "https://account/container/globals.pickle?sig=3",
+    ]
@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+from super_batch import LocalClient
+from super_batch.journal import _JobJournal
+
+
+def test_journal_replays_state_changes(tmp_path):
+    journal = _JobJournal(str(tmp_path), "job")
+    journal.set(["Task_0", "Task_1"], "submitted")
+    journal.write_client({"tasks": ["Task_0", "Task_1"]})
+    journal.set(["Task_0"], "succeeded")
+    journal.flush()
+    journal.set(["Task_0"], "downloaded")
+    journal.set(["Task_1"], "failed")
+    journal.flush()
+    # a record which was only partially written is ignored
+    with open(journal.path, "a") as fh:
+        fh.write(json.dumps({"states": {"Task_1": "succeeded"}})[:-3])
+
+    data, states = _JobJournal.read(journal.path)
+
+    assert data == {"tasks": ["Task_0", "Task_1"]}
+    assert states == {"Task_0": "downloaded", "Task_1": "failed"}
+
+
+def test_journal_without_a_client_record(tmp_path):
+    journal = _JobJournal(str(tmp_path), "job")
+    journal.set(["Task_0"], "submitted")
+    journal.flush()
+
+    with pytest.raises(ValueError, match="No client record"):
+        _JobJournal.read(journal.path)
+
+
+def test_resume_from_journal(make_client, batch_directory, python_command, tmp_path, capsys):
+    flag = str(tmp_path / "flag")
+    client = make_client()
+    for i in range(3):
+        # the last task fails until the flag is set
+        code = "import os, sys\n"
+        if i == 2:
+            code += "if not os.path.exists({!r}): sys.exit(1)\n".format(flag)
+        code += "open('out.txt', 'w').write('{}')".format(i)
+        client.add_task(
+            [],
+            [client.build_output_file("out.txt", "out_{}.txt".format(i))],
+            command_line=python_command(code),
+        )
+    with pytest.raises(RuntimeError, match="Task Task_2 exited with code 1"):
+        client.run()
+    assert client.task_states == {
+        "Task_0": "succeeded",
+        "Task_1": "succeeded",
+        "Task_2": "failed",
+    }
+
+    open(flag, "w").close()
+    restored = LocalClient.from_journal(batch_directory, "job", JOB_ID="retry", workers=2)
+    assert restored.task_states == client.task_states
+    capsys.readouterr()
+    restored.run()
+
+    assert "Submitted 1 tasks" in capsys.readouterr().out
+    assert set(restored.task_states.values()) == {"downloaded"}
+    for i in range(3):
+        with open(os.path.join(batch_directory, "out_{}.txt".format(i))) as fh:
+            assert fh.read() == str(i)
+    assert os.path.exists(os.path.join(batch_directory, "retry.journal"))
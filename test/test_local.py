@@ -0,0 +1,126 @@
+import os
+
+import pytest
+
+from super_batch.local import _url_to_path
+
+
+def read(path):
+    with open(path) as fh:
+        return fh.read()
+
+
+def write(batch_directory, name, data):
+    path = os.path.join(batch_directory, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as fh:
+        fh.write(data)
+
+
+def test_resource_files_are_staged_in_the_working_directory(
+    make_client, python_command, batch_directory
+):
+    client = make_client()
+    write(batch_directory, "input.txt", "data")
+    code = "import os; open('out.txt', 'w').write(open('inputs/input.txt').read() + os.environ['AZ_BATCH_TASK_ID'])"
+    client.add_task(
+        [client.build_resource_file("input.txt", "inputs/input.txt")],
+        [client.build_output_file("out.txt", "out.txt")],
+        command_line=python_command(code),
+    )
+    client.run()
+
+    assert read(os.path.join(batch_directory, "out.txt")) == "dataTask_0"
+
+
+def test_dependent_tasks_run_after_their_dependencies(
+    make_client, python_command, tmp_path
+):
+    log = str(tmp_path / "log.txt")
+    client = make_client()
+    first = client.add_task(
+        [],
+        [],
+        command_line=python_command(
+            "import time; time.sleep(0.5); open({!r}, 'a').write('0')".format(log)
+        ),
+    )
+    client.add_task(
+        [],
+        [],
+        command_line=python_command("open({!r}, 'a').write('1')".format(log)),
+        depends_on=[first],
+    )
+    client.run()
+
+    assert read(log) == "01"
+
+
+def test_global_resources_are_linked_into_each_task(
+    make_client, python_command, batch_directory
+):
+    client = make_client()
+    write(batch_directory, "globals.txt", "shared")
+    client.add_global_resource(client.build_resource_file("globals.txt", "globals.txt"))
+    for i in range(2):
+        client.add_task(
+            [],
+            [client.build_output_file("out.txt", "out_{}.txt".format(i))],
+            command_line=python_command(
+                "open('out.txt', 'w').write(open('globals.txt').read())"
+            ),
+        )
+    client.run()
+
+    for i in range(2):
+        assert read(os.path.join(batch_directory, "out_{}.txt".format(i))) == "shared"
+
+
+def test_failed_tasks_are_retried_by_the_service(make_client, python_command, tmp_path):
+    attempts = str(tmp_path / "attempts.txt")
+    client = make_client(MAX_TASK_RETRIES=2)
+    # the task fails on its first two attempts
+    code = (
+        "import sys; f = open({!r}, 'a'); f.write('x'); f.close(); "
+        "sys.exit(len(open({!r}).read()) < 3)"
+    ).format(attempts, attempts)
+    client.add_task([], [], command_line=python_command(code))
+    client.run()
+
+    assert read(attempts) == "xxx"
+    assert client.task_retries == {"Task_0": 2}
+
+
+def test_task_logs(make_client, python_command):
+    client = make_client()
+    client.add_task(
+        [],
+        [],
+        command_line=python_command(
+            "import sys; print('hello'); sys.stderr.write('oops'); sys.exit(2)"
+        ),
+    )
+    with pytest.raises(RuntimeError, match="exited with code 2"):
+        client.run()
+
+    [log] = client.task_logs(failed_only=True)
+
+    assert (log.id, log.exit_code, log.stdout, log.stderr) == ("Task_0", 2, "hello\n", "oops")
+    [log] = client.task_logs(tail_bytes=3)
+    assert log.stdout == "lo\n"
+
+
+def test_outputs_are_uploaded_according_to_their_upload_condition(
+    make_client, python_command
+):
+    client = make_client()
+    client.add_task(
+        [],
+        [client.build_output_file("out.txt", "out.txt")],
+        command_line=python_command("open('out.txt', 'w').write('partial'); raise SystemExit(1)"),
+    )
+    with pytest.raises(RuntimeError):
+        client.run()
+
+    # outputs are only uploaded when the task succeeds
+    assert not os.path.exists(os.path.join(_url_to_path(client._container_url()), "out.txt"))
@@ -0,0 +1,50 @@
+import types
+
+import azure.batch.models as models
+
+from super_batch.logs import _OutputFollower
+
+
+class GrowingFile:
+    """
+    A task file which grows between reading its size and reading its
+    content, recording the range of each read
+    """
+
+    def __init__(self, content, states, sizes, written):
+        self.content = content
+        # the state and size reported by each read, and the number of bytes
+        # written when each range is read
+        self.states = states
+        self.sizes = sizes
+        self.written = written
+        self.ranges = []
+        self.file = types.SimpleNamespace(
+            get_properties_from_task=self.get_properties_from_task,
+            get_from_task=self.get_from_task,
+        )
+        self.task = types.SimpleNamespace(get=self.get)
+
+    def get(self, job_id, task_id):
+        return types.SimpleNamespace(state=self.states.pop(0))
+
+    def get_properties_from_task(self, job_id, task_id, file_name, raw=False):
+        return types.SimpleNamespace(headers={"Content-Length": self.sizes.pop(0)})
+
+    def get_from_task(self, job_id, task_id, file_name, file_get_from_task_options=None):
+        ocp_range = file_get_from_task_options.ocp_range if file_get_from_task_options else None
+        self.ranges.append(ocp_range)
+        start = int(ocp_range[len("bytes=") : -1]) if ocp_range else 0
+        return [self.content[start : self.written.pop(0)]]
+
+
+def test_follower_reads_each_byte_once():
+    running, completed = models.TaskState.running, models.TaskState.completed
+    # 3 bytes are reported, but 6 have been written when the file is read
+    service = GrowingFile(b"abcdefghi", [running, running, completed], [3, 6, 9], [6, 9])
+    follower = _OutputFollower(service, "job", "task", "stdout.txt", None)
+
+    reads = [follower.read(), follower.read(), follower.read()]
+
+    assert reads == [("abcdef", False), ("", False), ("ghi", True)]
+    assert service.ranges == [None, "bytes=6-"]
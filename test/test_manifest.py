@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+
+from super_batch.manifest import _ResourceManifest
+
+
+def write(batch_directory, name, data):
+    path = os.path.join(batch_directory, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as fh:
+        fh.write(data)
+
+
+def count_uploads(client):
+    uploads = []
+    upload_blob = client._upload_blob
+
+    def record(local_path, blob_name):
+        uploads.append(blob_name)
+        upload_blob(local_path, blob_name)
+
+    client._upload_blob = record
+    return uploads
+
+
+def test_unchanged_content_is_uploaded_once(make_client, batch_directory):
+    client = make_client()
+    uploads = count_uploads(client)
+    write(batch_directory, "a.txt", b"same")
+    write(batch_directory, "b.txt", b"same")
+
+    first = client.build_resource_file("a.txt", "a.txt")
+    second = client.build_resource_files([("a.txt", "x.txt"), ("b.txt", "b.txt")])
+
+    assert len(uploads) == 1
+    assert uploads[0].startswith("resources/")
+    assert {first.http_url} == {r.http_url for r in second}
+    assert [r.file_path for r in second] == ["x.txt", "b.txt"]
+
+
+def test_manifest_is_shared_between_runs(make_client, batch_directory):
+    write(batch_directory, "a.txt", b"data")
+    make_client().build_resource_file("a.txt", "a.txt")
+
+    client = make_client()
+    uploads = count_uploads(client)
+    client.build_resource_file("a.txt", "a.txt")
+    assert uploads == []
+
+    write(batch_directory, "a.txt", b"changed")
+    client.build_resource_file("a.txt", "a.txt")
+    assert len(uploads) == 1
+
+
+def test_digest_is_recomputed_when_the_file_changes(tmp_path):
+    manifest = _ResourceManifest(str(tmp_path))
+    path = tmp_path / "file.txt"
+    path.write_bytes(b"one")
+    first = manifest.digest(str(path))
+    assert manifest.digest(str(path)) == first
+
+    path.write_bytes(b"three")
+    assert manifest.digest(str(path)) != first
+
+
+def test_forget_container(tmp_path):
+    manifest = _ResourceManifest(str(tmp_path))
+    manifest.add_blob("https://account/a", "digest", "blob")
+    manifest.add_blob("https://account/b", "digest", "blob")
+    manifest.forget_container("https://account/a")
+    manifest.save()
+
+    reloaded = _ResourceManifest(str(tmp_path))
+    assert reloaded.get_blob("https://account/a", "digest") is None
+    assert reloaded.get_blob("https://account/b", "digest") == "blob"
+
+
+def test_concurrent_saves(tmp_path):
+    manifest = _ResourceManifest(str(tmp_path))
+
+    def save(thread):
+        for i in range(50):
+            manifest.add_blob("https://account/{}".format(thread), str(i), "blob")
+            manifest.save()
+
+    threads = [threading.Thread(target=save, args=(thread,)) for thread in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(manifest.path) as fh:
+        blobs = json.load(fh)["blobs"]
+    assert {url: len(digests) for url, digests in blobs.items()} == {
+        "https://account/{}".format(thread): 50 for thread in range(8)
+    }
+    assert os.listdir(str(tmp_path)) == [os.path.basename(manifest.path)]
@@ -0,0 +1,24 @@
+import pytest
+
+
+def test_map(make_client):
+    client = make_client()
+    outputs = client.map("builtins:round", [1.26, 2.34], global_params={"ndigits": 1})
+    client.run()
+
+    assert [client.load_output(output) for output in outputs] == [1.3, 2.3]
+
+
+def test_map_reduce(make_client):
+    client = make_client()
+    [output] = client.map("operator:neg", range(5), reduce="operator:add", fan_in=2)
+    client.run()
+
+    assert client.load_output(output) == -10
+    # only the reduced value is downloaded
+    assert client.output_files == [output]
+
+
+def test_map_requires_items(make_client):
+    with pytest.raises(ValueError, match="empty iterable"):
+        make_client().map("operator:neg", [])
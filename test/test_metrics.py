@@ -0,0 +1,82 @@
+import csv
+import datetime
+import json
+import types
+
+from super_batch.metrics import JobMetrics
+
+T0 = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def completed_task(task_id, node_id, queued, running, retries=0):
+    start = T0 + datetime.timedelta(seconds=queued)
+    return types.SimpleNamespace(
+        id=task_id,
+        creation_time=T0,
+        node_info=types.SimpleNamespace(node_id=node_id),
+        execution_info=types.SimpleNamespace(
+            start_time=start,
+            end_time=start + datetime.timedelta(seconds=running),
+            exit_code=0,
+            result="success",
+            retry_count=retries,
+            requeue_count=0,
+        ),
+    )
+
+
+def test_task_metrics():
+    metrics = JobMetrics()
+    seen = []
+    metrics.on_task(seen.append)
+    metrics.record_tasks(
+        [
+            completed_task("a", "node-1", 1, 10),
+            completed_task("b", "node-1", 2, 30, retries=1),
+            completed_task("c", "node-2", 3, 20),
+        ]
+    )
+
+    assert [task.id for task in seen] == ["a", "b", "c"]
+    assert [task.id for task in metrics.stragglers(2)] == ["b", "c"]
+    assert metrics.nodes()["node-1"]["tasks"] == 2
+    summary = metrics.summary()
+    assert summary["tasks"] == 3 and summary["retries"] == 1
+    assert summary["queued_seconds"]["median"] == 2
+    assert summary["running_seconds"]["max"] == 30
+
+
+def test_phases_accumulate():
+    metrics = JobMetrics()
+    phases = []
+    metrics.on_phase(lambda name, seconds: phases.append(name))
+    for _ in range(2):
+        with metrics.phase("upload"):
+            pass
+
+    assert phases == ["upload", "upload"]
+    assert list(metrics.phases) == ["upload"]
+
+
+def test_exports(tmp_path):
+    metrics = JobMetrics()
+    metrics.record_tasks([completed_task("a", "node-1", 1, 10)])
+
+    metrics.to_json(str(tmp_path / "metrics.json"))
+    metrics.to_csv(str(tmp_path / "metrics.csv"))
+
+    with open(str(tmp_path / "metrics.json")) as fh:
+        data = json.load(fh)
+    assert data["tasks"][0]["start_time"] == "2020-01-01T00:00:01+00:00"
+    with open(str(tmp_path / "metrics.csv")) as fh:
+        rows = list(csv.DictReader(fh))
+    assert rows[0]["id"] == "a" and rows[0]["running_seconds"] == "10.0"
+
+
+def test_client_records_the_phases_and_tasks(make_client, python_command):
+    client = make_client()
+    client.add_task([], [], command_line=python_command("pass"))
+    client.run()
+
+    assert {"submit", "wait"} <= set(client.metrics.phases)
+    assert list(client.metrics.tasks) == ["Task_0"]
@@ -0,0 +1,120 @@
+import datetime
+import types
+
+import azure.batch.models as models
+
+from super_batch import utils
+from super_batch.utils import _poll_completed_tasks
+
+T0 = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def completed_task(task_id, seconds):
+    return types.SimpleNamespace(
+        id=task_id,
+        state_transition_time=T0 + datetime.timedelta(seconds=seconds),
+        execution_info=None,
+    )
+
+
+class FakeService:
+    """
+    Replays the task counts and completed task listings of a job, recording
+    the filter of each listing
+    """
+
+    def __init__(self, polls):
+        # a list of (completed count, active count, tasks listed[, running count])
+        self.polls = polls
+        self.index = -1
+        self.filters = []
+        self.job = types.SimpleNamespace(get_task_counts=self.get_task_counts)
+        self.task = types.SimpleNamespace(list=self.list)
+
+    def get_task_counts(self, job_id):
+        self.index = min(self.index + 1, len(self.polls) - 1)
+        completed, active, _, *running = self.polls[self.index]
+        return models.TaskCounts(
+            active=active,
+            running=running[0] if running else 0,
+            completed=completed,
+            succeeded=completed,
+            failed=0,
+        )
+
+    def list(self, job_id, task_list_options=None):
+        self.filters.append(task_list_options.filter)
+        return self.polls[self.index][2]
+
+
+def poll(service, task_count=None):
+    return [
+        [task.id for task in tasks]
+        for _, tasks in _poll_completed_tasks(
+            service,
+            "job",
+            datetime.timedelta(seconds=10),
+            task_count,
+            min_interval=0,
+            max_interval=0,
+        )
+    ]
+
+
+def test_lists_tasks_changed_since_the_watermark():
+    a, b, c = completed_task("a", 1), completed_task("b", 2), completed_task("c", 3)
+    service = FakeService([(2, 1, [a, b]), (3, 0, [b, c])])
+
+    assert poll(service) == [["a", "b"], ["c"]]
+    assert "stateTransitionTime" not in service.filters[0]
+    assert "stateTransitionTime ge DateTime'2020-01-01T00:00:02.000000Z'" in service.filters[1]
+
+
+def test_does_not_list_tasks_until_the_counts_change():
+    a = completed_task("a", 1)
+    service = FakeService([(1, 1, [a]), (1, 1, [a]), (1, 1, [a]), (2, 0, [completed_task("b", 2)])])
+
+    assert poll(service) == [["a"], [], [], ["b"]]
+    assert len(service.filters) == 2
+
+
+def test_falls_back_to_a_full_listing():
+    a, b = completed_task("a", 5), completed_task("b", 1)
+    # b completes with a transition time behind the watermark, so the
+    # filtered listing misses it and the next listing is unfiltered
+    service = FakeService([(1, 1, [a]), (2, 0, [a]), (2, 0, [a, b])])
+
+    assert poll(service) == [["a"], [], ["b"]]
+    assert "stateTransitionTime" in service.filters[1]
+    assert "stateTransitionTime" not in service.filters[2]
+
+
+def test_waits_for_the_expected_task_count():
+    a, b = completed_task("a", 1), completed_task("b", 2)
+    # the counts lag behind the two tasks which were added
+    service = FakeService([(1, 0, [a]), (2, 0, [a, b])])
+
+    assert poll(service, task_count=2) == [["a"], ["b"]]
+
+
+def test_interval_is_reset_when_the_counts_change(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(utils.time, "sleep", sleeps.append)
+    a, b = completed_task("a", 1), completed_task("b", 2)
+    service = FakeService(
+        [
+            (1, 1, [a], 0),
+            (1, 1, [a], 0),
+            (1, 1, [a], 0),
+            (1, 1, [a], 0),
+            # b starts running
+            (1, 0, [a], 1),
+            (1, 0, [a], 1),
+            (2, 0, [a, b], 0),
+        ]
+    )
+
+    assert list(
+        _poll_completed_tasks(service, "job", datetime.timedelta(hours=1), max_interval=30)
+    )
+    assert sleeps == [1, 2, 4, 8, 1, 2]
@@ -0,0 +1,92 @@
+import json
+
+import azure.batch.models as models
+
+from super_batch.packing import _pack_tasks, RUNNER_FILE
+from super_batch.runner import PACK_ENVIRONMENT_VARIABLE
+
+
+def resource(url, file_path):
+    return models.ResourceFile(http_url=url, file_path=file_path)
+
+
+def output(pattern, path):
+    return models.OutputFile(
+        file_pattern=pattern,
+        destination=models.OutputFileDestination(
+            container=models.OutputFileBlobContainerDestination(
+                container_url="https://account/container", path=path
+            )
+        ),
+        upload_options=models.OutputFileUploadOptions(
+            upload_condition=models.OutputFileUploadCondition.task_success
+        ),
+    )
+
+
+def test_pack_tasks():
+    shared = resource("https://account/container/config", "config.pickle")
+    tasks = [
+        models.TaskAddParameter(
+            id="Task_{}".format(i),
+            command_line="python worker.py {}".format(i),
+            resource_files=[shared, resource("https://account/container/in_{}".format(i), "in.pickle")],
+            output_files=[output("out.pickle", "out_{}.pickle".format(i))],
+            required_slots=i + 1,
+        )
+        for i in range(2)
+    ]
+    runner = resource("https://account/container/runner", RUNNER_FILE)
+
+    pack = _pack_tasks("Pack_0", tasks, runner)
+
+    assert pack.id == "Pack_0"
+    assert pack.command_line == "python {}".format(RUNNER_FILE)
+    assert [(r.http_url.rsplit("/", 1)[1], r.file_path) for r in pack.resource_files] == [
+        ("runner", RUNNER_FILE),
+        ("config", "shared/config.pickle"),
+        ("in_0", "item_0/in.pickle"),
+        ("in_1", "item_1/in.pickle"),
+    ]
+    assert [(o.file_pattern, o.destination.container.path) for o in pack.output_files] == [
+        ("item_0/out.pickle", "out_0.pickle"),
+        ("item_1/out.pickle", "out_1.pickle"),
+    ]
+    assert json.loads(pack.environment_settings[0].value) == {
+        "shared": ["config.pickle"],
+        "items": [
+            {"id": "Task_0", "dir": "item_0", "command_line": "python worker.py 0"},
+            {"id": "Task_1", "dir": "item_1", "command_line": "python worker.py 1"},
+        ],
+    }
+    assert pack.environment_settings[0].name == PACK_ENVIRONMENT_VARIABLE
+    assert pack.required_slots == 2
+    # the tasks are not modified
+    assert tasks[0].resource_files[0].file_path == "config.pickle"
+
+
+def test_packed_job(make_client, python_command):
+    client = make_client()
+    shared = client.build_resource_object(10, "shared.pickle", "shared.pickle")
+    code = (
+        "import pickle; "
+        "x = pickle.load(open('shared.pickle', 'rb')) + pickle.load(open('in.pickle', 'rb')); "
+        "pickle.dump(x, open('out.pickle', 'wb'))"
+    )
+    for i in range(5):
+        client.add_task(
+            [shared, client.build_resource_object(i, "in_{}.pickle".format(i), "in.pickle")],
+            [client.build_output_file("out.pickle", "out_{}.pickle".format(i))],
+            command_line=python_command(code),
+        )
+
+    client.run(pack_size=2)
+
+    assert client.packs == {
+        "Pack_0": ["Task_0", "Task_1"],
+        "Pack_1": ["Task_2", "Task_3"],
+        "Pack_2": ["Task_4"],
+    }
+    assert [client.load_output("out_{}.pickle".format(i)) for i in range(5)] == [
+        10, 11, 12, 13, 14
+    ]
@@ -0,0 +1,189 @@
+import types
+
+import azure.batch.models as models
+import pytest
+
+from super_batch import Client
+from super_batch.pool import (
+    _autoscale_formula,
+    _pool_differences,
+    _pool_fingerprint,
+    _validate_task_slots,
+    _vm_cores,
+)
+
+
+def test_autoscale_formula_accounts_for_task_slots():
+    formula = _autoscale_formula(0, 4, 0, task_slots_per_node=8, slots_per_task=2, queued_tasks=20)
+
+    assert "$nodes = ceil($pending * 2 / 8);" in formula
+    # until the pending tasks have been sampled the pool is sized to the queue
+    assert "< 1 ? 20 : max($PendingTasks.GetSample(1));" in formula
+
+
+def test_autoscale_formula_mixes_node_types():
+    formula = _autoscale_formula(1, 2, 6)
+
+    assert "max(1, ceil($nodes * 0.25))" in formula
+    assert "$TargetLowPriorityNodes = min(6, max(0, $nodes - $dedicated));" in formula
+
+
+def test_autoscale_formula_limits():
+    with pytest.raises(ValueError, match="at least one node"):
+        _autoscale_formula(0, 0, 0)
+    with pytest.raises(ValueError, match="exceeds the maximum"):
+        _autoscale_formula(3, 2, 0)
+
+
+def test_client_sizes_the_pool_for_its_tasks(make_client):
+    client = make_client(
+        POOL_AUTOSCALE=True, POOL_NODE_COUNT=4, TASK_SLOTS_PER_NODE=4, TASK_PACK_SIZE=2
+    )
+    for required_slots in (1, 2, 2, 3):
+        client.add_task([], [], command_line="true", required_slots=required_slots)
+
+    formula = client.autoscale_formula()
+
+    assert "< 1 ? 2 :" in formula
+    assert "$nodes = ceil($pending * 2.0 / 4);" in formula
+
+
+@pytest.mark.parametrize(
+    "vm_size, cores",
+    [
+        ("Standard_D16s_v3", 16),
+        ("Standard_E64-16s_v3", 16),
+        ("Standard_A2m_v2", 2),
+        ("Standard_A9", 16),
+        ("Standard_A10", 8),
+        ("Standard_D3_v2", 4),
+        ("Standard_DS13", 8),
+        ("Basic_A1", None),
+        (None, None),
+    ],
+)
+def test_vm_cores(vm_size, cores):
+    assert _vm_cores(vm_size) == cores
+
+
+def test_validate_task_slots():
+    _validate_task_slots("Standard_A9", 64)
+    _validate_task_slots("Unknown_Size", 256)
+    with pytest.raises(ValueError, match="exceeds 4 times the 8 cores of Standard_A10"):
+        _validate_task_slots("Standard_A10", 33)
+    with pytest.raises(ValueError, match="exceeds the maximum of 256"):
+        _validate_task_slots(None, 257)
+
+
+def test_pool_description_serializes(make_client):
+    client = make_client(POOL_VM_SIZE="Standard_D2_v2", POOL_NODE_COUNT=1, SUBNET_ID="subnet")
+    pool = client._pool_description()
+
+    assert pool.validate() == []
+    body = pool.serialize()
+    assert body["networkConfiguration"] == {"subnetId": "subnet"}
+    assert body["virtualMachineConfiguration"]["containerConfiguration"]["type"] == "dockerCompatible"
+    assert body["taskSlotsPerNode"] == 1
+
+
+def test_tasks_serialize_their_slots(make_client):
+    client = make_client(TASK_SLOTS_PER_NODE=4)
+    client.add_task([], [], command_line="true", required_slots=2)
+
+    assert client.tasks[0].serialize()["requiredSlots"] == 2
+
+
+def existing_pool(description, **kwargs):
+    """
+    Describes the pool the service returns for a pool created from the description
+    """
+    properties = dict(
+        id=description.id,
+        state="active",
+        vm_size=description.vm_size.lower(),
+        virtual_machine_configuration=description.virtual_machine_configuration,
+        network_configuration=description.network_configuration,
+        task_slots_per_node=description.task_slots_per_node,
+        task_scheduling_policy=description.task_scheduling_policy,
+        enable_auto_scale=False,
+        target_dedicated_nodes=1,
+        target_low_priority_nodes=0,
+    )
+    properties.update(kwargs)
+    return models.CloudPool(**properties)
+
+
+class FakePools:
+    """
+    Records the calls made to the pool operations of the batch service
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.calls = []
+
+    def get(self, pool_id):
+        return self.pool
+
+    def exists(self, pool_id):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append(name)
+
+
+@pytest.fixture
+def pool_client(make_client):
+    def make(**kwargs):
+        config = dict(POOL_VM_SIZE="Standard_D2_v2", POOL_NODE_COUNT=1)
+        config.update(kwargs)
+        client = make_client(**config)
+        return client, client._pool_description()
+
+    return make
+
+
+def ensure_pool(client, pool):
+    client.batch_client = types.SimpleNamespace(pool=FakePools(pool))
+    Client._ensure_pool(client)
+    return client.batch_client.pool.calls
+
+
+def test_pool_fingerprint(pool_client):
+    _, description = pool_client()
+
+    assert _pool_fingerprint(existing_pool(description)) == _pool_fingerprint(description)
+    changed = existing_pool(description, vm_size="standard_d4_v2", task_slots_per_node=2)
+    assert _pool_fingerprint(changed) != _pool_fingerprint(description)
+    assert _pool_differences(changed, description) == [
+        "task_slots_per_node: 2 (wanted 1)",
+        "vm_size: standard_d4_v2 (wanted standard_d2_v2)",
+    ]
+
+
+def test_matching_pool_is_reused(pool_client, capsys):
+    client, description = pool_client(
+        POOL_NODE_COUNT=2,
+        REGISTRY_SERVER="registry",
+        REGISTRY_USERNAME="user",
+        REGISTRY_PASSWORD="password",
+    )
+
+    assert ensure_pool(client, existing_pool(description)) == ["resize"]
+    assert "Using a private registry" not in capsys.readouterr().out
+
+
+def test_changed_pool_is_an_error(pool_client):
+    client, description = pool_client()
+
+    with pytest.raises(ValueError, match=r"RECREATE_POOL[\s\S]*vm_size: standard_a1"):
+        ensure_pool(client, existing_pool(description, vm_size="standard_a1"))
+
+
+def test_changed_pool_is_recreated(pool_client):
+    client, description = pool_client(RECREATE_POOL=True)
+
+    assert ensure_pool(client, existing_pool(description, vm_size="standard_a1")) == [
+        "delete",
+        "add",
+    ]
@@ -0,0 +1,69 @@
+import pytest
+
+from super_batch import serializers
+from super_batch.results import Results
+
+numpy = pytest.importorskip("numpy")
+
+
+def read(path):
+    with open(path) as fh:
+        return fh.read()
+
+
+def npy_results(tmp_path, arrays):
+    task_outputs = {}
+    for index, array in enumerate(arrays):
+        name = "out_{}.npy".format(index)
+        serializers.dump(array, str(tmp_path / name))
+        task_outputs["Task_{}".format(index)] = [name]
+    return Results(str(tmp_path), task_outputs)
+
+
+def test_results_mapping(tmp_path):
+    results = npy_results(tmp_path, [numpy.arange(3), numpy.arange(2)])
+    results.task_outputs["Task_2"] = ["out_0.npy", "out_1.npy"]
+
+    assert list(results) == ["Task_0", "Task_1", "Task_2"]
+    assert list(results["Task_1"]) == [0, 1]
+    assert [list(value) for value in results["Task_2"]] == [[0, 1, 2], [0, 1]]
+
+
+def test_sum_does_not_modify_the_outputs(tmp_path):
+    results = npy_results(tmp_path, [numpy.ones(3), numpy.ones(3), numpy.ones(3)])
+
+    assert list(results.sum()) == [3, 3, 3]
+    # the memory-mapped outputs are read-only, and unchanged
+    assert list(results["Task_0"]) == [1, 1, 1]
+
+
+def test_sum_widens_the_total(tmp_path):
+    arrays = [numpy.array([1, 2], dtype=numpy.int8), numpy.array([0.5, 0.25])]
+    results = npy_results(tmp_path, arrays)
+
+    total = results.sum()
+
+    assert total.dtype == numpy.float64
+    assert list(total) == [1.5, 2.25]
+
+
+def test_concatenate(tmp_path):
+    results = npy_results(tmp_path, [numpy.zeros((2, 3)), numpy.ones((1, 3))])
+
+    assert results.concatenate().tolist() == [[0, 0, 0], [0, 0, 0], [1, 1, 1]]
+    with pytest.raises(ValueError, match="fill 3 of 4"):
+        results.concatenate(out=numpy.empty((4, 3)))
+
+
+def test_run_returns_the_results(make_client, python_command):
+    client = make_client()
+    for i in range(2):
+        client.add_task(
+            [],
+            [client.build_output_file("out.txt", "out_{}.txt".format(i))],
+            command_line=python_command("open('out.txt', 'w').write('{}')".format(i)),
+        )
+
+    results = client.run(loader=read)
+
+    assert dict(results) == {"Task_0": "0", "Task_1": "1"}
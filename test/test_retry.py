@@ -0,0 +1,83 @@
+import types
+
+import azure.batch.models as models
+import pytest
+
+from super_batch import retry
+from super_batch.retry import _TaskRetrier
+
+
+def completed(task_id, exit_code, retry_count=0):
+    return types.SimpleNamespace(
+        id=task_id,
+        execution_info=models.TaskExecutionInformation(
+            exit_code=exit_code, retry_count=retry_count, requeue_count=0
+        ),
+    )
+
+
+class FakeService:
+    def __init__(self):
+        self.reactivated = []
+        self.task = types.SimpleNamespace(
+            reactivate=lambda job_id, task_id: self.reactivated.append(task_id)
+        )
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(retry.time, "time", lambda: now.value)
+    return now
+
+
+def test_backoff_doubles_with_each_retry(clock):
+    service = FakeService()
+    retrier = _TaskRetrier(service, "job", max_retries=2, backoff=10)
+
+    assert retrier.filter([completed("a", 1), completed("b", 0)])[0].id == "b"
+    assert retrier.waiting == 1 and retrier.next_due() == 10
+
+    clock.value += 9
+    retrier.reactivate_due()
+    assert service.reactivated == []
+    clock.value += 1
+    retrier.reactivate_due()
+    assert service.reactivated == ["a"] and not retrier.waiting
+
+    # the second retry waits twice as long
+    assert retrier.filter([completed("a", 1)]) == []
+    assert retrier.next_due() == 20
+    clock.value += 20
+    retrier.reactivate_due()
+    assert service.reactivated == ["a", "a"]
+
+    # the retry budget is spent, so the failure is final
+    assert [task.id for task in retrier.filter([completed("a", 1)])] == ["a"]
+    assert retrier.retries == {"a": 2, "b": 0}
+
+
+def test_only_listed_exit_codes_are_retried(clock):
+    retrier = _TaskRetrier(FakeService(), "job", max_retries=3, exit_codes=[137])
+
+    final = retrier.filter([completed("a", 1), completed("b", 137)])
+
+    assert [task.id for task in final] == ["a"]
+    assert retrier.waiting == 1
+
+
+def test_tasks_awaiting_a_retry_are_not_final(clock):
+    retrier = _TaskRetrier(FakeService(), "job", max_retries=1, backoff=5)
+    retrier.filter([completed("a", 1)])
+
+    # a listing which still shows the failed task does not finalize it
+    assert retrier.filter([completed("a", 1)]) == []
+    assert retrier.waiting == 1
+
+
+def test_service_retries_are_counted(clock):
+    retrier = _TaskRetrier(FakeService(), "job")
+
+    assert len(retrier.filter([completed("a", 1, retry_count=3)])) == 1
+    assert retrier.retries == {"a": 3}
+    assert retrier.next_due() is None
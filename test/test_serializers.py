@@ -0,0 +1,88 @@
+import pickle
+
+import pytest
+
+from super_batch import serializers
+
+
+def test_pickle_round_trip(tmp_path):
+    path = str(tmp_path / "obj.pickle")
+    serializers.dump({"a": [1, 2]}, path)
+    assert serializers.load(path) == {"a": [1, 2]}
+
+
+def test_codec_is_chosen_by_the_longest_extension():
+    assert serializers.get_codec("x.pickle").name == "pickle"
+    assert serializers.get_codec("x.pickle.zst").name == "zstd"
+    assert serializers.get_codec("x.data", "pickle").name == "pickle"
+    with pytest.raises(ValueError, match="No codec"):
+        serializers.get_codec("x.data")
+    with pytest.raises(ValueError, match="Unknown codec"):
+        serializers.get_codec("x.pickle", "nope")
+
+
+def dump_text(obj, path):
+    with open(path, "w") as fh:
+        fh.write(obj)
+
+
+def load_text(path, mmap):
+    with open(path) as fh:
+        return fh.read()
+
+
+def test_registered_codec(tmp_path, monkeypatch):
+    monkeypatch.setattr(serializers, "_CODECS", dict(serializers._CODECS))
+    serializers.register_codec(serializers.Codec("text", (".txt",), dump_text, load_text))
+    path = str(tmp_path / "obj.txt")
+    serializers.dump("hello", path)
+    assert serializers.load(path) == "hello"
+
+
+@pytest.mark.parametrize("extension", [".pickle.zst", ".pickle.lz4"])
+def test_compressed_pickle(tmp_path, extension):
+    pytest.importorskip({".pickle.zst": "zstandard", ".pickle.lz4": "lz4"}[extension])
+    path = str(tmp_path / ("obj" + extension))
+    serializers.dump(list(range(100)), path)
+    assert serializers.load(path) == list(range(100))
+
+
+def test_npy_is_memory_mapped(tmp_path):
+    numpy = pytest.importorskip("numpy")
+    path = str(tmp_path / "array.npy")
+    serializers.dump(numpy.arange(6).reshape(2, 3), path)
+
+    array = serializers.load(path, mmap=True)
+    assert isinstance(array, numpy.memmap)
+    assert array.tolist() == [[0, 1, 2], [3, 4, 5]]
+    assert not isinstance(serializers.load(path), numpy.memmap)
+
+
+def test_pickles_written_by_joblib(tmp_path):
+    numpy = pytest.importorskip("numpy")
+    joblib = pytest.importorskip("joblib")
+    path = str(tmp_path / "output.pickle")
+    joblib.dump({"array": numpy.arange(4.0)}, path)
+    with pytest.raises(pickle.UnpicklingError):
+        with open(path, "rb") as fh:
+            pickle.load(fh)
+
+    assert serializers.load(path)["array"].tolist() == [0.0, 1.0, 2.0, 3.0]
+
+    joblib.dump(numpy.arange(3), path, compress=3)
+    assert serializers.load(path).tolist() == [0, 1, 2]
+
+
+def test_joblib(tmp_path):
+    numpy = pytest.importorskip("numpy")
+    pytest.importorskip("joblib")
+    path = str(tmp_path / "array.joblib")
+    serializers.dump(numpy.arange(3), path)
+    assert isinstance(serializers.load(path, mmap=True), numpy.memmap)
+
+
+def test_invalid_pickle(tmp_path):
+    path = tmp_path / "bad.pickle"
+    path.write_bytes(b"\x03not a pickle")
+    with pytest.raises(pickle.UnpicklingError):
+        serializers.load(str(path))
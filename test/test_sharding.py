@@ -0,0 +1,99 @@
+import pytest
+
+from super_batch import BatchConfig, LocalClient, ShardedClient
+from super_batch.sharding import _split
+
+
+@pytest.mark.parametrize(
+    "count, weights, sizes",
+    [
+        (10, [1, 1], [5, 5]),
+        (10, [1, 2], [3, 7]),
+        (10, [2, 2, 2], [4, 3, 3]),
+        (7, [0, 1, 3], [0, 2, 5]),
+        (3, [100, 50], [2, 1]),
+        (0, [1, 1], [0, 0]),
+    ],
+)
+def test_split(count, weights, sizes):
+    assert _split(count, weights) == sizes
+
+
+def test_split_assigns_every_task():
+    for count in range(50):
+        assert sum(_split(count, [3, 5, 0.5, 1])) == count
+
+
+def read(path):
+    with open(path) as fh:
+        return fh.read()
+
+
+def sharded_client(batch_directory, shards, **kwargs):
+    config = dict(
+        client_class=LocalClient,
+        JOB_ID="job",
+        POOL_ID="pool",
+        POOL_VM_SIZE=None,
+        BLOB_CONTAINER_NAME="container",
+        BATCH_DIRECTORY=batch_directory,
+        DOCKER_IMAGE="image",
+        workers=2,
+    )
+    config.update(kwargs)
+    return ShardedClient(shards, **config)
+
+
+def test_tasks_are_split_by_capacity(batch_directory, python_command):
+    client = sharded_client(
+        batch_directory,
+        [dict(POOL_ID="pool-a", POOL_NODE_COUNT=1), dict(POOL_ID="pool-b", POOL_NODE_COUNT=3)],
+    )
+    for i in range(4):
+        client.add_task(
+            [client.build_resource_object(i, "in_{}.pickle".format(i), "in.pickle")],
+            [("out.txt", "out_{}.txt".format(i))],
+            command_line=python_command(
+                "import pickle; open('out.txt', 'w').write(str(pickle.load(open('in.pickle', 'rb'))))"
+            ),
+        )
+
+    results = client.run(loader=read)
+
+    assert dict(results) == {"Task_{}".format(i): str(i) for i in range(4)}
+    # the shards are submitted concurrently, so the order of shard_tasks varies
+    assert {task_id: shard for task_id, (shard, _) in client.shard_tasks.items()} == {
+        "Task_0": 0,
+        "Task_1": 1,
+        "Task_2": 1,
+        "Task_3": 1,
+    }
+    assert set(client.task_states.values()) == {"downloaded"}
+
+
+def test_shard_configuration_is_checked(batch_directory):
+    with pytest.raises(ValueError, match="provide weights"):
+        sharded_client(batch_directory, [dict(POOL_ID="a"), dict(POOL_ID="b")])
+    with pytest.raises(ValueError, match="different JOB_IDs"):
+        sharded_client(batch_directory, [dict(JOB_ID="job"), dict(JOB_ID="job")], weights=[1, 1])
+    with pytest.raises(ValueError, match="non-negative weight"):
+        sharded_client(batch_directory, [{}, {}], weights=[1])
+
+
+def test_shards_are_configured_with_dicts(batch_directory):
+    shard = BatchConfig(
+        POOL_ID="pool",
+        JOB_ID="job",
+        POOL_VM_SIZE=None,
+        BLOB_CONTAINER_NAME="container",
+        BATCH_DIRECTORY=batch_directory,
+        DOCKER_IMAGE="image",
+        BATCH_ACCOUNT_NAME="batch",
+        BATCH_ACCOUNT_KEY="key",
+        BATCH_ACCOUNT_ENDPOINT="https://batch",
+        STORAGE_ACCOUNT_KEY="key",
+        STORAGE_ACCOUNT_CONNECTION_STRING="connection",
+    )
+
+    with pytest.raises(TypeError, match="not BatchConfigs"):
+        sharded_client(batch_directory, [shard], weights=[1])
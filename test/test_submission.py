@@ -0,0 +1,89 @@
+import types
+
+import azure.batch.models as models
+import pytest
+
+from super_batch import utils
+from super_batch.utils import _add_task_collection
+
+
+def task(index):
+    return models.TaskAddParameter(id="Task_{}".format(index), command_line="true")
+
+
+class FakeService:
+    """
+    Interrupts the first `interruptions` submissions, leaving the second
+    half of the tasks pending
+    """
+
+    def __init__(self, interruptions):
+        self.interruptions = interruptions
+        self.submissions = []
+        self.task = types.SimpleNamespace(add_collection=self.add_collection)
+
+    def add_collection(self, job_id, tasks, threads=None):
+        self.submissions.append([t.id for t in tasks])
+        if len(self.submissions) <= self.interruptions:
+            raise models.CreateTasksErrorException(
+                pending_tasks=tasks[len(tasks) // 2 :],
+                failure_tasks=[],
+                errors=[RuntimeError("Server busy")],
+            )
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    out = []
+    monkeypatch.setattr(utils.time, "sleep", out.append)
+    return out
+
+
+def test_resumes_with_the_pending_tasks(sleeps):
+    service = FakeService(interruptions=2)
+    tasks = [task(i) for i in range(8)]
+
+    rate = _add_task_collection(service, "job", tasks, threads=4)
+
+    assert rate > 0
+    assert service.submissions == [
+        ["Task_{}".format(i) for i in range(8)],
+        ["Task_{}".format(i) for i in range(4, 8)],
+        ["Task_6", "Task_7"],
+    ]
+    assert sleeps == [1, 2]
+
+
+def test_gives_up_after_max_retries(sleeps):
+    service = FakeService(interruptions=10)
+
+    with pytest.raises(models.CreateTasksErrorException):
+        _add_task_collection(service, "job", [task(i) for i in range(64)], 4, max_retries=2)
+    assert len(service.submissions) == 3
+
+
+def test_rejected_tasks_are_reported(sleeps):
+    def add_collection(job_id, tasks, threads=None):
+        raise models.CreateTasksErrorException(
+            pending_tasks=[],
+            failure_tasks=[
+                models.TaskAddResult(
+                    status=models.TaskAddStatus.client_error,
+                    task_id="Task_1",
+                    error=models.BatchError(
+                        code="InvalidPropertyValue",
+                        message=models.ErrorMessage(value="bad command line"),
+                    ),
+                )
+            ],
+            errors=[],
+        )
+
+    service = types.SimpleNamespace(task=types.SimpleNamespace(add_collection=add_collection))
+    with pytest.raises(RuntimeError, match="Task Task_1: bad command line"):
+        _add_task_collection(service, "job", [task(0), task(1)], 4)
+    assert sleeps == []
+
+
+def test_no_tasks():
+    assert _add_task_collection(None, "job", [], 4) == 0.0
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from super_batch.local import _url_to_path
+
+
+def write(batch_directory, name, data):
+    path = os.path.join(batch_directory, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as fh:
+        fh.write(data)
+
+
+def read_blob(resource_file):
+    with open(_url_to_path(resource_file.http_url), "rb") as fh:
+        return fh.read()
+
+
+def test_build_resource_files_preserves_order(make_client, batch_directory):
+    client = make_client(CACHE_RESOURCES=False, MAX_CONCURRENCY=3)
+    paths = []
+    for i in range(10):
+        write(batch_directory, "input_{}.txt".format(i), str(i).encode())
+        paths.append(("input_{}.txt".format(i), "inputs/{}.txt".format(i)))
+
+    resource_files = client.build_resource_files(paths)
+
+    assert [r.file_path for r in resource_files] == [p for _, p in paths]
+    assert [read_blob(r) for r in resource_files] == [
+        str(i).encode() for i in range(10)
+    ]
+
+
+def test_build_resource_files_lists_every_failure(make_client, batch_directory):
+    client = make_client(CACHE_RESOURCES=False)
+    write(batch_directory, "present.txt", b"data")
+
+    with pytest.raises(RuntimeError) as excinfo:
+        client.build_resource_files(
+            [("missing_1.txt", "a"), ("present.txt", "b"), ("missing_2.txt", "c")]
+        )
+
+    message = str(excinfo.value)
+    assert "Failed to upload 2 of 3 resource files" in message
+    assert "missing_1.txt" in message and "missing_2.txt" in message
+    assert "present.txt" not in message
+
+
+def test_build_resource_file_overwrites_blob(make_client, batch_directory):
+    client = make_client(CACHE_RESOURCES=False)
+    write(batch_directory, "input.txt", b"first")
+    client.build_resource_file("input.txt", "input.txt")
+    write(batch_directory, "input.txt", b"second")
+
+    assert read_blob(client.build_resource_file("input.txt", "input.txt")) == b"second"